@@ -91,16 +91,20 @@ async function main() {
       isbn: "978-0451524935",
     },
     select: {
+      id: true,
       title: true,
       price: true,
-      stockQuantity: true,
     },
   });
 
   if (book1984) {
+    // Live stock comes from the book_stock view (see schema.prisma)
+    const stock = await prisma.bookStock.findUnique({
+      where: { bookId: book1984.id },
+    });
     console.log(`   Title: ${book1984.title}`);
     console.log(`   Price: $${book1984.price}`);
-    console.log(`   In Stock: ${book1984.stockQuantity}`);
+    console.log(`   In Stock: ${stock?.stockQuantity}`);
   }
 }
 
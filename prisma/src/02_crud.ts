@@ -166,7 +166,10 @@ async function updateOperations() {
       },
     });
 
-    console.log(`   ${updated.title}: stock now ${updated.stockQuantity}`);
+    const stock = await prisma.bookStock.findUnique({
+      where: { bookId: updated.id },
+    });
+    console.log(`   ${updated.title}: stock now ${stock?.stockQuantity}`);
   }
 
   // 2. Update many records
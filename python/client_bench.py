@@ -0,0 +1,641 @@
+"""
+Client Library Benchmark: psycopg2 vs. SQLAlchemy vs. Prisma
+============================================================
+Run the same bookstore operations through all three clients used in
+the lessons and compare them side by side:
+
+- point_lookup:  one book by primary key
+- filtered_list: books in a category within a price band, cheapest first
+- nested_load:   a customer with orders, order items and their books
+- update_many:   touch all pending orders of a customer
+- upsert:        insert or update a review (book, customer)
+- bulk_insert:   50 orders in one call (execute_values / insert() with
+                 a list / createMany)
+
+For every client, data scale and concurrency level the report shows
+latency percentiles, throughput, round trips per operation (statements
+sent, including BEGIN/COMMIT) and peak process memory. --show-sql prints
+the SQL each client emitted.
+
+Each client runs in its own process so memory numbers are not mixed.
+psycopg2 and SQLAlchemy use one thread and connection per concurrent
+worker; Prisma runs concurrent async loops over a pool of the same size
+(prisma/src/bench.ts).
+
+⚠️ Adds books, customers and orders marked 'BENCH-' / 'bench-' and
+removes them at the end.
+
+How to run (Prisma needs `pnpm install` and `pnpm prisma:generate` first):
+  Windows:  python client_bench.py --scales 1000,100000 --concurrency 1,8,32
+  macOS:    python3 client_bench.py --scales 1000,100000 --concurrency 1,8,32
+
+  Python clients only, with the SQL they send:
+  python3 client_bench.py --clients psycopg2,sqlalchemy --show-sql
+"""
+
+import argparse
+import importlib
+import json
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+
+from workload import DB_CONFIG, percentile
+
+HERE = Path(__file__).resolve().parent
+PRISMA_DIR = HERE.parent / "prisma"
+
+CLIENTS = ("psycopg2", "sqlalchemy", "prisma")
+OPERATIONS = ("point_lookup", "filtered_list", "nested_load",
+              "update_many", "upsert", "bulk_insert")
+
+BULK_ROWS = 50
+# Seeded orders are 'pending'; bulk_insert rows are told apart by status
+BULK_STATUS = "delivered"
+ORDERS_PER_CUSTOMER = 5
+ITEMS_PER_ORDER = 3
+MAX_STATEMENTS = 8  # distinct SQL texts kept per operation
+
+
+# ==============================================
+# Test data
+# ==============================================
+
+def cleanup(conn):
+    """Remove everything the benchmark added."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM customers WHERE email LIKE 'bench-%';")
+        cur.execute("DELETE FROM books WHERE isbn LIKE 'BENCH-%';")
+    conn.commit()
+
+
+def seed(conn, scale: int):
+    """`scale` books, scale/10 customers with orders of 3 items each."""
+    cleanup(conn)
+    customers = max(10, scale // 10)
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH a AS (SELECT array_agg(id) AS ids FROM authors),
+                 c AS (SELECT array_agg(id) AS ids FROM categories)
+            INSERT INTO books (title, isbn, author_id, category_id, price, stock_quantity)
+            SELECT 'Bench Book ' || g, 'BENCH-' || g,
+                   a.ids[1 + g %% cardinality(a.ids)], c.ids[1 + g %% cardinality(c.ids)],
+                   round((5 + random() * 45)::numeric, 2), 1000
+            FROM a, c, generate_series(1, %s) AS g;
+        """, (scale,))
+        cur.execute("""
+            INSERT INTO customers (first_name, last_name, email)
+            SELECT 'Bench', 'Customer ' || g, 'bench-' || g || '@example.com'
+            FROM generate_series(1, %s) AS g;
+        """, (customers,))
+        cur.execute("""
+            INSERT INTO orders (customer_id, status, total_amount)
+            SELECT c.id, 'pending', 0
+            FROM customers c, generate_series(1, %s)
+            WHERE c.email LIKE 'bench-%%';
+        """, (ORDERS_PER_CUSTOMER,))
+        cur.execute("""
+            WITH b AS (SELECT array_agg(id) AS ids FROM books WHERE isbn LIKE 'BENCH-%%')
+            INSERT INTO order_items (order_id, book_id, quantity, price_at_purchase)
+            SELECT o.id, b.ids[1 + (random() * (cardinality(b.ids) - 1))::int], 1, 10
+            FROM b, orders o
+            JOIN customers c ON c.id = o.customer_id AND c.email LIKE 'bench-%%',
+            generate_series(1, %s);
+        """, (ITEMS_PER_ORDER,))
+        cur.execute("ANALYZE books; ANALYZE customers; ANALYZE orders; ANALYZE order_items;")
+    conn.commit()
+
+
+def reset_between_runs(conn):
+    """Undo what one client run changed so the next one starts the same."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM orders o USING customers c
+            WHERE c.id = o.customer_id AND c.email LIKE 'bench-%%' AND o.status = %s;
+        """, (BULK_STATUS,))
+        cur.execute("DELETE FROM reviews WHERE comment = 'bench upsert';")
+    conn.commit()
+
+
+def bench_ids(conn):
+    """(book ids, customer ids, category ids) the operations pick from."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM books WHERE isbn LIKE 'BENCH-%' ORDER BY id;")
+        books = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT id FROM customers WHERE email LIKE 'bench-%' ORDER BY id;")
+        customers = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT id FROM categories ORDER BY id;")
+        categories = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    return books, customers, categories
+
+
+# ==============================================
+# Round-trip counting (psycopg2 and SQLAlchemy)
+# ==============================================
+
+class Recorder:
+    """Statements and round trips per operation, across all connections."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.round_trips = defaultdict(int)
+        self.statements = defaultdict(list)
+
+    @property
+    def operation(self):
+        return getattr(self.local, "operation", None)
+
+    @operation.setter
+    def operation(self, name):
+        self.local.operation = name
+
+    def record(self, sql: str, trips: int = 1):
+        op = self.operation
+        if op is None:
+            return
+        with self.lock:
+            self.round_trips[op] += trips
+            seen = self.statements[op]
+            if len(seen) < MAX_STATEMENTS and sql not in seen:
+                seen.append(sql)
+
+
+RECORDER = Recorder()
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Counts every statement sent, plus the implicit BEGIN psycopg2 adds."""
+
+    def _begin(self):
+        conn = self.connection
+        if not conn.autocommit and conn.status == psycopg2.extensions.STATUS_READY:
+            RECORDER.record("BEGIN")
+
+    def execute(self, query, vars=None):
+        self._begin()
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        RECORDER.record(" ".join(text.split()))
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        self._begin()
+        RECORDER.record(" ".join(str(query).split()), trips=len(vars_list))
+        return super().executemany(query, vars_list)
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = CountingCursor
+
+    def commit(self):
+        if self.status != psycopg2.extensions.STATUS_READY:
+            RECORDER.record("COMMIT")
+        return super().commit()
+
+    def rollback(self):
+        if self.status != psycopg2.extensions.STATUS_READY:
+            RECORDER.record("ROLLBACK")
+        return super().rollback()
+
+
+# ==============================================
+# psycopg2 operations
+# ==============================================
+
+def psycopg2_client(concurrency: int):
+    """Per-worker setup and the operations, all with plain SQL."""
+    local = threading.local()
+
+    def conn():
+        if not hasattr(local, "conn"):
+            local.conn = psycopg2.connect(connection_factory=CountingConnection, **DB_CONFIG)
+        return local.conn
+
+    def point_lookup(rng, ids):
+        c = conn()
+        with c.cursor() as cur:
+            cur.execute("SELECT id, title, isbn, author_id, category_id, price, stock_quantity, "
+                        "published_date, description, created_at, updated_at "
+                        "FROM books WHERE id = %s;", (rng.choice(ids["books"]),))
+            cur.fetchone()
+        c.commit()
+
+    def filtered_list(rng, ids):
+        low = rng.randint(5, 40)
+        c = conn()
+        with c.cursor() as cur:
+            cur.execute("SELECT id, title, isbn, author_id, category_id, price, stock_quantity, "
+                        "published_date, description, created_at, updated_at "
+                        "FROM books WHERE category_id = %s AND price BETWEEN %s AND %s "
+                        "ORDER BY price LIMIT 20;",
+                        (rng.choice(ids["categories"]), low, low + 10))
+            cur.fetchall()
+        c.commit()
+
+    def nested_load(rng, ids):
+        c = conn()
+        with c.cursor() as cur:
+            cur.execute("""
+                SELECT c.id, c.first_name, c.last_name, c.email,
+                       o.id, o.status, o.total_amount, o.order_date,
+                       i.id, i.quantity, i.price_at_purchase,
+                       b.id, b.title, b.price
+                FROM customers c
+                LEFT JOIN orders o ON o.customer_id = c.id
+                LEFT JOIN order_items i ON i.order_id = o.id
+                LEFT JOIN books b ON b.id = i.book_id
+                WHERE c.id = %s
+                ORDER BY o.id, i.id;
+            """, (rng.choice(ids["customers"]),))
+            rows = cur.fetchall()
+        c.commit()
+
+        customer, orders = None, {}
+        for row in rows:
+            if customer is None:
+                customer = {"id": row[0], "first_name": row[1], "last_name": row[2],
+                            "email": row[3], "orders": []}
+            if row[4] is None:
+                continue
+            order = orders.get(row[4])
+            if order is None:
+                order = {"id": row[4], "status": row[5], "total_amount": row[6],
+                         "order_date": row[7], "items": []}
+                orders[row[4]] = order
+                customer["orders"].append(order)
+            if row[8] is not None:
+                order["items"].append({"id": row[8], "quantity": row[9], "price": row[10],
+                                       "book": {"id": row[11], "title": row[12], "price": row[13]}})
+        return customer
+
+    def update_many(rng, ids):
+        c = conn()
+        with c.cursor() as cur:
+            cur.execute("UPDATE orders SET order_date = CURRENT_TIMESTAMP "
+                        "WHERE customer_id = %s AND status = 'pending';",
+                        (rng.choice(ids["customers"]),))
+        c.commit()
+
+    def upsert(rng, ids):
+        c = conn()
+        with c.cursor() as cur:
+            cur.execute("""
+                INSERT INTO reviews (book_id, customer_id, rating, comment)
+                VALUES (%s, %s, %s, 'bench upsert')
+                ON CONFLICT (book_id, customer_id)
+                DO UPDATE SET rating = EXCLUDED.rating, comment = EXCLUDED.comment;
+            """, (rng.choice(ids["books"]), rng.choice(ids["customers"]), rng.randint(1, 5)))
+        c.commit()
+
+    def bulk_insert(rng, ids):
+        customer = rng.choice(ids["customers"])
+        c = conn()
+        with c.cursor() as cur:
+            execute_values(cur, "INSERT INTO orders (customer_id, status, total_amount) VALUES %s",
+                           [(customer, BULK_STATUS, rng.randint(5, 100)) for _ in range(BULK_ROWS)])
+        c.commit()
+
+    return {"point_lookup": point_lookup, "filtered_list": filtered_list,
+            "nested_load": nested_load, "update_many": update_many,
+            "upsert": upsert, "bulk_insert": bulk_insert}
+
+
+# ==============================================
+# SQLAlchemy operations
+# ==============================================
+
+def sqlalchemy_client(concurrency: int):
+    """The same operations with the ORM from lesson 3, a session per operation."""
+    from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, String, Text, \
+        create_engine, func, insert, select, update
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.orm import Session, joinedload, relationship, selectinload
+
+    lesson = importlib.import_module("03_sqlalchemy_intro")
+    Book = lesson.Book
+
+    class Customer(lesson.Base):
+        __tablename__ = "customers"
+        id = Column(Integer, primary_key=True)
+        first_name = Column(String(50), nullable=False)
+        last_name = Column(String(50), nullable=False)
+        email = Column(String(150), nullable=False, unique=True)
+        phone = Column(String(20))
+        address = Column(Text)
+        created_at = Column(DateTime(timezone=True), server_default=func.now())
+        orders = relationship("Order", back_populates="customer", order_by="Order.id")
+
+    class Order(lesson.Base):
+        __tablename__ = "orders"
+        id = Column(Integer, primary_key=True)
+        customer_id = Column(Integer, ForeignKey("customers.id"))
+        order_date = Column(DateTime(timezone=True), server_default=func.now())
+        status = Column(String(20), default="pending")
+        total_amount = Column(Numeric(10, 2), default=0)
+        customer = relationship("Customer", back_populates="orders")
+        items = relationship("OrderItem", order_by="OrderItem.id")
+
+    class OrderItem(lesson.Base):
+        __tablename__ = "order_items"
+        id = Column(Integer, primary_key=True)
+        order_id = Column(Integer, ForeignKey("orders.id"))
+        book_id = Column(Integer, ForeignKey("books.id"))
+        quantity = Column(Integer, default=1)
+        price_at_purchase = Column(Numeric(10, 2), nullable=False)
+        book = relationship(Book)
+
+    class Review(lesson.Base):
+        __tablename__ = "reviews"
+        id = Column(Integer, primary_key=True)
+        book_id = Column(Integer, ForeignKey("books.id"))
+        customer_id = Column(Integer, ForeignKey("customers.id"))
+        rating = Column(Integer, nullable=False)
+        comment = Column(Text)
+        created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    engine = create_engine(lesson.DATABASE_URL, pool_size=concurrency, max_overflow=0,
+                           connect_args={"connection_factory": CountingConnection})
+
+    def point_lookup(rng, ids):
+        with Session(engine) as session:
+            session.get(Book, rng.choice(ids["books"]))
+            session.commit()
+
+    def filtered_list(rng, ids):
+        low = rng.randint(5, 40)
+        with Session(engine) as session:
+            session.scalars(select(Book)
+                            .where(Book.category_id == rng.choice(ids["categories"]),
+                                   Book.price.between(low, low + 10))
+                            .order_by(Book.price).limit(20)).all()
+            session.commit()
+
+    def nested_load(rng, ids):
+        with Session(engine) as session:
+            customer = session.scalars(
+                select(Customer)
+                .where(Customer.id == rng.choice(ids["customers"]))
+                .options(selectinload(Customer.orders)
+                         .selectinload(Order.items)
+                         .joinedload(OrderItem.book))
+            ).one()
+            session.commit()
+        return customer
+
+    def update_many(rng, ids):
+        with Session(engine) as session:
+            session.execute(update(Order)
+                            .where(Order.customer_id == rng.choice(ids["customers"]),
+                                   Order.status == "pending")
+                            .values(order_date=func.now()),
+                            execution_options={"synchronize_session": False})
+            session.commit()
+
+    def upsert(rng, ids):
+        stmt = pg_insert(Review).values(book_id=rng.choice(ids["books"]),
+                                        customer_id=rng.choice(ids["customers"]),
+                                        rating=rng.randint(1, 5), comment="bench upsert")
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Review.book_id, Review.customer_id],
+            set_={"rating": stmt.excluded.rating, "comment": stmt.excluded.comment})
+        with Session(engine) as session:
+            session.execute(stmt)
+            session.commit()
+
+    def bulk_insert(rng, ids):
+        customer = rng.choice(ids["customers"])
+        with Session(engine) as session:
+            session.execute(insert(Order), [
+                {"customer_id": customer, "status": BULK_STATUS, "total_amount": rng.randint(5, 100)}
+                for _ in range(BULK_ROWS)
+            ])
+            session.commit()
+
+    return {"point_lookup": point_lookup, "filtered_list": filtered_list,
+            "nested_load": nested_load, "update_many": update_many,
+            "upsert": upsert, "bulk_insert": bulk_insert}
+
+
+PYTHON_CLIENTS: Dict[str, Callable] = {
+    "psycopg2": psycopg2_client,
+    "sqlalchemy": sqlalchemy_client,
+}
+
+
+# ==============================================
+# Worker process (one client, one scale, one concurrency)
+# ==============================================
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(client: str, concurrency: int, iterations: int, seed: int) -> Dict:
+    """Run every operation `iterations` times per worker; returns the results."""
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        books, customers, categories = bench_ids(conn)
+    conn.close()
+    ids = {"books": books, "customers": customers, "categories": categories}
+
+    operations = PYTHON_CLIENTS[client](concurrency)
+    # One pool for all operations, so each thread keeps its connection
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    results = {}
+    for name in OPERATIONS:
+        operation = operations[name]
+
+        def worker(index: int):
+            rng = random.Random(seed * 1000 + index)
+            latencies, errors = [], 0
+            RECORDER.operation = None
+            operation(rng, ids)  # warm-up: connect, compile, prepare
+            RECORDER.operation = name
+            for _ in range(iterations):
+                started = time.perf_counter()
+                try:
+                    operation(rng, ids)
+                except Exception:  # keep going, report the count
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+            RECORDER.operation = None
+            return latencies, errors
+
+        started = time.perf_counter()
+        outcomes = list(pool.map(worker, range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(value for values, _ in outcomes for value in values)
+        results[name] = {
+            "count": len(latencies),
+            "errors": sum(errors for _, errors in outcomes),
+            "ops_per_sec": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "round_trips": RECORDER.round_trips[name] / max(1, len(latencies)),
+            "statements": RECORDER.statements[name],
+        }
+    pool.shutdown()
+    return {"client": client, "concurrency": concurrency,
+            "peak_rss_mb": peak_rss_mb(), "operations": results}
+
+
+# ==============================================
+# Orchestration and report
+# ==============================================
+
+def run_client(client: str, concurrency: int, iterations: int, seed: int) -> Dict:
+    """Run one client in a fresh process and parse its JSON result."""
+    args = ["--concurrency", str(concurrency), "--iterations", str(iterations),
+            "--seed", str(seed)]
+    if client == "prisma":
+        npx = shutil.which("npx")
+        if npx is None:
+            raise RuntimeError("npx not found; install Node.js to benchmark Prisma")
+        command, cwd = [npx, "ts-node", "src/bench.ts", *args], PRISMA_DIR
+    else:
+        command, cwd = [sys.executable, __file__, "--worker", client, *args], HERE
+    output = subprocess.run(command, cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(results: List[Dict], clients: List[str], show_sql: bool):
+    for (scale, concurrency), runs in _grouped(results).items():
+        print("\n" + "=" * 100)
+        print(f"📊 {scale:,} books, {concurrency} concurrent worker(s)")
+        print("=" * 100)
+        header = f"   {'operation':<14}"
+        for client in clients:
+            header += f" | {client:^24}"
+        print(header)
+        sub = f"   {'':<14}"
+        for _ in clients:
+            sub += f" | {'p50':>5} {'p95':>6} {'ops/s':>6} {'RT':>4}"
+        print(sub)
+
+        for op in OPERATIONS:
+            line = f"   {op:<14}"
+            for client in clients:
+                r = runs.get(client, {}).get("operations", {}).get(op)
+                if r is None:
+                    line += f" | {'-':^24}"
+                    continue
+                line += (f" | {r['p50_ms']:>5.1f} {r['p95_ms']:>6.1f} {r['ops_per_sec']:>6.0f}"
+                         f" {r['round_trips']:>4.1f}")
+                if r["errors"]:
+                    line += f" ⚠️{r['errors']}"
+            print(line)
+
+        memory = "   peak memory (MB):"
+        for client in clients:
+            rss = runs.get(client, {}).get("peak_rss_mb")
+            memory += f"  {client} {rss:.0f}" if rss is not None else f"  {client} n/a"
+        print(memory)
+
+    print("\n   p50/p95 in ms, RT = round trips per operation (statements incl. BEGIN/COMMIT)")
+
+    if show_sql:
+        first = results[0]
+        print("\n" + "=" * 100)
+        print(f"📝 SQL emitted ({first['scale']:,} books, {first['concurrency']} worker(s))")
+        print("=" * 100)
+        for op in OPERATIONS:
+            print(f"\n▶ {op}")
+            for run in results:
+                if (run["scale"], run["concurrency"]) != (first["scale"], first["concurrency"]):
+                    continue
+                print(f"   [{run['client']}]")
+                for sql in run["operations"][op]["statements"]:
+                    print(f"      {sql[:160]}{'...' if len(sql) > 160 else ''}")
+
+
+def _grouped(results: List[Dict]) -> Dict:
+    grouped = {}
+    for run in results:
+        grouped.setdefault((run["scale"], run["concurrency"]), {})[run["client"]] = run
+    return grouped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="psycopg2 vs. SQLAlchemy vs. Prisma")
+    parser.add_argument("--scales", default="1000,100000", help="book counts to test")
+    parser.add_argument("--concurrency", default="1,8,32", help="concurrent workers to test")
+    parser.add_argument("--iterations", type=int, default=200, help="operations per worker")
+    parser.add_argument("--clients", default=",".join(CLIENTS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--show-sql", action="store_true", help="print the SQL each client sent")
+    parser.add_argument("--json", type=Path, help="also write raw results to this file")
+    parser.add_argument("--worker", choices=sorted(PYTHON_CLIENTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, int(args.concurrency), args.iterations,
+                                    args.seed), default=str))
+        return
+
+    clients = [c.strip() for c in args.clients.split(",") if c.strip()]
+    unknown = set(clients) - set(CLIENTS)
+    if unknown:
+        parser.error(f"Unknown client(s): {', '.join(sorted(unknown))}")
+    scales = [int(s) for s in args.scales.split(",")]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = []
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        for scale in scales:
+            print(f"🌱 Seeding {scale:,} books...")
+            seed(conn, scale)
+            for concurrency in levels:
+                for client in clients:
+                    print(f"🏃 {client}: {concurrency} worker(s) × {args.iterations} per operation")
+                    try:
+                        run = run_client(client, concurrency, args.iterations, args.seed)
+                    except (RuntimeError, subprocess.CalledProcessError) as e:
+                        print(f"   ⚠️ skipped: {getattr(e, 'stderr', None) or e}")
+                        continue
+                    finally:
+                        reset_between_runs(conn)
+                    run["scale"] = scale
+                    results.append(run)
+    finally:
+        print("🧹 Removing benchmark data...")
+        cleanup(conn)
+        conn.close()
+
+    if not results:
+        print("❌ No client produced results")
+        sys.exit(1)
+    print_report(results, clients, args.show_sql)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, default=str))
+        print(f"\n💾 Raw results written to {args.json}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
@@ -0,0 +1,619 @@
+"""
+JSON Documents Built in PostgreSQL
+==================================
+Order and book detail responses are nested documents: an order with
+its customer and items, each item with its book and the book's author.
+Assembling them on the client means fetching many rows, turning every
+value into a Python object (Decimal, datetime, str...), building dicts
+and then serializing it all again with json.dumps().
+
+Here PostgreSQL builds the finished document with json_build_object()
+and json_agg() in one query. The result is read with
+`COPY (...) TO STDOUT (FORMAT binary)`, whose binary json value is its
+UTF-8 text, so every document arrives as bytes ready for the HTTP
+response. No Python object is created per value.
+
+- order_document():  orders -> customer, items -> book -> author
+                     (the nested include in prisma/src/03_relations.ts)
+- book_document():   book -> author, category, rating, latest reviews
+- order_summaries(): Challenge 5 in sql/exercises.sql as one JSON array
+- stream_order_summaries(): the same list written in chunks to a
+                     callback, so large lists never sit in memory whole
+- serve():           a small HTTP server that returns these bytes
+
+How to run (benchmark against client-side assembly, 1-500 items):
+  Windows:  python documents.py --sizes 1,10,50,100,500
+  macOS:    python3 documents.py --sizes 1,10,50,100,500
+
+  Serve the documents over HTTP:
+  python3 documents.py --serve 8000
+  curl localhost:8000/orders/1
+  curl localhost:8000/books/1
+  curl "localhost:8000/orders?customer_id=1"
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from columnar import COPY_HEADER, COPY_SIGNATURE
+from workload import percentile
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+# Streamed lists are handed to the callback in pieces of about this size
+DEFAULT_CHUNK_BYTES = 64 * 1024
+
+# Reviews included in a book document
+DEFAULT_REVIEWS = 10
+
+
+# ==============================================
+# Document queries
+# ==============================================
+# Every query returns one json column, one row per document.
+
+ORDER_DOCUMENT_SQL = """
+    SELECT json_build_object(
+        'id', o.id,
+        'order_date', o.order_date,
+        'status', o.status,
+        'total_amount', o.total_amount,
+        'customer', (
+            SELECT json_build_object(
+                'id', c.id, 'first_name', c.first_name,
+                'last_name', c.last_name, 'email', c.email)
+            FROM customers c
+            WHERE c.id = o.customer_id),
+        'items', COALESCE((
+            SELECT json_agg(json_build_object(
+                'id', oi.id,
+                'quantity', oi.quantity,
+                'price_at_purchase', oi.price_at_purchase,
+                'book', CASE WHEN b.id IS NOT NULL THEN json_build_object(
+                    'id', b.id, 'title', b.title, 'isbn', b.isbn, 'price', b.price,
+                    'author', CASE WHEN a.id IS NOT NULL THEN json_build_object(
+                        'id', a.id, 'name', a.name) END) END
+                ) ORDER BY oi.id)
+            FROM order_items oi
+            LEFT JOIN books b ON b.id = oi.book_id
+            LEFT JOIN authors a ON a.id = b.author_id
+            WHERE oi.order_id = o.id), '[]'::json)
+    )
+    FROM orders o
+    WHERE o.id = %s
+"""
+
+BOOK_DOCUMENT_SQL = """
+    SELECT json_build_object(
+        'id', b.id,
+        'title', b.title,
+        'isbn', b.isbn,
+        'price', b.price,
+        'stock_quantity', st.stock_quantity,
+        'published_date', b.published_date,
+        'description', b.description,
+        'author', (
+            SELECT json_build_object('id', a.id, 'name', a.name, 'bio', a.bio)
+            FROM authors a
+            WHERE a.id = b.author_id),
+        'category', (
+            SELECT json_build_object('id', c.id, 'name', c.name)
+            FROM categories c
+            WHERE c.id = b.category_id),
+        'rating', (
+            SELECT json_build_object(
+                'average', ROUND(AVG(r.rating)::numeric, 2),
+                'count', COUNT(*))
+            FROM reviews r
+            WHERE r.book_id = b.id),
+        'reviews', COALESCE((
+            SELECT json_agg(json_build_object(
+                'rating', r.rating,
+                'comment', r.comment,
+                'customer', cu.first_name || ' ' || cu.last_name,
+                'created_at', r.created_at
+                ) ORDER BY r.created_at DESC, r.id DESC)
+            FROM (
+                SELECT * FROM reviews
+                WHERE book_id = b.id
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            ) r
+            JOIN customers cu ON cu.id = r.customer_id), '[]'::json)
+    )
+    FROM books b
+    -- Live stock, including the stripes of hot books (sql/inventory.sql)
+    JOIN book_stock st ON st.book_id = b.id
+    WHERE b.id = %s
+"""
+
+# Challenge 5: one summary per order, newest first
+ORDER_SUMMARY_ROWS_SQL = """
+    SELECT json_build_object(
+               'order_id', o.id,
+               'customer', c.first_name || ' ' || c.last_name,
+               'order_date', o.order_date,
+               'status', o.status,
+               'item_count', COUNT(oi.id),
+               'books', STRING_AGG(b.title, ', ' ORDER BY oi.id),
+               'total_amount', o.total_amount) AS doc,
+           o.order_date,
+           o.id
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    JOIN order_items oi ON o.id = oi.order_id
+    JOIN books b ON oi.book_id = b.id
+    WHERE %(customer_id)s::int IS NULL OR o.customer_id = %(customer_id)s::int
+    GROUP BY o.id, c.first_name, c.last_name
+"""
+
+
+# ==============================================
+# Reading documents as bytes
+# ==============================================
+
+class _DocumentWriter:
+    """File-like target for copy_expert() that cuts out each row's json bytes.
+
+    Every row of a one-column binary COPY is: field count (int16),
+    length (int32), value. The stream ends with a field count of -1.
+    """
+
+    def __init__(self, on_document: Callable[[bytes], None]):
+        self.on_document = on_document
+        self.buffer = bytearray()
+        self.header_done = False
+        self.finished = False
+        self.documents = 0
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self._drain()
+        return len(data)
+
+    def _drain(self):
+        buffer = self.buffer
+        if not self.header_done:
+            if len(buffer) < COPY_HEADER:
+                return
+            if buffer[:len(COPY_SIGNATURE)] != COPY_SIGNATURE:
+                raise ValueError("Not a binary COPY stream")
+            extension = int.from_bytes(buffer[COPY_HEADER - 4:COPY_HEADER], "big")
+            del buffer[:COPY_HEADER + extension]
+            self.header_done = True
+
+        pos = 0
+        while len(buffer) - pos >= 2:
+            fields = int.from_bytes(buffer[pos:pos + 2], "big", signed=True)
+            if fields == -1:
+                self.finished = True
+                pos += 2
+                break
+            if len(buffer) - pos < 6:
+                break
+            size = int.from_bytes(buffer[pos + 2:pos + 6], "big", signed=True)
+            end = pos + 6 + max(size, 0)
+            if end > len(buffer):
+                break
+            self.on_document(b"null" if size < 0 else bytes(buffer[pos + 6:end]))
+            self.documents += 1
+            pos = end
+        del buffer[:pos]
+
+    def close(self):
+        if not self.finished or self.buffer:
+            raise ValueError("COPY stream ended in the middle of a row")
+
+
+def copy_documents(conn, query: str, params, on_document: Callable[[bytes], None]) -> int:
+    """Run a one-column json query and pass each row's bytes to `on_document`.
+
+    Returns the number of documents.
+    """
+    writer = _DocumentWriter(on_document)
+    with conn.cursor() as cur:
+        sql = cur.mogrify(query, params).decode()
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT (FORMAT binary)", writer)
+    writer.close()
+    return writer.documents
+
+
+def fetch_document(conn, query: str, params) -> Optional[bytes]:
+    """The first document of `query`, or None when there is no row."""
+    documents: List[bytes] = []
+    copy_documents(conn, query, params, documents.append)
+    return documents[0] if documents else None
+
+
+def order_document(conn, order_id: int) -> Optional[bytes]:
+    """One order with its customer and items -> book -> author, as JSON bytes."""
+    return fetch_document(conn, ORDER_DOCUMENT_SQL, (order_id,))
+
+
+def book_document(conn, book_id: int, reviews: int = DEFAULT_REVIEWS) -> Optional[bytes]:
+    """One book with author, category, rating and its latest reviews."""
+    return fetch_document(conn, BOOK_DOCUMENT_SQL, (reviews, book_id))
+
+
+def order_summaries(conn, customer_id: Optional[int] = None) -> bytes:
+    """Challenge 5 as one JSON array, aggregated on the server with json_agg()."""
+    return fetch_document(conn, f"""
+        SELECT COALESCE(json_agg(s.doc ORDER BY s.order_date DESC, s.id DESC), '[]'::json)
+        FROM ({ORDER_SUMMARY_ROWS_SQL}) s
+    """, {"customer_id": customer_id})
+
+
+class _ArrayStream:
+    """Join documents into a JSON array and emit it in chunks."""
+
+    def __init__(self, on_chunk: Callable[[bytes], None], chunk_bytes: int):
+        self.on_chunk = on_chunk
+        self.chunk_bytes = chunk_bytes
+        self.buffer = bytearray(b"[")
+        self.empty = True
+
+    def add(self, document: bytes):
+        if not self.empty:
+            self.buffer += b","
+        self.buffer += document
+        self.empty = False
+        if len(self.buffer) >= self.chunk_bytes:
+            self.on_chunk(bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self):
+        self.buffer += b"]"
+        self.on_chunk(bytes(self.buffer))
+        self.buffer.clear()
+
+
+def stream_order_summaries(conn, on_chunk: Callable[[bytes], None],
+                           customer_id: Optional[int] = None,
+                           chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> int:
+    """Write Challenge 5 as a JSON array to `on_chunk`, a piece at a time.
+
+    The server sends one document per row, so neither side holds the
+    whole list. Returns the number of orders.
+    """
+    stream = _ArrayStream(on_chunk, chunk_bytes)
+    count = copy_documents(conn, f"""
+        SELECT s.doc FROM ({ORDER_SUMMARY_ROWS_SQL}) s
+        ORDER BY s.order_date DESC, s.id DESC
+    """, {"customer_id": customer_id}, stream.add)
+    stream.close()
+    return count
+
+
+# ==============================================
+# Client-side assembly (for comparison)
+# ==============================================
+# What an application usually does: fetch rows, build dicts, json.dumps().
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime) and value.microsecond:
+        # PostgreSQL drops trailing zeros from the fraction of a second
+        head, _, rest = value.isoformat().partition(".")
+        return f"{head}.{rest[:6].rstrip('0')}{rest[6:]}"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def order_document_client(conn, order_id: int) -> Optional[bytes]:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT o.id, o.order_date, o.status, o.total_amount,
+                   c.id, c.first_name, c.last_name, c.email
+            FROM orders o
+            LEFT JOIN customers c ON c.id = o.customer_id
+            WHERE o.id = %s;
+        """, (order_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        cur.execute("""
+            SELECT oi.id, oi.quantity, oi.price_at_purchase,
+                   b.id, b.title, b.isbn, b.price, a.id, a.name
+            FROM order_items oi
+            LEFT JOIN books b ON b.id = oi.book_id
+            LEFT JOIN authors a ON a.id = b.author_id
+            WHERE oi.order_id = %s
+            ORDER BY oi.id;
+        """, (order_id,))
+        items = cur.fetchall()
+
+    document = {
+        "id": row[0],
+        "order_date": row[1],
+        "status": row[2],
+        "total_amount": row[3],
+        "customer": None if row[4] is None else {
+            "id": row[4], "first_name": row[5], "last_name": row[6], "email": row[7]},
+        "items": [{
+            "id": item_id,
+            "quantity": quantity,
+            "price_at_purchase": price_at_purchase,
+            "book": None if book_id is None else {
+                "id": book_id, "title": title, "isbn": isbn, "price": price,
+                "author": None if author_id is None else {"id": author_id, "name": name},
+            },
+        } for item_id, quantity, price_at_purchase, book_id, title, isbn, price,
+            author_id, name in items],
+    }
+    return json.dumps(document, default=_json_default).encode()
+
+
+def order_summaries_client(conn, customer_id: Optional[int] = None) -> bytes:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT o.id, c.first_name || ' ' || c.last_name, o.order_date, o.status,
+                   COUNT(oi.id), STRING_AGG(b.title, ', ' ORDER BY oi.id), o.total_amount
+            FROM orders o
+            JOIN customers c ON o.customer_id = c.id
+            JOIN order_items oi ON o.id = oi.order_id
+            JOIN books b ON oi.book_id = b.id
+            WHERE %(customer_id)s::int IS NULL OR o.customer_id = %(customer_id)s::int
+            GROUP BY o.id, c.first_name, c.last_name
+            ORDER BY o.order_date DESC, o.id DESC;
+        """, {"customer_id": customer_id})
+        rows = cur.fetchall()
+    keys = ("order_id", "customer", "order_date", "status", "item_count", "books",
+            "total_amount")
+    return json.dumps([dict(zip(keys, row)) for row in rows], default=_json_default).encode()
+
+
+# ==============================================
+# HTTP server
+# ==============================================
+
+class DocumentHandler(BaseHTTPRequestHandler):
+    """GET /orders/<id>, /books/<id> and /orders?customer_id=<id> (streamed)."""
+
+    protocol_version = "HTTP/1.1"
+    pool: ThreadedConnectionPool = None
+    streaming = False                    # a chunked 200 has been started
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] in ("orders", "books") and parts[1].isdigit():
+            fetch = order_document if parts[0] == "orders" else book_document
+            respond = lambda conn: self._send_document(fetch(conn, int(parts[1])))
+        elif parts == ["orders"]:
+            customer = parse_qs(query).get("customer_id", [None])[0]
+            try:
+                customer_id = int(customer) if customer else None
+            except ValueError:
+                self._send(400, b'{"error": "bad request"}')
+                return
+            respond = lambda conn: self._stream(conn, customer_id)
+        else:
+            self._send(404, b'{"error": "not found"}')
+            return
+
+        self.streaming = False
+        conn = self.pool.getconn()
+        try:
+            respond(conn)
+        except (psycopg2.Error, ValueError) as e:
+            if self.streaming:
+                # The 200 and some chunks are already out: cut the response
+                # short so the client sees an incomplete body
+                self.close_connection = True
+            else:
+                self._send(500, json.dumps({"error": str(e)}).encode())
+        finally:
+            conn.rollback()
+            self.pool.putconn(conn)
+
+    def _send_document(self, body: Optional[bytes]):
+        if body is None:
+            self._send(404, b'{"error": "not found"}')
+        else:
+            self._send(200, body)
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, conn, customer_id: Optional[int]):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.streaming = True
+
+        def write_chunk(chunk: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+
+        stream_order_summaries(conn, write_chunk, customer_id)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(port: int, connections: int = 8):
+    DocumentHandler.pool = ThreadedConnectionPool(1, connections, **DB_CONFIG)
+    server = ThreadingHTTPServer(("localhost", port), DocumentHandler)
+    print(f"🌐 Serving JSON documents on http://localhost:{port} (Ctrl+C to stop)")
+    print(f"   /orders/<id>   /books/<id>   /orders?customer_id=<id>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        server.server_close()
+        DocumentHandler.pool.closeall()
+
+
+# ==============================================
+# Benchmark
+# ==============================================
+
+BENCH_EMAIL = "documents-bench@example.com"
+
+
+def seed(conn, sizes: List[int], orders_per_size: int) -> Tuple[int, dict]:
+    """Create a bench customer with `orders_per_size` orders of every size.
+
+    Returns (customer id, {size: [order ids]}).
+    """
+    cleanup(conn)
+    orders = {}
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO customers (first_name, last_name, email)
+            VALUES ('Bench', 'Reader', %s)
+            RETURNING id;
+        """, (BENCH_EMAIL,))
+        customer_id = cur.fetchone()[0]
+        for size in sizes:
+            cur.execute("""
+                INSERT INTO orders (customer_id, status, total_amount)
+                SELECT %s, 'pending', 0 FROM generate_series(1, %s)
+                RETURNING id;
+            """, (customer_id, orders_per_size))
+            ids = [row[0] for row in cur.fetchall()]
+            cur.execute("""
+                WITH catalog AS (SELECT array_agg(id ORDER BY id) AS ids FROM books)
+                INSERT INTO order_items (order_id, book_id, quantity, price_at_purchase)
+                SELECT o.id, b.id, 1 + g %% 3, b.price
+                FROM unnest(%s::int[]) AS o(id)
+                CROSS JOIN generate_series(1, %s) AS g
+                CROSS JOIN catalog
+                JOIN books b ON b.id = catalog.ids[1 + (g + o.id) %% cardinality(catalog.ids)];
+            """, (ids, size))
+            cur.execute("""
+                UPDATE orders o SET total_amount = t.total
+                FROM (SELECT order_id, SUM(quantity * price_at_purchase) AS total
+                      FROM order_items WHERE order_id = ANY(%s) GROUP BY order_id) t
+                WHERE o.id = t.order_id;
+            """, (ids,))
+            orders[size] = ids
+    conn.commit()
+    return customer_id, orders
+
+
+def cleanup(conn):
+    """Remove the bench customer; its orders and items go with it (ON DELETE CASCADE)."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM customers WHERE email = %s;", (BENCH_EMAIL,))
+    conn.commit()
+
+
+def _time_calls(conn, fetch, ids: List[int], repeats: int) -> List[float]:
+    fetch(conn, ids[0])  # warm-up
+    timings = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        fetch(conn, ids[i % len(ids)])
+        timings.append(time.perf_counter() - started)
+        conn.rollback()
+    return sorted(timings)
+
+
+def _peak_memory(conn, fetch, arg) -> int:
+    """Peak Python memory allocated while building one response."""
+    tracemalloc.start()
+    try:
+        fetch(conn, arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        conn.rollback()
+
+
+def benchmark(conn, sizes: List[int], orders_per_size: int, repeats: int):
+    customer_id, orders = seed(conn, sizes, orders_per_size)
+    try:
+        print("\n📦 Order document (customer, items -> book -> author)")
+        print(f"   {'items':>6} {'method':<8} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>8}"
+              f" {'bytes':>9} {'trips':>6}")
+        for size in sizes:
+            ids = orders[size]
+            server = json.loads(order_document(conn, ids[0]))
+            client = json.loads(order_document_client(conn, ids[0]))
+            conn.rollback()
+            match = "" if server == client else "  ❌ documents differ"
+            for label, fetch, trips in (("server", order_document, 1),
+                                        ("client", order_document_client, 2)):
+                timings = _time_calls(conn, fetch, ids, repeats)
+                peak = _peak_memory(conn, fetch, ids[0])
+                size_bytes = len(fetch(conn, ids[0]))
+                conn.rollback()
+                print(f"   {size:>6} {label:<8} {percentile(timings, 50) * 1000:>8.2f}"
+                      f" {percentile(timings, 95) * 1000:>8.2f} {peak / 1024:>8.0f}"
+                      f" {size_bytes:>9,} {trips:>6}{match if label == 'client' else ''}")
+
+        count = sum(len(ids) for ids in orders.values())
+        print(f"\n📜 Order list (Challenge 5), {count} orders")
+        print(f"   {'method':<10} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>8} {'bytes':>9}")
+        expected = json.loads(order_summaries_client(conn, customer_id))
+        conn.rollback()
+
+        def streamed(conn, customer):
+            chunks: List[bytes] = []
+            stream_order_summaries(conn, chunks.append, customer)
+            return b"".join(chunks)
+
+        for label, fetch in (("json_agg", order_summaries), ("streamed", streamed),
+                             ("client", order_summaries_client)):
+            timings = _time_calls(conn, fetch, [customer_id], repeats)
+            peak = _peak_memory(conn, fetch, customer_id)
+            body = fetch(conn, customer_id)
+            conn.rollback()
+            match = "" if json.loads(body) == expected else "  ❌ documents differ"
+            print(f"   {label:<10} {percentile(timings, 50) * 1000:>8.2f}"
+                  f" {percentile(timings, 95) * 1000:>8.2f} {peak / 1024:>8.0f}"
+                  f" {len(body):>9,}{match}")
+        print("\n   The streamed peak stays near one chunk however long the list is;"
+              " the client keeps every row.")
+    finally:
+        cleanup(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON documents built in PostgreSQL")
+    parser.add_argument("--sizes", default="1,10,50,100,500", help="items per order")
+    parser.add_argument("--orders-per-size", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=200, help="requests per measurement")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="run the HTTP server")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    print("=" * 72)
+    print("🧾 Server-side JSON documents vs. client-side assembly")
+    print("=" * 72)
+    try:
+        with psycopg2.connect(**DB_CONFIG) as conn:
+            sizes = [int(s) for s in args.sizes.split(",")]
+            benchmark(conn, sizes, args.orders_per_size, args.repeats)
+        conn.close()
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -142,6 +142,10 @@ def exercise_8_create_order(customer_email: str,
     3. Update book stock quantities
     4. Calculate and set total_amount
     
+    Take stock with SELECT reserve_book_stock(book_id, quantity), which
+    returns FALSE when there is not enough. A guarded UPDATE of
+    books.stock_quantity misjudges striped bestsellers (sql/inventory.sql).
+    
     If any step fails (e.g., not enough stock), rollback and return None.
     Return the order ID on success.
     """
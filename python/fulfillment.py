@@ -0,0 +1,649 @@
+"""
+Order Fulfillment Queue
+=======================
+orders.status moves pending -> processing -> shipped -> delivered, and
+until now ad-hoc scripts moved it by scanning the whole table. Here
+the orders table is its own job queue (schema in migration
+0005_fulfillment_queue):
+
+- workers claim a batch of actionable orders with FOR UPDATE SKIP
+  LOCKED, so they never wait on each other's rows. The claim goes
+  through idx_orders_actionable, a partial index that only holds
+  pending, processing and shipped orders.
+- a claim is a lease (visibility timeout): visible_at moves out by the
+  lease, and if the worker dies the order is claimable again once the
+  lease runs out. Completing a step is fenced on the lease, so a worker
+  whose lease expired cannot overwrite a newer claim.
+- a failed step is retried with exponential backoff. After
+  max_attempts the order is parked (visible_at NULL) with last_error;
+  --requeue puts parked orders back.
+- idle workers LISTEN on order_jobs. Inserting an order wakes them, and
+  otherwise they sleep until the earliest scheduled retry. No polling
+  loop.
+- a pool of worker processes, one connection each, and a benchmark that
+  drains millions of pending orders with 1, 2, 4, ... workers
+
+How to run:
+  Apply the migration first:
+  cd python && alembic upgrade head
+
+  Windows:  python fulfillment.py --workers 4
+  macOS:    python3 fulfillment.py --workers 4
+
+  Queue depth, parked orders, and putting them back:
+  python3 fulfillment.py --status
+  python3 fulfillment.py --requeue
+
+  Only one step (e.g. a pool that just picks pending orders):
+  python3 fulfillment.py --workers 2 --statuses pending
+
+  Drain 10M pending orders with 1, 2, 4 and 8 workers:
+  python3 fulfillment.py --benchmark --orders 10000000 --worker-counts 1,2,4,8
+"""
+
+import argparse
+import multiprocessing
+import queue
+import random
+import select
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2 import sql
+
+from maintenance import Recommendation
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+CHANNEL = "order_jobs"
+
+# Status -> the status a completed step moves the order to
+NEXT_STATUS = {
+    "pending": "processing",
+    "processing": "shipped",
+    "shipped": "delivered",
+}
+ACTIONABLE = tuple(NEXT_STATUS)
+
+BATCH_SIZE = 100
+LEASE = 30.0            # seconds a claim stays invisible to other workers
+MAX_ATTEMPTS = 5        # claims per step before the order is parked
+RETRY_BASE = 2.0        # seconds before the first retry, doubled per attempt
+IDLE_CHECK = 30.0       # longest sleep without a NOTIFY (safety net only)
+MIN_WAIT = 0.01         # ready orders exist but are all locked by other workers
+
+# Queue tables take an update per step, so they need vacuum early
+QUEUE_TABLE_SETTINGS = {
+    "fillfactor": "80",
+    "autovacuum_vacuum_scale_factor": "0.01",
+    "autovacuum_vacuum_threshold": "1000",
+    "autovacuum_analyze_scale_factor": "0.02",
+}
+
+BENCH_TABLE = "fulfillment_bench"
+
+
+# ==============================================
+# The queue
+# ==============================================
+
+@dataclass
+class Job:
+    order_id: int
+    status: str
+    attempts: int
+
+
+@dataclass
+class QueueConfig:
+    table: str = "orders"
+    statuses: Tuple[str, ...] = ACTIONABLE
+    batch_size: int = BATCH_SIZE
+    lease: float = LEASE
+    max_attempts: int = MAX_ATTEMPTS
+    retry_base: float = RETRY_BASE
+
+
+class OrderQueue:
+    """Claim, complete and retry order steps on one connection.
+
+    The connection must be in autocommit mode: a claim commits its
+    lease right away, and the step itself runs outside any transaction.
+    """
+
+    def __init__(self, conn, worker: str, config: Optional[QueueConfig] = None):
+        config = config or QueueConfig()
+        unknown = set(config.statuses) - set(ACTIONABLE)
+        if unknown:
+            raise ValueError(f"Not an actionable status: {', '.join(sorted(unknown))}")
+        self.conn = conn
+        self.worker = worker
+        self.config = config
+
+        table = sql.Identifier(config.table)
+        statuses = sql.SQL(", ").join(map(sql.Literal, config.statuses))
+        next_status = sql.SQL(" ").join(
+            sql.SQL("WHEN {} THEN {}").format(sql.Literal(s), sql.Literal(n))
+            for s, n in NEXT_STATUS.items())
+
+        def compose(query: str) -> str:
+            return sql.SQL(query).format(table=table, statuses=statuses,
+                                         next_status=next_status).as_string(conn)
+
+        # ORDER BY visible_at walks idx_orders_actionable from the oldest
+        # ready order; SKIP LOCKED steps over rows another claim is taking
+        self._claim = compose("""
+            WITH batch AS (
+                SELECT id FROM {table}
+                WHERE status IN ({statuses}) AND visible_at <= now()
+                ORDER BY visible_at
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE {table} o
+            SET visible_at = now() + make_interval(secs => %(lease)s),
+                attempts = o.attempts + 1,
+                claimed_by = %(worker)s
+            FROM batch
+            WHERE o.id = batch.id
+            RETURNING o.id, o.status, o.attempts
+        """)
+        # Each update is fenced on the lease it was claimed with: same
+        # worker, same step, same attempt
+        self._complete = compose("""
+            UPDATE {table} o
+            SET status = CASE o.status {next_status} END,
+                visible_at = now(), attempts = 0, claimed_by = NULL,
+                last_error = NULL, updated_at = now()
+            FROM unnest(%(ids)s::int[], %(statuses)s::text[], %(attempts)s::int[])
+                AS v(id, status, attempts)
+            WHERE o.id = v.id AND o.status = v.status AND o.attempts = v.attempts
+              AND o.claimed_by = %(worker)s
+        """)
+        self._fail = compose("""
+            UPDATE {table} o
+            SET visible_at = CASE WHEN o.attempts >= %(max_attempts)s THEN NULL
+                    ELSE now() + make_interval(secs => %(base)s * 2 ^ (o.attempts - 1)) END,
+                claimed_by = NULL, last_error = v.error
+            FROM unnest(%(ids)s::int[], %(statuses)s::text[], %(attempts)s::int[],
+                        %(errors)s::text[]) AS v(id, status, attempts, error)
+            WHERE o.id = v.id AND o.status = v.status AND o.attempts = v.attempts
+              AND o.claimed_by = %(worker)s
+        """)
+        self._release = compose("""
+            UPDATE {table} o
+            SET visible_at = now(), attempts = o.attempts - 1, claimed_by = NULL
+            FROM unnest(%(ids)s::int[], %(statuses)s::text[], %(attempts)s::int[])
+                AS v(id, status, attempts)
+            WHERE o.id = v.id AND o.status = v.status AND o.attempts = v.attempts
+              AND o.claimed_by = %(worker)s
+        """)
+        # Live leases are left out: their worker moves the order on itself
+        self._next_ready = compose("""
+            SELECT EXTRACT(EPOCH FROM min(visible_at) - now())::float8 FROM {table}
+            WHERE status IN ({statuses}) AND visible_at IS NOT NULL
+              AND (claimed_by IS NULL OR visible_at <= now())
+        """)
+
+    def _fenced(self, query: str, jobs: List[Job], **params) -> int:
+        if not jobs:
+            return 0
+        with self.conn.cursor() as cur:
+            cur.execute(query, dict(params, worker=self.worker,
+                                    ids=[j.order_id for j in jobs],
+                                    statuses=[j.status for j in jobs],
+                                    attempts=[j.attempts for j in jobs]))
+            return cur.rowcount
+
+    def claim(self, limit: Optional[int] = None) -> List[Job]:
+        """Lease up to `limit` ready orders.
+
+        Orders that already used up their attempts (their worker kept
+        dying) are parked instead of returned.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute(self._claim, {"limit": limit or self.config.batch_size,
+                                      "lease": self.config.lease, "worker": self.worker})
+            jobs = [Job(*row) for row in cur.fetchall()]
+        expired = [j for j in jobs if j.attempts > self.config.max_attempts]
+        if expired:
+            self.fail(expired, {j.order_id: "lease expired too often" for j in expired})
+        return [j for j in jobs if j.attempts <= self.config.max_attempts]
+
+    def complete(self, jobs: List[Job]) -> int:
+        """Move each order to its next status; returns orders still leased to us."""
+        return self._fenced(self._complete, jobs)
+
+    def fail(self, jobs: List[Job], errors: Dict[int, str]) -> int:
+        """Schedule a retry, or park orders that ran out of attempts."""
+        return self._fenced(self._fail, jobs, max_attempts=self.config.max_attempts,
+                            base=self.config.retry_base,
+                            errors=[errors.get(j.order_id, "") for j in jobs])
+
+    def release(self, jobs: List[Job]) -> int:
+        """Hand unfinished orders back right away, without using up an attempt."""
+        return self._fenced(self._release, jobs)
+
+    def next_ready_in(self) -> Optional[float]:
+        """Seconds until the next unleased order is ready (<= 0: now).
+
+        None when every remaining order is leased, parked or done. Leases
+        that expire because their worker died are caught by IDLE_CHECK.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute(self._next_ready)
+            return cur.fetchone()[0]
+
+    def listen(self):
+        with self.conn.cursor() as cur:
+            cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(CHANNEL)))
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep until a NOTIFY for our table or `timeout` seconds; True if notified."""
+        deadline = time.monotonic() + timeout
+        while True:
+            notified = any(n.payload == self.config.table for n in self.conn.notifies)
+            self.conn.notifies.clear()
+            if notified:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if select.select([self.conn], [], [], remaining) != ([], [], []):
+                self.conn.poll()
+
+
+def notify(cur, table: str = "orders"):
+    """Wake idle workers of `table` (the insert trigger does this for new orders)."""
+    cur.execute("SELECT pg_notify(%s, %s);", (CHANNEL, table))
+
+
+# ==============================================
+# Workers
+# ==============================================
+
+@dataclass
+class WorkerConfig(QueueConfig):
+    work_ms: float = 0.0        # simulated time per order step
+    fail_rate: float = 0.0      # share of steps that fail and get retried
+    drain: bool = False         # exit once nothing is left to claim
+    seed: Optional[int] = None
+
+
+@dataclass
+class WorkerStats:
+    worker: str
+    completed: int = 0
+    failed: int = 0
+    lost: int = 0               # leases that expired before the step finished
+    batches: int = 0
+    wakeups: int = 0            # woken by NOTIFY
+    error: Optional[str] = None
+
+
+Handler = Callable[[List[Job], WorkerConfig, random.Random], Dict[int, str]]
+
+
+def simulate_step(jobs: List[Job], config: WorkerConfig, rng: random.Random) -> Dict[int, str]:
+    """Stand-in for picking, shipping and delivery tracking.
+
+    Returns {order_id: error} for the steps that failed. A real handler
+    calls the warehouse or carrier here and must be idempotent: after a
+    lost lease the same step can run twice.
+    """
+    if config.work_ms:
+        time.sleep(config.work_ms * len(jobs) / 1000)
+    return {j.order_id: f"simulated failure in {j.status}"
+            for j in jobs if rng.random() < config.fail_rate}
+
+
+def _worker_loop(worker_id: int, config: WorkerConfig, handler: Handler,
+                 progress, stop, results):
+    """One worker process: claim, run the step, record the outcome, repeat."""
+    stats = WorkerStats(f"fulfillment-{worker_id}")
+    rng = random.Random(None if config.seed is None else config.seed + worker_id)
+    jobs: List[Job] = []
+    conn = None
+    try:
+        conn = psycopg2.connect(application_name=stats.worker, **DB_CONFIG)
+        conn.autocommit = True
+        order_queue = OrderQueue(conn, stats.worker, config)
+        order_queue.listen()
+
+        while not stop.is_set():
+            jobs = order_queue.claim()
+            if jobs:
+                try:
+                    failures = handler(jobs, config, rng)
+                except Exception as e:
+                    failures = {j.order_id: f"{type(e).__name__}: {e}" for j in jobs}
+                done = [j for j in jobs if j.order_id not in failures]
+                failed = [j for j in jobs if j.order_id in failures]
+                completed = order_queue.complete(done)
+                retried = order_queue.fail(failed, failures)
+                jobs = []
+
+                stats.batches += 1
+                stats.completed += completed
+                stats.failed += retried
+                stats.lost += len(done) + len(failed) - completed - retried
+                with progress.get_lock():
+                    progress.value += completed
+                continue
+
+            delay = order_queue.next_ready_in()
+            if delay is None and config.drain:
+                break
+            timeout = IDLE_CHECK if delay is None else min(max(delay, MIN_WAIT), IDLE_CHECK)
+            stats.wakeups += order_queue.wait(timeout)
+    except KeyboardInterrupt:
+        pass
+    except psycopg2.Error as e:
+        stats.error = str(e).strip()
+    finally:
+        if conn is not None:
+            try:
+                if jobs and not conn.closed:
+                    order_queue.release(jobs)
+            except psycopg2.Error:
+                pass    # the leases expire on their own
+            conn.close()
+        results.put(stats)
+
+
+@dataclass
+class PoolReport:
+    workers: List[WorkerStats]
+    elapsed: float
+
+    @property
+    def completed(self) -> int:
+        return sum(w.completed for w in self.workers)
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def total(self, name: str) -> int:
+        return sum(getattr(w, name) for w in self.workers)
+
+    @property
+    def errors(self) -> List[str]:
+        return [f"{w.worker}: {w.error}" for w in self.workers if w.error]
+
+
+def run_pool(workers: int, config: WorkerConfig, handler: Handler = simulate_step,
+             report_every: float = 5.0, expected: Optional[int] = None) -> PoolReport:
+    """Run `workers` processes until Ctrl+C, or until drained with config.drain.
+
+    The handler must be defined at module level so it can be pickled.
+    """
+    ctx = multiprocessing.get_context()
+    progress = ctx.Value("q", 0)
+    stop = ctx.Event()
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker_loop, daemon=True,
+                             args=(i, config, handler, progress, stop, results))
+                 for i in range(workers)]
+
+    start = time.monotonic()
+    for process in processes:
+        process.start()
+
+    stats = []
+    last_report, last_done = start, 0
+    while len(stats) < workers:
+        try:
+            stats.append(results.get(timeout=report_every))
+        except queue.Empty:
+            pass
+        except KeyboardInterrupt:
+            stop.set()
+            continue
+
+        now = time.monotonic()
+        if report_every and now - last_report >= report_every:
+            done = progress.value
+            line = f"   ⏳ {done:,} steps, {(done - last_done) / (now - last_report):,.0f}/s"
+            if expected:
+                line += f" ({100 * done / expected:.1f}%)"
+            print(line, flush=True)
+            last_report, last_done = now, done
+
+    for process in processes:
+        process.join()
+    return PoolReport(stats, time.monotonic() - start)
+
+
+def print_pool_report(report: PoolReport):
+    print(f"\n   {'Worker':<16} {'Steps':>10} {'Failed':>8} {'Lost':>6} {'Batches':>9} {'Wakeups':>8}")
+    for w in sorted(report.workers, key=lambda w: w.worker):
+        print(f"   {w.worker:<16} {w.completed:>10,} {w.failed:>8,} {w.lost:>6,} "
+              f"{w.batches:>9,} {w.wakeups:>8,}")
+    print(f"\n   {report.completed:,} steps in {report.elapsed:.1f}s "
+          f"({report.throughput:,.0f} steps/s)")
+    for error in report.errors:
+        print(f"   ❌ {error}")
+
+
+# ==============================================
+# Operations
+# ==============================================
+
+def has_queue_columns(cur, table: str = "orders") -> bool:
+    cur.execute("""
+        SELECT count(*) = 4 FROM information_schema.columns
+        WHERE table_name = %s
+          AND column_name IN ('visible_at', 'attempts', 'claimed_by', 'last_error');
+    """, (table,))
+    return cur.fetchone()[0]
+
+
+def print_status(cur, table: str = "orders"):
+    """Queue depth per status: ready, leased, waiting to retry, parked."""
+    cur.execute(sql.SQL("""
+        SELECT status,
+               count(*) FILTER (WHERE visible_at <= now()) AS ready,
+               count(*) FILTER (WHERE visible_at > now() AND claimed_by IS NOT NULL) AS leased,
+               count(*) FILTER (WHERE visible_at > now() AND claimed_by IS NULL) AS retrying,
+               count(*) FILTER (WHERE visible_at IS NULL) AS parked,
+               EXTRACT(EPOCH FROM now() - min(visible_at) FILTER (WHERE visible_at <= now()))
+        FROM {}
+        WHERE status IN ('pending', 'processing', 'shipped')
+        GROUP BY status
+        ORDER BY array_position(ARRAY['pending', 'processing', 'shipped'], status::text)
+    """).format(sql.Identifier(table)))
+    rows = cur.fetchall()
+
+    print(f"\n📦 Fulfillment queue ({table})")
+    if not rows:
+        print("   Nothing to do")
+        return
+    print(f"   {'Status':<12} {'Ready':>9} {'Leased':>8} {'Retrying':>9} {'Parked':>8} {'Oldest':>9}")
+    for status, ready, leased, retrying, parked, oldest in rows:
+        age = f"{oldest:.0f}s" if oldest is not None else "-"
+        print(f"   {status:<12} {ready:>9,} {leased:>8,} {retrying:>9,} {parked:>8,} {age:>9}")
+
+    cur.execute(sql.SQL("""
+        SELECT id, status, attempts, last_error FROM {}
+        WHERE status IN ('pending', 'processing', 'shipped') AND visible_at IS NULL
+        ORDER BY id LIMIT 10
+    """).format(sql.Identifier(table)))
+    parked = cur.fetchall()
+    if parked:
+        print("\n   Parked (run --requeue once fixed):")
+        for order_id, status, attempts, error in parked:
+            print(f"   ⛔ order {order_id} ({status}, {attempts} attempts): {error}")
+
+
+def requeue(cur, table: str = "orders") -> int:
+    """Make parked orders ready again with a fresh set of attempts."""
+    cur.execute(sql.SQL("""
+        UPDATE {} SET visible_at = now(), attempts = 0, claimed_by = NULL
+        WHERE status IN ('pending', 'processing', 'shipped') AND visible_at IS NULL
+    """).format(sql.Identifier(table)))
+    count = cur.rowcount
+    if count:
+        notify(cur, table)
+    return count
+
+
+# ==============================================
+# Benchmark
+# ==============================================
+
+def setup_bench(conn, orders: int):
+    """(Re)create the benchmark table with `orders` pending orders.
+
+    A copy of orders, so the real table, its triggers and the sales
+    rollups are left alone. Indexes are built after the load.
+    """
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("""
+            DROP TABLE IF EXISTS {table};
+            CREATE TABLE {table} (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+            ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT;
+        """).format(table=sql.Identifier(BENCH_TABLE)))
+        cur.execute(Recommendation(BENCH_TABLE, QUEUE_TABLE_SETTINGS).statement())
+        cur.execute(sql.SQL("""
+            INSERT INTO {} (id, customer_id, status, total_amount)
+            SELECT g, 1 + g %% 1000, 'pending', 25 FROM generate_series(1, %s) g
+        """).format(sql.Identifier(BENCH_TABLE)), (orders,))
+        cur.execute(sql.SQL("""
+            ALTER TABLE {table} ADD PRIMARY KEY (id);
+            CREATE INDEX {index} ON {table} (visible_at)
+                WHERE status IN ('pending', 'processing', 'shipped');
+        """).format(table=sql.Identifier(BENCH_TABLE),
+                    index=sql.Identifier(f"idx_{BENCH_TABLE}_actionable")))
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("VACUUM (ANALYZE) {}").format(sql.Identifier(BENCH_TABLE)))
+    conn.autocommit = False
+
+
+def bench_counts(cur) -> Dict[str, int]:
+    cur.execute(sql.SQL("SELECT status, count(*) FROM {} GROUP BY status")
+                .format(sql.Identifier(BENCH_TABLE)))
+    return dict(cur.fetchall())
+
+
+def benchmark(orders: int, worker_counts: Sequence[int], config: WorkerConfig):
+    """Drain `orders` pending orders once per worker count and compare throughput."""
+    config.table = BENCH_TABLE
+    config.drain = True
+    steps_per_order = len(config.statuses)
+    final = NEXT_STATUS[config.statuses[-1]]
+
+    print(f"\n🏁 Draining {orders:,} pending orders "
+          f"({' -> '.join(config.statuses + (final,))}, batch {config.batch_size})")
+    if config.work_ms or config.fail_rate:
+        print(f"   Step: {config.work_ms:g} ms per order, {config.fail_rate:.0%} failures")
+
+    conn = psycopg2.connect(application_name="fulfillment-bench", **DB_CONFIG)
+    rows = []
+    try:
+        for workers in worker_counts:
+            print(f"\n👷 {workers} worker(s): seeding...", flush=True)
+            setup_bench(conn, orders)
+            report = run_pool(workers, config, expected=orders * steps_per_order)
+
+            with conn.cursor() as cur:
+                counts = bench_counts(cur)
+            conn.commit()
+            print_pool_report(report)
+            left = orders - counts.get(final, 0)
+            if left:
+                print(f"   ⚠️  {left:,} orders did not reach '{final}' "
+                      f"({', '.join(f'{s}: {n:,}' for s, n in sorted(counts.items()))})")
+            if report.errors:
+                break
+            rows.append((workers, report))
+    finally:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(BENCH_TABLE)))
+        conn.close()
+
+    if not rows:
+        return
+    base = rows[0][1].throughput / rows[0][0]
+    print(f"\n📊 Scaling ({orders:,} orders, {steps_per_order} step(s) each)")
+    print(f"   {'Workers':>7} {'Time':>9} {'Steps/s':>10} {'Orders/s':>10} "
+          f"{'Speedup':>8} {'Efficiency':>10} {'Lost':>6}")
+    for workers, report in rows:
+        speedup = report.throughput / rows[0][1].throughput if rows[0][1].throughput else 0
+        efficiency = report.throughput / (base * workers) if base else 0
+        print(f"   {workers:>7} {report.elapsed:>8.1f}s {report.throughput:>10,.0f} "
+              f"{orders / report.elapsed:>10,.0f} {speedup:>7.2f}x {efficiency:>10.0%} "
+              f"{report.total('lost'):>6,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order fulfillment job queue")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes")
+    parser.add_argument("--statuses", default=",".join(ACTIONABLE),
+                        help="steps to work on, e.g. 'pending' or 'processing,shipped'")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--lease", type=float, default=LEASE, help="visibility timeout (s)")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    parser.add_argument("--retry-base", type=float, default=RETRY_BASE, help="first backoff (s)")
+    parser.add_argument("--work-ms", type=float, default=0.0, help="simulated step time per order")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="simulated step failures")
+    parser.add_argument("--drain", action="store_true", help="exit when nothing is left")
+    parser.add_argument("--status", action="store_true", help="show queue depth and parked orders")
+    parser.add_argument("--requeue", action="store_true", help="retry parked orders")
+    parser.add_argument("--benchmark", action="store_true", help="drain a copy of orders")
+    parser.add_argument("--orders", type=int, default=10_000_000)
+    parser.add_argument("--worker-counts", default="1,2,4,8")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = WorkerConfig(statuses=tuple(s.strip() for s in args.statuses.split(",")),
+                          batch_size=args.batch_size, lease=args.lease,
+                          max_attempts=args.max_attempts, retry_base=args.retry_base,
+                          work_ms=args.work_ms, fail_rate=args.fail_rate,
+                          drain=args.drain, seed=args.seed)
+    unknown = set(config.statuses) - set(ACTIONABLE)
+    if unknown:
+        parser.error(f"--statuses must be among {', '.join(ACTIONABLE)}")
+    config.statuses = tuple(s for s in ACTIONABLE if s in config.statuses)
+
+    print("📦 Order Fulfillment Queue")
+    print("=" * 72)
+
+    try:
+        with psycopg2.connect(application_name="fulfillment", **DB_CONFIG) as conn:
+            with conn.cursor() as cur:
+                if not has_queue_columns(cur):
+                    print("❌ orders has no queue columns; run `alembic upgrade head` first")
+                    return
+                if args.requeue:
+                    print(f"✅ Requeued {requeue(cur):,} parked order(s)")
+                if args.status:
+                    print_status(cur)
+        conn.close()
+        if args.status or args.requeue:
+            return
+
+        if args.benchmark:
+            benchmark(args.orders, [int(n) for n in args.worker_counts.split(",")], config)
+            return
+
+        print(f"👷 {args.workers} worker(s) on {', '.join(config.statuses)} "
+              f"({'until drained' if args.drain else 'Ctrl+C to stop'})")
+        print_pool_report(run_pool(args.workers, config))
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Contention-Free Inventory for Bestsellers
+=========================================
+Every order for a bestseller updates the same books row, so buyers of
+one title queue up behind a single row lock. sql/inventory.sql lets a
+book keep its stock in N "slots" instead; each order takes copies from
+any slot that nobody else has locked.
+
+This module is the Python side of that subsystem:
+- stripe() / unstripe() move a book's stock into or out of slots
+- reserve() / restock() take and add copies (never oversells)
+- create_order() is the exercise 8 order flow on top of reserve()
+- rebalance() evens out slots and refreshes books.stock_quantity
+- a benchmark with 64 concurrent buyers of one title
+
+Readers get live stock from the book_stock view (book_details, the
+ORM's Book.stock_quantity and the Prisma lessons do); books.stock_quantity
+of a striped book is only refreshed by rebalance(). Writes to the column
+are applied to the slots by a trigger, but a guarded UPDATE (WHERE
+stock_quantity >= n) checks the stale column, so orders take stock with
+reserve(). buy_with_row_lock() only runs against an unstriped book.
+
+How to run:
+  Windows:  python inventory.py --buyers 64 --slots 16
+  macOS:    python3 inventory.py --buyers 64 --slots 16
+
+  Databases created before sql/inventory.sql existed get it with:
+  python3 inventory.py --install
+"""
+
+import argparse
+import random
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import psycopg2
+
+from workload import Catalog, OutOfStock, WorkloadConfig, run_workload
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+INVENTORY_SQL = Path(__file__).resolve().parent.parent / "sql" / "inventory.sql"
+
+# Harry Potter, the bestseller in sql/init.sql
+HOT_BOOK_ID = 1
+
+
+# ==============================================
+# Setup
+# ==============================================
+
+def install(conn) -> bool:
+    """Create the inventory tables and functions if they are missing.
+
+    Returns True when sql/inventory.sql was applied.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('book_stock_slots');")
+        if cur.fetchone()[0] is not None:
+            return False
+        cur.execute(INVENTORY_SQL.read_text())
+    conn.commit()
+    return True
+
+
+# ==============================================
+# Inventory API
+# ==============================================
+# Functions taking a cursor run inside the caller's transaction;
+# functions taking a connection commit their own work.
+
+def stripe(conn, book_id: int, slots: int) -> int:
+    """Spread a book's stock over `slots` rows. Returns the total stock."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT stripe_book_stock(%s, %s);", (book_id, slots))
+        total = cur.fetchone()[0]
+    conn.commit()
+    return total
+
+
+def unstripe(conn, book_id: int) -> int:
+    """Move a book's stock back into books.stock_quantity."""
+    return stripe(conn, book_id, 0)
+
+
+def rebalance(conn, book_id: Optional[int] = None) -> int:
+    """Even out the slots of one book (or every striped book).
+
+    Each book is rebalanced in its own short transaction so the slots of
+    only one title are locked at a time. Returns the number of books.
+    """
+    with conn.cursor() as cur:
+        if book_id is None:
+            cur.execute("SELECT DISTINCT book_id FROM book_stock_slots ORDER BY book_id;")
+            book_ids = [row[0] for row in cur.fetchall()]
+        else:
+            book_ids = [book_id]
+        conn.commit()
+
+        for striped_id in book_ids:
+            cur.execute("SELECT rebalance_book_stock(%s);", (striped_id,))
+            conn.commit()
+    return len(book_ids)
+
+
+def reserve(cur, book_id: int, quantity: int) -> bool:
+    """Take copies of a book; False when there is not enough stock."""
+    cur.execute("SELECT reserve_book_stock(%s, %s);", (book_id, quantity))
+    return cur.fetchone()[0]
+
+
+def restock(cur, book_id: int, quantity: int):
+    """Add copies of a book."""
+    cur.execute("SELECT restock_book_stock(%s, %s);", (book_id, quantity))
+
+
+def live_stock(cur, book_id: int) -> Optional[int]:
+    """Current stock of a book, striped or not."""
+    cur.execute("SELECT stock_quantity FROM book_stock WHERE book_id = %s;", (book_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def create_order(conn, customer_email: str, items: List[Tuple[str, int]]) -> Optional[int]:
+    """Create an order for [(isbn, quantity), ...] in one transaction.
+
+    Same contract as exercise_8_create_order: returns the order id, or
+    None (after rolling back) when a book is unknown or out of stock.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM customers WHERE email = %s;", (customer_email,))
+            customer = cur.fetchone()
+            if customer is None:
+                conn.rollback()
+                return None
+
+            cur.execute("""
+                INSERT INTO orders (customer_id, status, total_amount)
+                VALUES (%s, 'pending', 0)
+                RETURNING id;
+            """, (customer[0],))
+            order_id = cur.fetchone()[0]
+
+            # Look up all books first, then reserve in id order so two
+            # orders for the same titles cannot deadlock. A title listed
+            # twice is reserved once: a second reservation could hold one
+            # slot while waiting for the others (see reserve_book_stock).
+            books = {}
+            for isbn, quantity in items:
+                cur.execute("SELECT id, price FROM books WHERE isbn = %s;", (isbn,))
+                book = cur.fetchone()
+                if book is None:
+                    conn.rollback()
+                    return None
+                books.setdefault(book[0], (book[1], []))[1].append(quantity)
+
+            total = 0
+            for book_id, (price, quantities) in sorted(books.items()):
+                if not reserve(cur, book_id, sum(quantities)):
+                    conn.rollback()
+                    return None
+                for quantity in quantities:
+                    cur.execute("""
+                        INSERT INTO order_items (order_id, book_id, quantity, price_at_purchase)
+                        VALUES (%s, %s, %s, %s);
+                    """, (order_id, book_id, quantity, price))
+                    total += price * quantity
+
+            cur.execute("UPDATE orders SET total_amount = %s WHERE id = %s;", (total, order_id))
+        conn.commit()
+        return order_id
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+
+
+# ==============================================
+# Hot-title benchmark
+# ==============================================
+# Both buyers place a one-copy order for HOT_BOOK_ID. They differ only in
+# how stock is taken. Defined at module level so process workers can
+# pickle them.
+
+def _place_hot_order(cur, catalog: Catalog, rng: random.Random, take_stock):
+    cur.execute("""
+        INSERT INTO orders (customer_id, status, total_amount)
+        SELECT id, 'pending', 0 FROM customers WHERE id = %s
+        RETURNING id;
+    """, (catalog.customer_id(rng),))
+    row = cur.fetchone()
+    if row is None:
+        return
+    order_id = row[0]
+
+    price = take_stock(cur)
+    if price is None:
+        raise OutOfStock(HOT_BOOK_ID)
+
+    cur.execute("""
+        INSERT INTO order_items (order_id, book_id, quantity, price_at_purchase)
+        VALUES (%s, %s, 1, %s);
+    """, (order_id, HOT_BOOK_ID, price))
+    cur.execute("UPDATE orders SET total_amount = %s WHERE id = %s;", (price, order_id))
+
+
+def buy_with_row_lock(cur, catalog: Catalog, rng: random.Random):
+    """Exercise 8 flow: decrement the single books row."""
+    def take_stock(cur):
+        cur.execute("""
+            UPDATE books
+            SET stock_quantity = stock_quantity - 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND stock_quantity >= 1
+            RETURNING price;
+        """, (HOT_BOOK_ID,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    _place_hot_order(cur, catalog, rng, take_stock)
+
+
+def buy_with_slots(cur, catalog: Catalog, rng: random.Random):
+    """Same order, but stock is taken from a slot via reserve_book_stock()."""
+    def take_stock(cur):
+        if not reserve(cur, HOT_BOOK_ID, 1):
+            return None
+        cur.execute("SELECT price FROM books WHERE id = %s;", (HOT_BOOK_ID,))
+        return cur.fetchone()[0]
+
+    _place_hot_order(cur, catalog, rng, take_stock)
+
+
+def set_stock(conn, book_id: int, quantity: int, slots: int):
+    """Reset a book to an exact stock level, striped over `slots` (0 = not striped)."""
+    unstripe(conn, book_id)
+    with conn.cursor() as cur:
+        cur.execute("UPDATE books SET stock_quantity = %s WHERE id = %s;", (quantity, book_id))
+    conn.commit()
+    if slots:
+        stripe(conn, book_id, slots)
+
+
+def sold_since(conn, book_id: int, after_order_id: int) -> int:
+    """Copies of a book sold in orders newer than `after_order_id`."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT COALESCE(SUM(oi.quantity), 0)
+            FROM order_items oi
+            WHERE oi.book_id = %s AND oi.order_id > %s;
+        """, (book_id, after_order_id))
+        sold = cur.fetchone()[0]
+    conn.rollback()
+    return sold
+
+
+def last_order_id(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM orders;")
+        order_id = cur.fetchone()[0]
+    conn.rollback()
+    return order_id
+
+
+def _rebalance_loop(every: float, stop: threading.Event):
+    conn = psycopg2.connect(application_name="inventory-rebalancer", **DB_CONFIG)
+    try:
+        while not stop.wait(every):
+            rebalance(conn, HOT_BOOK_ID)
+    finally:
+        conn.close()
+
+
+def run_buyers(conn, label: str, buyer, slots: int, stock: int, buyers: int,
+               duration: float, mode: str, rebalance_every: Optional[float]) -> dict:
+    """Run `buyers` concurrent customers against the hot title and check stock."""
+    set_stock(conn, HOT_BOOK_ID, stock, slots)
+    first_order = last_order_id(conn)
+
+    stop = threading.Event()
+    rebalancer = None
+    if slots and rebalance_every:
+        rebalancer = threading.Thread(target=_rebalance_loop, args=(rebalance_every, stop),
+                                      daemon=True)
+        rebalancer.start()
+
+    config = WorkloadConfig(mix={"order": 1}, duration=duration, workers=buyers, mode=mode)
+    report = run_workload(config, operations={"order": buyer})
+
+    stop.set()
+    if rebalancer is not None:
+        rebalancer.join()
+
+    # No oversell: every copy sold is accounted for and none went negative
+    sold = sold_since(conn, HOT_BOOK_ID, first_order)
+    with conn.cursor() as cur:
+        remaining = live_stock(cur, HOT_BOOK_ID)
+        cur.execute("SELECT COUNT(*) FROM book_stock_slots WHERE quantity < 0;")
+        negative_slots = cur.fetchone()[0]
+    conn.rollback()
+
+    stats = report.per_operation().get("order", {})
+    ok = sum(1 for s in report.samples if s[4] == "ok")
+    return {
+        "label": label,
+        "orders_per_sec": ok / report.elapsed,
+        "p50": stats.get("p50", float("nan")),
+        "p99": stats.get("p99", float("nan")),
+        "sold": sold,
+        "remaining": remaining,
+        "consistent": sold + remaining == stock and remaining >= 0 and negative_slots == 0,
+    }
+
+
+def benchmark(buyers: int, slots: int, duration: float, mode: str,
+              rebalance_every: Optional[float]):
+    """Compare the single-row flow with striped stock, then test sell-out."""
+    print("=" * 72)
+    print(f"🔥 Hot-title benchmark: {buyers} buyers of book {HOT_BOOK_ID}, {duration:g}s each")
+    print("=" * 72)
+
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT stock_quantity FROM book_stock WHERE book_id = %s;",
+                        (HOT_BOOK_ID,))
+            original = cur.fetchone()[0]
+        conn.rollback()
+
+        plenty = 10_000_000
+        results = [
+            run_buyers(conn, "single row", buy_with_row_lock, 0, plenty, buyers,
+                       duration, mode, None),
+            run_buyers(conn, f"{slots} slots", buy_with_slots, slots, plenty, buyers,
+                       duration, mode, rebalance_every),
+        ]
+
+        # Sell-out: far fewer copies than the buyers want
+        scarce = buyers * 20
+        results.append(run_buyers(conn, f"sell-out ({scarce})", buy_with_slots, slots, scarce,
+                                  buyers, min(duration, 10.0), mode, rebalance_every))
+
+        set_stock(conn, HOT_BOOK_ID, original, 0)
+    conn.close()
+
+    print(f"\n   {'run':<16} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'sold':>9}"
+          f" {'left':>9}  consistent")
+    for r in results:
+        print(f"   {r['label']:<16} {r['orders_per_sec']:>9.1f} {r['p50'] * 1000:>8.1f}"
+              f" {r['p99'] * 1000:>8.1f} {r['sold']:>9} {r['remaining']:>9}"
+              f"  {'✅' if r['consistent'] else '❌'}")
+
+    speedup = results[1]["orders_per_sec"] / max(results[0]["orders_per_sec"], 1e-9)
+    print(f"\n🚀 Striped stock: {speedup:.1f}x the orders/s of a single row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Striped inventory for hot titles")
+    parser.add_argument("--install", action="store_true",
+                        help="apply sql/inventory.sql to an existing database")
+    parser.add_argument("--buyers", type=int, default=64)
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--mode", choices=("thread", "process"), default="thread")
+    parser.add_argument("--rebalance-every", type=float, default=1.0,
+                        help="seconds between rebalances during striped runs (0 = never)")
+    args = parser.parse_args()
+
+    try:
+        if args.install:
+            with psycopg2.connect(**DB_CONFIG) as conn:
+                applied = install(conn)
+            conn.close()
+            print("✅ Inventory installed" if applied else "⚠️ Inventory already installed")
+        else:
+            benchmark(args.buyers, args.slots, args.duration, args.mode,
+                      args.rebalance_every or None)
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
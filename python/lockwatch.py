@@ -0,0 +1,703 @@
+"""
+Lock Contention Diagnostics
+===========================
+When order placement and stock updates slow down, find out who blocks
+whom. A sampler thread polls pg_stat_activity, pg_locks and
+pg_blocking_pids() every few milliseconds while the load runs and:
+
+- builds blocking trees: the head blocker (often a session sitting
+  "idle in transaction") with everyone queued behind it
+- attributes every wait to the application function that sent the
+  statement, read from a /* fn=... */ query comment or, failing that,
+  the connection's application_name
+- prints a timeline of waiting sessions and wait times, a table of who
+  waited on whom, and alerts as soon as a lock wait crosses the warning
+  or critical threshold
+
+Tag statements so waits point at functions instead of connections:
+- TaggedCursor(cur, "update_book_price") comments every statement
+- with traced("exercise_8_create_order"): ... tags everything sent
+  through a TaggingCursor or an engine passed to tag_engine()
+
+How to run:
+  Windows:  python lockwatch.py --demo --duration 20
+  macOS:    python3 lockwatch.py --demo --duration 20
+
+  Watch whatever load is running (e.g. workload.py in another terminal):
+  python3 lockwatch.py --duration 60 --interval 0.05 --warn-ms 100 --crit-ms 500
+"""
+
+import argparse
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from inventory import HOT_BOOK_ID, buy_with_row_lock
+from workload import WorkloadConfig, run_workload
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+# The comment every tagged statement starts with, and how it is read back
+FUNCTION_COMMENT = re.compile(r"/\*\s*fn=([\w.:-]+)\s*\*/")
+
+WARNING = "warning"
+CRITICAL = "critical"
+
+
+# ==============================================
+# Tagging statements
+# ==============================================
+
+_current_function: ContextVar[Optional[str]] = ContextVar("lockwatch_function", default=None)
+
+
+def annotate(sql: str, function: Optional[str] = None) -> str:
+    """Prefix `sql` with a /* fn=... */ comment for `function`.
+
+    Without `function` the one set by traced() is used; untagged SQL is
+    returned unchanged.
+    """
+    function = function or _current_function.get()
+    if not function or not isinstance(sql, str):
+        return sql
+    # Keep the comment parseable (and impossible to close early)
+    safe = re.sub(r"[^\w.:-]", "_", function)
+    return f"/* fn={safe} */ {sql}"
+
+
+@contextmanager
+def traced(function: str):
+    """Tag statements sent inside the block with `function`.
+
+    Also works as a decorator: @traced("update_with_orm").
+    """
+    token = _current_function.set(function)
+    try:
+        yield
+    finally:
+        _current_function.reset(token)
+
+
+class TaggingCursor(psycopg2.extensions.cursor):
+    """Cursor that comments each statement with the traced() function.
+
+    psycopg2.connect(cursor_factory=TaggingCursor, **DB_CONFIG)
+    """
+
+    def execute(self, query, vars=None):
+        return super().execute(annotate(query), vars)
+
+    def executemany(self, query, vars_list):
+        return super().executemany(annotate(query), vars_list)
+
+
+class TaggedCursor:
+    """Wrap an existing cursor so its statements are tagged with `function`."""
+
+    def __init__(self, cursor, function: str):
+        self._cursor = cursor
+        self._function = function
+
+    def execute(self, query, vars=None):
+        return self._cursor.execute(annotate(query, self._function), vars)
+
+    def executemany(self, query, vars_list):
+        return self._cursor.executemany(annotate(query, self._function), vars_list)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def tag_engine(engine):
+    """Comment the SQL of a SQLAlchemy engine with the traced() function."""
+    from sqlalchemy import event
+
+    def comment(conn, cursor, statement, parameters, context, executemany):
+        return annotate(statement), parameters
+
+    event.listen(engine, "before_cursor_execute", comment, retval=True)
+    return engine
+
+
+def attribute(application_name: Optional[str], query: Optional[str]) -> str:
+    """Name of the function behind a session: query comment, else application_name."""
+    match = FUNCTION_COMMENT.search(query or "")
+    if match:
+        return match.group(1)
+    return application_name or "unknown"
+
+
+# ==============================================
+# Sampling
+# ==============================================
+# One round trip per sample. pg_blocking_pids() briefly locks the lock
+# manager, so it is only called for sessions that wait on a lock.
+# Waits are measured from query_start, not pg_locks.waitstart: a
+# statement queued behind several row lock holders gets a new waitstart
+# each time the lock changes hands, which would split one wait into
+# several short episodes.
+
+SAMPLE_SQL = """
+    SELECT a.pid,
+           a.application_name,
+           a.backend_type,
+           a.state,
+           a.wait_event_type,
+           a.wait_event,
+           a.query,
+           EXTRACT(EPOCH FROM now() - a.xact_start)::float8 AS xact_age,
+           w.locktype,
+           w.relation,
+           w.mode,
+           a.query_start,
+           EXTRACT(EPOCH FROM now() - a.query_start)::float8 AS lock_wait,
+           CASE WHEN a.wait_event_type = 'Lock' THEN pg_blocking_pids(a.pid) END AS blocked_by
+    FROM pg_stat_activity a
+    LEFT JOIN LATERAL (
+        SELECT l.locktype, l.relation::regclass::text AS relation, l.mode
+        FROM pg_locks l
+        WHERE l.pid = a.pid AND NOT l.granted
+        LIMIT 1
+    ) w ON a.wait_event_type = 'Lock'
+    WHERE a.datname = current_database()
+      AND a.pid <> pg_backend_pid();
+"""
+
+
+@dataclass
+class Session:
+    """One backend as seen in one sample."""
+    pid: int
+    application: str
+    function: str
+    state: Optional[str]
+    wait_event: Optional[str]
+    query: str
+    xact_age: Optional[float]
+    lock: Optional[str] = None           # e.g. "ShareLock on transactionid"
+    query_start: Optional[datetime] = None
+    lock_wait: float = 0.0               # seconds waited on `lock` so far
+    blocked_by: Tuple[int, ...] = ()
+
+    @property
+    def waiting(self) -> bool:
+        return bool(self.blocked_by)
+
+
+@dataclass
+class Snapshot:
+    at: float                            # seconds since the watch started
+    sessions: Dict[int, Session]
+
+    def waiters(self) -> List[Session]:
+        return [s for s in self.sessions.values() if s.waiting]
+
+    def blocker_of(self, session: Session) -> Optional[Session]:
+        """The first blocker of `session` that is still in this sample."""
+        for pid in session.blocked_by:
+            if pid in self.sessions:
+                return self.sessions[pid]
+        return None
+
+    def head_blocker(self, session: Session) -> Session:
+        """Follow the chain of blockers up to the session nobody blocks."""
+        seen = {session.pid}
+        while True:
+            blocker = self.blocker_of(session)
+            if blocker is None or blocker.pid in seen:
+                return session
+            seen.add(blocker.pid)
+            session = blocker
+
+    def blame(self, waiter: Session) -> str:
+        """Function of the head blocker, or its pid when it was not sampled."""
+        head = self.head_blocker(waiter)
+        if head is waiter:
+            return f"pid {waiter.blocked_by[0]}"
+        return head.function
+
+
+def describe_lock(locktype: Optional[str], mode: Optional[str],
+                  relation: Optional[str]) -> Optional[str]:
+    if locktype is None:
+        return None
+    target = f"{locktype} of {relation}" if relation and locktype != "relation" else \
+        relation or locktype
+    return f"{mode} on {target}"
+
+
+def take_snapshot(cur, started: float) -> Snapshot:
+    """Read every session of this database and what it waits for."""
+    cur.execute(SAMPLE_SQL)
+    at = time.monotonic() - started
+    sessions = {}
+    for (pid, application, backend_type, state, wait_type, wait_event, query, xact_age,
+         locktype, relation, mode, query_start, lock_wait, blocked_by) in cur.fetchall():
+        waiting = bool(blocked_by)
+        sessions[pid] = Session(
+            pid=pid,
+            application=application or "",
+            # Autovacuum and other background workers have no application_name
+            function=attribute(application or backend_type, query),
+            state=state,
+            wait_event=f"{wait_type}:{wait_event}" if wait_type else None,
+            query=query or "",
+            xact_age=xact_age,
+            lock=describe_lock(locktype, mode, relation),
+            query_start=query_start if waiting else None,
+            lock_wait=(lock_wait or 0.0) if waiting else 0.0,
+            blocked_by=tuple(blocked_by or ()),
+        )
+    return Snapshot(at, sessions)
+
+
+# ==============================================
+# Blocking trees
+# ==============================================
+
+def short_query(query: str, width: int = 60) -> str:
+    text = " ".join(FUNCTION_COMMENT.sub("", query).split())
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def _session_line(session: Session) -> str:
+    if session.waiting:
+        what = f"waits {session.lock_wait * 1000:.0f} ms for {session.lock or session.wait_event}"
+    else:
+        age = f", xact {session.xact_age:.2f}s" if session.xact_age is not None else ""
+        what = f"{session.state}{age}"
+    return f"pid {session.pid} [{session.function}] {what}: {short_query(session.query)}"
+
+
+def blocking_trees(snapshot: Snapshot) -> Dict[int, List[str]]:
+    """Render each blocking tree of a sample, keyed by head pid, biggest first.
+
+    A waiter blocked by several sessions is drawn under the first one
+    and lists the others.
+    """
+    children = defaultdict(list)
+    for waiter in snapshot.waiters():
+        blocker = snapshot.blocker_of(waiter)
+        if blocker is not None:
+            children[blocker.pid].append(waiter)
+
+    def line(session: Session) -> str:
+        blocker = snapshot.blocker_of(session)
+        others = [str(pid) for pid in session.blocked_by
+                  if blocker is not None and pid != blocker.pid]
+        also = f"  (also behind {', '.join(others)})" if others else ""
+        return _session_line(session) + also
+
+    def walk(session: Session, prefix: str, lines: List[str], seen: set):
+        kids = [k for k in children.get(session.pid, []) if k.pid not in seen]
+        kids.sort(key=lambda s: -s.lock_wait)
+        for i, kid in enumerate(kids):
+            last = i == len(kids) - 1
+            seen.add(kid.pid)
+            lines.append(prefix + ("└─ " if last else "├─ ") + line(kid))
+            walk(kid, prefix + ("   " if last else "│  "), lines, seen)
+
+    trees = {}
+    for head in {snapshot.head_blocker(w).pid for w in snapshot.waiters()}:
+        lines = [line(snapshot.sessions[head])]
+        walk(snapshot.sessions[head], "", lines, {head})
+        trees[head] = lines
+    return dict(sorted(trees.items(), key=lambda item: -len(item[1])))
+
+
+# ==============================================
+# Watching
+# ==============================================
+
+@dataclass
+class WaitEpisode:
+    """One lock wait of one session, followed across samples."""
+    pid: int
+    function: str
+    lock: Optional[str]
+    blocker: str                         # function of the head blocker
+    first_seen: float
+    waited: float = 0.0                  # longest wait observed (seconds)
+
+
+@dataclass
+class Alert:
+    at: float
+    level: str
+    session: Session
+    blocker: str                         # function of the head blocker
+    tree: List[str] = field(default_factory=list)
+
+    def print(self):
+        icon = "🔥" if self.level == CRITICAL else "⚠️"
+        print(f"{icon} [{self.at:6.2f}s] {self.level}: pid {self.session.pid} "
+              f"({self.session.function}) has waited {self.session.lock_wait * 1000:.0f} ms "
+              f"for {self.session.lock or self.session.wait_event}, "
+              f"held up by {self.blocker}")
+        for line in self.tree:
+            print(f"      {line}")
+
+
+class LockWatch:
+    """Sample lock waits in a background thread until stop() is called.
+
+        with LockWatch(interval=0.05) as watch:
+            run_load()
+        watch.report.print_summary()
+    """
+
+    def __init__(self, db_config: Dict = DB_CONFIG, interval: float = 0.1,
+                 warn_ms: float = 200, crit_ms: float = 1000,
+                 on_alert: Optional[Callable[[Alert], None]] = Alert.print):
+        self.db_config = db_config
+        self.interval = interval
+        self.warn = warn_ms / 1000
+        self.crit = crit_ms / 1000
+        self.on_alert = on_alert
+        self.snapshots: List[Snapshot] = []
+        self.episodes: Dict[Tuple[int, datetime], WaitEpisode] = {}
+        self.alerts: List[Alert] = []
+        self.report: Optional["LockReport"] = None
+        self._alerted: Dict[Tuple[int, datetime], str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._error: Optional[Exception] = None
+
+    def start(self) -> "LockWatch":
+        # Connect here so a bad connection fails before the load starts
+        conn = psycopg2.connect(application_name="lockwatch", **self.db_config)
+        # Autocommit: each sample gets a fresh pg_stat_activity and now()
+        conn.autocommit = True
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, args=(conn,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "LockReport":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        self.report = LockReport(self.snapshots, list(self.episodes.values()), self.alerts,
+                                 self.interval, time.monotonic() - self._started,
+                                 self.warn, self.crit)
+        return self.report
+
+    def __enter__(self) -> "LockWatch":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self, conn):
+        next_at = time.monotonic()
+        try:
+            with conn.cursor() as cur:
+                while not self._stop.is_set():
+                    self._observe(take_snapshot(cur, self._started))
+                    next_at += self.interval
+                    self._stop.wait(max(0.0, next_at - time.monotonic()))
+        except psycopg2.Error as e:
+            self._error = e
+        finally:
+            conn.close()
+
+    def _observe(self, snapshot: Snapshot):
+        self.snapshots.append(snapshot)
+        trees = None
+        shown = set()                    # print each tree once per sample
+        for waiter in snapshot.waiters():
+            blocker = snapshot.blame(waiter)
+            key = (waiter.pid, waiter.query_start)
+            episode = self.episodes.get(key)
+            if episode is None:
+                episode = self.episodes[key] = WaitEpisode(
+                    waiter.pid, waiter.function, waiter.lock, blocker, snapshot.at)
+            episode.waited = max(episode.waited, waiter.lock_wait)
+
+            level = CRITICAL if waiter.lock_wait >= self.crit else \
+                WARNING if waiter.lock_wait >= self.warn else None
+            # Alert once per level, so a wait can go from warning to critical
+            if level is None or self._alerted.get(key) in (level, CRITICAL):
+                continue
+            self._alerted[key] = level
+            if trees is None:
+                trees = blocking_trees(snapshot)
+            head = snapshot.head_blocker(waiter).pid
+            tree = [] if head in shown else trees.get(head, [])
+            shown.add(head)
+            alert = Alert(snapshot.at, level, waiter, blocker, tree)
+            self.alerts.append(alert)
+            if self.on_alert is not None:
+                self.on_alert(alert)
+
+
+# ==============================================
+# Reporting
+# ==============================================
+
+class LockReport:
+    """Timeline and attribution computed from the samples of one watch.
+
+    Wait times run from the query_start of the waiting statement: a row
+    lock wait resets pg_locks.waitstart each time the lock passes to the
+    next holder, while the statement keeps waiting. They include any time
+    the statement ran before it blocked, so they are upper bounds, and
+    waits shorter than the interval can be missed.
+    """
+
+    def __init__(self, snapshots: List[Snapshot], episodes: List[WaitEpisode],
+                 alerts: List[Alert], interval: float, elapsed: float,
+                 warn: float, crit: float):
+        self.snapshots = snapshots
+        self.episodes = episodes
+        self.alerts = alerts
+        self.interval = interval
+        self.elapsed = elapsed
+        self.warn = warn
+        self.crit = crit
+
+    def timeline(self, bucket: float = 1.0) -> List[Dict]:
+        """Waiting sessions, longest wait and top blocker per time bucket."""
+        grouped = defaultdict(list)
+        for snapshot in self.snapshots:
+            grouped[int(snapshot.at // bucket)].append(snapshot)
+
+        rows = []
+        for index in range(int(self.elapsed // bucket) + 1):
+            snapshots = grouped.get(index, [])
+            waiting = [len(s.waiters()) for s in snapshots]
+            longest = max((w.lock_wait for s in snapshots for w in s.waiters()), default=0.0)
+            blockers = defaultdict(int)
+            for s in snapshots:
+                for w in s.waiters():
+                    blockers[s.blame(w)] += 1
+            rows.append({
+                "t": index * bucket,
+                "samples": len(snapshots),
+                "avg_waiting": sum(waiting) / len(waiting) if waiting else 0.0,
+                "peak_waiting": max(waiting, default=0),
+                "longest": longest,
+                "top_blocker": max(blockers, key=blockers.get) if blockers else "",
+            })
+        return rows
+
+    def by_function(self) -> Dict[str, Dict[str, float]]:
+        """Lock waits per waiting function: count, total and longest (seconds)."""
+        stats = defaultdict(lambda: {"waits": 0, "total": 0.0, "max": 0.0})
+        for e in self.episodes:
+            row = stats[e.function]
+            row["waits"] += 1
+            row["total"] += e.waited
+            row["max"] = max(row["max"], e.waited)
+        return dict(sorted(stats.items(), key=lambda item: -item[1]["total"]))
+
+    def who_blocks_whom(self) -> List[Tuple[str, str, int, float]]:
+        """(waiter, head blocker, waits, total seconds), worst pairs first."""
+        pairs = defaultdict(lambda: [0, 0.0])
+        for e in self.episodes:
+            pair = pairs[(e.function, e.blocker)]
+            pair[0] += 1
+            pair[1] += e.waited
+        return sorted(((w, b, n, t) for (w, b), (n, t) in pairs.items()),
+                      key=lambda row: -row[3])
+
+    def by_lock(self) -> Dict[str, int]:
+        counts = defaultdict(int)
+        for e in self.episodes:
+            counts[e.lock or "other"] += 1
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def worst_snapshot(self) -> Optional[Snapshot]:
+        """The sample with the most waiting sessions (longest wait breaks ties)."""
+        busy = [s for s in self.snapshots if s.waiters()]
+        if not busy:
+            return None
+        return max(busy, key=lambda s: (len(s.waiters()),
+                                        max(w.lock_wait for w in s.waiters())))
+
+    def print_summary(self, bucket: float = 1.0):
+        print("\n" + "=" * 72)
+        print(f"🔒 Lock waits: {len(self.snapshots)} samples every "
+              f"{self.interval * 1000:.0f} ms over {self.elapsed:.1f}s")
+        print("=" * 72)
+        critical = sum(a.level == CRITICAL for a in self.alerts)
+        print(f"   Wait episodes: {len(self.episodes)}   Alerts: {len(self.alerts)} "
+              f"({critical} critical, thresholds {self.warn * 1000:.0f}/"
+              f"{self.crit * 1000:.0f} ms)")
+
+        print(f"\n📈 Timeline ({bucket:g}s buckets):")
+        print(f"   {'t':>6} {'avg wait':>9} {'peak':>5} {'longest ms':>11}  top blocker")
+        for row in self.timeline(bucket):
+            longest = row["longest"]
+            flag = " 🔥" if longest >= self.crit else " ⚠️" if longest >= self.warn else ""
+            print(f"   {row['t']:>6.0f} {row['avg_waiting']:>9.1f} {row['peak_waiting']:>5}"
+                  f" {longest * 1000:>11.0f}  {row['top_blocker']}{flag}")
+
+        if not self.episodes:
+            print("\n✅ No session waited on a lock")
+            return
+
+        print("\n⏱️  Lock waits per function:")
+        print(f"   {'function':<28} {'waits':>6} {'total s':>8} {'max ms':>8}")
+        for name, s in self.by_function().items():
+            print(f"   {name:<28} {s['waits']:>6} {s['total']:>8.2f} {s['max'] * 1000:>8.0f}")
+
+        print("\n🧭 Who waited on whom (head blocker):")
+        print(f"   {'waiter':<28} {'blocked by':<28} {'waits':>6} {'total s':>8}")
+        for waiter, blocker, count, total in self.who_blocks_whom():
+            print(f"   {waiter:<28} {blocker:<28} {count:>6} {total:>8.2f}")
+
+        print("\n🔐 Locks waited for:")
+        for lock, count in self.by_lock().items():
+            print(f"   {count:>6}  {lock}")
+
+        worst = self.worst_snapshot()
+        print(f"\n🌳 Biggest blocking tree (t={worst.at:.2f}s, "
+              f"{len(worst.waiters())} waiting):")
+        for line in next(iter(blocking_trees(worst).values())):
+            print(f"   {line}")
+
+
+# ==============================================
+# Demo load
+# ==============================================
+# The three functions that contend for the bestseller's books row. `hold`
+# is application work done while the transaction still holds its locks.
+# Module-level so they also work with process workers.
+
+def demo_create_order(hold: float, cur, catalog, rng):
+    """exercise_8_create_order: decrement the books row, then finish the order."""
+    buy_with_row_lock(TaggedCursor(cur, "exercise_8_create_order"), catalog, rng)
+    time.sleep(hold)
+
+
+def demo_update_book_price(hold: float, cur, catalog, rng):
+    """update_book_price (lesson 2): read the price, write it back.
+
+    The price is written back unchanged so the catalog stays as it was.
+    """
+    cur = TaggedCursor(cur, "update_book_price")
+    cur.execute("SELECT id, price FROM books WHERE id = %s;", (HOT_BOOK_ID,))
+    book_id, price = cur.fetchone()
+    cur.execute("""
+        UPDATE books
+        SET price = %s, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s;
+    """, (price, book_id))
+    time.sleep(hold)
+
+
+def demo_update_with_orm(hold: float, cur, catalog, rng):
+    """update_with_orm (lesson 3): the statements its session flush sends."""
+    cur = TaggedCursor(cur, "update_with_orm")
+    cur.execute("""
+        SELECT books.id, books.stock_quantity
+        FROM books
+        WHERE books.id = %s;
+    """, (HOT_BOOK_ID,))
+    book_id, stock = cur.fetchone()
+    time.sleep(hold)
+    cur.execute("""
+        UPDATE books SET stock_quantity = %s, updated_at = CURRENT_TIMESTAMP
+        WHERE books.id = %s;
+    """, (stock + 10, book_id))
+
+
+DEMO_MIX = {"exercise_8_create_order": 80, "update_book_price": 10, "update_with_orm": 10}
+
+
+def run_demo(watch: LockWatch, duration: float, workers: int, hold: float, bucket: float):
+    """Run the contending functions under the watch and print both reports."""
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE books SET stock_quantity = GREATEST(stock_quantity, 100000)
+                WHERE id = %s;
+            """, (HOT_BOOK_ID,))
+    conn.close()
+
+    operations = {
+        "exercise_8_create_order": partial(demo_create_order, hold),
+        "update_book_price": partial(demo_update_book_price, hold),
+        "update_with_orm": partial(demo_update_with_orm, hold),
+    }
+    config = WorkloadConfig(mix=dict(DEMO_MIX), duration=duration, workers=workers)
+
+    print(f"🔥 {workers} workers on book {HOT_BOOK_ID} for {duration:g}s "
+          f"(hold {hold * 1000:.0f} ms per transaction)\n")
+    watch.start()
+    try:
+        workload = run_workload(config, operations=operations)
+    finally:
+        report = watch.stop()
+
+    print("\n⏱️  Latency per function (ms):")
+    print(f"   {'function':<28} {'count':>7} {'p50':>8} {'p99':>8} {'max':>8}")
+    for name, s in workload.per_operation().items():
+        print(f"   {name:<28} {s['count']:>7} {s['p50'] * 1000:>8.1f}"
+              f" {s['p99'] * 1000:>8.1f} {s['max'] * 1000:>8.1f}")
+    report.print_summary(bucket)
+
+
+# ==============================================
+# Main
+# ==============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample lock waits and blocking trees")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to watch")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between samples")
+    parser.add_argument("--bucket", type=float, default=1.0, help="timeline bucket size (s)")
+    parser.add_argument("--warn-ms", type=float, default=200, help="warning lock-wait time")
+    parser.add_argument("--crit-ms", type=float, default=1000, help="critical lock-wait time")
+    parser.add_argument("--quiet", action="store_true", help="don't print alerts as they happen")
+    parser.add_argument("--demo", action="store_true",
+                        help="generate contention on the bestseller while watching")
+    parser.add_argument("--workers", type=int, default=32, help="demo workers")
+    parser.add_argument("--hold", type=float, default=0.02,
+                        help="demo: seconds each transaction keeps its locks")
+    args = parser.parse_args()
+
+    watch = LockWatch(interval=args.interval, warn_ms=args.warn_ms, crit_ms=args.crit_ms,
+                      on_alert=None if args.quiet else Alert.print)
+
+    print("🔒 Lock Contention Diagnostics")
+    print("=" * 72)
+
+    try:
+        if args.demo:
+            run_demo(watch, args.duration, args.workers, args.hold, args.bucket)
+        else:
+            print(f"   Watching {DB_CONFIG['database']} for {args.duration:g}s "
+                  f"(Ctrl+C to stop early)\n")
+            watch.start()
+            try:
+                time.sleep(args.duration)
+            except KeyboardInterrupt:
+                pass
+            watch.stop().print_summary(args.bucket)
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+
+
+if __name__ == "__main__":
+    main()
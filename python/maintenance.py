@@ -0,0 +1,883 @@
+"""
+HOT Updates and Bloat Maintenance
+=================================
+books rows get price, stock_quantity and updated_at rewritten all day,
+and orders.status moves through five states. At the default fillfactor
+(100) every page is full, so an update cannot put the new row version
+next to the old one. It goes to another page and adds an entry to
+every index, which rules out a HOT (heap-only tuple) update. Tables and
+indexes then grow faster than vacuum can clean them.
+
+This module:
+- measures every table's HOT-update ratio, dead tuples and bloat. The
+  numbers are exact with the pgstattuple extension and estimated from
+  statistics otherwise. For every index it reports size, leaf density
+  and whether it covers a churned column; updates of such a column can
+  never be HOT.
+- recommends fillfactor and per-table autovacuum settings from the
+  measured mix of updates and inserts, and applies them with a short
+  lock_timeout (ALTER TABLE ... SET only takes a SHARE UPDATE EXCLUSIVE
+  lock)
+- repacks online, once or on a schedule: REINDEX CONCURRENTLY for
+  bloated indexes and VACUUM for tables with many dead tuples
+- benchmarks 24 simulated hours of churn on copies of books and
+  orders, first at default settings and then tuned
+
+A lower fillfactor only applies to pages written from now on. Existing
+full pages get their room back as their rows are updated and vacuumed.
+
+How to run:
+  Windows:  python maintenance.py --report
+  macOS:    python3 maintenance.py --report
+
+  Install pgstattuple for exact bloat numbers (needs a superuser):
+  python3 maintenance.py --install
+
+  Show or apply the recommended settings:
+  python3 maintenance.py --recommend
+  python3 maintenance.py --apply
+
+  Repack now, or every hour:
+  python3 maintenance.py --repack
+  python3 maintenance.py --schedule 3600
+
+  24 simulated hours of churn, default vs. tuned settings:
+  python3 maintenance.py --benchmark --hours 24 --hour-ops 20000
+"""
+
+import argparse
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+import psycopg2.errors
+from psycopg2 import sql
+
+from workload import percentile
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+# Columns the application rewrites constantly, per table
+CHURN_COLUMNS = {
+    "books": ("price", "stock_quantity", "updated_at"),
+    "orders": ("status", "updated_at"),
+}
+
+# Repack thresholds
+INDEX_BLOAT_LIMIT = 0.30      # REINDEX CONCURRENTLY above this share of wasted space
+DEAD_TUPLE_LIMIT = 0.10       # VACUUM above this share of dead rows
+
+# Maintenance statements never wait long for their locks
+LOCK_TIMEOUT = "1s"
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 0.5           # seconds, doubled after every attempt
+
+# B-tree leaf pages are filled to 90% when built
+BTREE_FILL = 90.0
+
+
+# ==============================================
+# Measuring
+# ==============================================
+
+@dataclass
+class TableHealth:
+    table: str
+    live: int
+    dead: int
+    inserts: int
+    updates: int
+    hot_updates: int
+    size: int                             # heap bytes
+    index_size: int
+    options: Dict[str, str]               # reloptions, e.g. {"fillfactor": "80"}
+    dead_pct: float                       # % of rows (estimate) or bytes (pgstattuple)
+    free_pct: Optional[float]             # % of heap that is free (pgstattuple only)
+    last_vacuum: Optional[datetime]
+    vacuums: int
+
+    @property
+    def fillfactor(self) -> int:
+        return int(self.options.get("fillfactor", 100))
+
+    @property
+    def hot_ratio(self) -> Optional[float]:
+        return self.hot_updates / self.updates if self.updates else None
+
+    @property
+    def update_share(self) -> float:
+        writes = self.inserts + self.updates
+        return self.updates / writes if writes else 0.0
+
+    @property
+    def bloat(self) -> Optional[float]:
+        """Share of the heap that is dead or free beyond the fillfactor reserve."""
+        if self.free_pct is None:
+            return None
+        wasted = self.dead_pct + self.free_pct - (100 - self.fillfactor)
+        return max(0.0, wasted) / 100
+
+
+@dataclass
+class IndexHealth:
+    index: str
+    table: str
+    size: int
+    scans: int
+    leaf_density: Optional[float]         # pgstatindex avg_leaf_density (%)
+    churned: Tuple[str, ...]              # churned columns the index covers
+    definition: str
+
+    @property
+    def bloat(self) -> Optional[float]:
+        if self.leaf_density is None:
+            return None
+        return max(0.0, 1 - self.leaf_density / BTREE_FILL)
+
+
+def has_pgstattuple(cur) -> bool:
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple';")
+    return cur.fetchone() is not None
+
+
+def install(conn) -> bool:
+    """Create the pgstattuple extension. Returns False without the privilege."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pgstattuple;")
+        conn.commit()
+        return True
+    except psycopg2.errors.InsufficientPrivilege:
+        conn.rollback()
+        return False
+
+
+def _options(reloptions: Optional[List[str]]) -> Dict[str, str]:
+    return dict(option.split("=", 1) for option in reloptions or [])
+
+
+def measure_tables(cur, tables: Sequence[str]) -> List[TableHealth]:
+    """HOT ratio, dead tuples and bloat for each table (from pg_stat_user_tables)."""
+    exact = has_pgstattuple(cur)
+    cur.execute("""
+        SELECT s.relname, s.n_live_tup, s.n_dead_tup, s.n_tup_ins, s.n_tup_upd,
+               s.n_tup_hot_upd, pg_relation_size(s.relid), pg_indexes_size(s.relid),
+               c.reloptions, GREATEST(s.last_vacuum, s.last_autovacuum),
+               s.vacuum_count + s.autovacuum_count
+        FROM pg_stat_user_tables s
+        JOIN pg_class c ON c.oid = s.relid
+        WHERE s.relid = ANY(%s::regclass[])
+        ORDER BY s.relname;
+    """, (list(tables),))
+
+    health = []
+    for (name, live, dead, inserts, updates, hot, size, index_size,
+         reloptions, last_vacuum, vacuums) in cur.fetchall():
+        health.append(TableHealth(
+            table=name, live=live, dead=dead, inserts=inserts, updates=updates,
+            hot_updates=hot, size=size, index_size=index_size,
+            options=_options(reloptions),
+            dead_pct=100 * dead / (live + dead) if live + dead else 0.0,
+            free_pct=None, last_vacuum=last_vacuum, vacuums=vacuums,
+        ))
+
+    if exact:
+        # pgstattuple_approx skips all-visible pages, so it is cheap on big tables
+        for table in health:
+            cur.execute("""
+                SELECT dead_tuple_percent, approx_free_percent
+                FROM pgstattuple_approx(%s::regclass);
+            """, (table.table,))
+            table.dead_pct, table.free_pct = cur.fetchone()
+    return health
+
+
+def _covered_columns(definition: str, columns: Sequence[str]) -> Tuple[str, ...]:
+    """Churned columns used anywhere in an index: key, INCLUDE or WHERE."""
+    body = definition.split(" USING ", 1)[-1]
+    return tuple(c for c in columns if re.search(rf"\b{re.escape(c)}\b", body))
+
+
+def measure_indexes(cur, tables: Dict[str, Sequence[str]]) -> List[IndexHealth]:
+    """Size, usage and leaf density of every index on `tables`.
+
+    `tables` maps each table to its churned columns.
+    """
+    exact = has_pgstattuple(cur)
+    cur.execute("""
+        SELECT c.relname, t.relname, pg_relation_size(i.indexrelid),
+               COALESCE(s.idx_scan, 0), am.amname, i.indisvalid,
+               pg_get_indexdef(i.indexrelid), i.indexrelid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_am am ON am.oid = c.relam
+        LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.indexrelid
+        WHERE i.indrelid = ANY(%s::regclass[])
+        ORDER BY t.relname, c.relname;
+    """, (list(tables),))
+
+    health = []
+    for name, table, size, scans, method, valid, definition, oid in cur.fetchall():
+        density = None
+        if exact and method == "btree" and valid:
+            cur.execute("SELECT avg_leaf_density FROM pgstatindex(%s::regclass);", (oid,))
+            density = cur.fetchone()[0]
+            # An index without leaf pages reports NaN
+            if density is not None and math.isnan(density):
+                density = None
+        health.append(IndexHealth(name, table, size, scans, density,
+                                  _covered_columns(definition, tables[table]), definition))
+    return health
+
+
+def _size(n: int) -> str:
+    for unit in ("B", "kB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def _pct(value: Optional[float], scale: float = 100) -> str:
+    return "n/a" if value is None else f"{value * scale:.0f}%"
+
+
+def print_report(conn, tables: Dict[str, Sequence[str]] = CHURN_COLUMNS):
+    with conn.cursor() as cur:
+        table_health = measure_tables(cur, list(tables))
+        index_health = measure_indexes(cur, tables)
+        exact = has_pgstattuple(cur)
+    conn.rollback()
+
+    print("\n📋 Tables:")
+    print(f"   {'table':<14} {'HOT':>5} {'updates':>9} {'live':>9} {'dead':>8} {'dead%':>6}"
+          f" {'free%':>6} {'bloat':>6} {'heap':>10} {'indexes':>10} {'ff':>4}  last vacuum")
+    for t in table_health:
+        free = "n/a" if t.free_pct is None else f"{t.free_pct:.0f}%"
+        vacuumed = t.last_vacuum.strftime("%Y-%m-%d %H:%M") if t.last_vacuum else "never"
+        print(f"   {t.table:<14} {_pct(t.hot_ratio):>5} {t.updates:>9} {t.live:>9} {t.dead:>8}"
+              f" {t.dead_pct:>5.1f}% {free:>6} {_pct(t.bloat):>6} {_size(t.size):>10}"
+              f" {_size(t.index_size):>10} {t.fillfactor:>4}  {vacuumed}")
+
+    print("\n📇 Indexes:")
+    print(f"   {'index':<34} {'size':>10} {'scans':>9} {'density':>8} {'bloat':>6}  note")
+    for i in index_health:
+        density = "n/a" if i.leaf_density is None else f"{i.leaf_density:.0f}%"
+        note = f"⚠️ covers {', '.join(i.churned)}: those updates are never HOT" \
+            if i.churned else ""
+        print(f"   {i.index:<34} {_size(i.size):>10} {i.scans:>9} {density:>8}"
+              f" {_pct(i.bloat):>6}  {note}")
+
+    if not exact:
+        print("\n💡 Bloat and index density need pgstattuple: python3 maintenance.py --install")
+
+
+# ==============================================
+# Recommending and applying settings
+# ==============================================
+
+@dataclass
+class Recommendation:
+    table: str
+    settings: Dict[str, str] = field(default_factory=dict)
+    reasons: List[str] = field(default_factory=list)
+
+    def statement(self) -> sql.Composed:
+        options = sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.SQL(name), sql.Literal(value))
+            for name, value in self.settings.items())
+        return sql.SQL("ALTER TABLE {} SET ({});").format(sql.Identifier(self.table), options)
+
+
+def recommend(table: TableHealth, indexes: Sequence[IndexHealth] = ()) -> Recommendation:
+    """Fillfactor and autovacuum settings for one table from its write mix."""
+    rec = Recommendation(table.table)
+    wanted = {}
+
+    # Room on every page for the next versions of its rows, so updates
+    # stay on the page (HOT) and skip the indexes
+    share = table.update_share
+    fillfactor = 80 if share >= 0.5 else 90 if share >= 0.2 else table.fillfactor
+    if fillfactor < table.fillfactor:
+        wanted["fillfactor"] = str(fillfactor)
+        rec.reasons.append(f"{share:.0%} of writes are updates (HOT ratio "
+                           f"{_pct(table.hot_ratio)}): keep {100 - fillfactor}% of each page "
+                           f"free for new row versions")
+
+    # Scale factors are a share of the table: 20% of a big table is far
+    # too much garbage to wait for, and a small hot table needs cleaning
+    # often so pruned space is reused instead of new pages
+    if table.live >= 1_000_000:
+        wanted.update({
+            "autovacuum_vacuum_scale_factor": "0.01",
+            "autovacuum_vacuum_threshold": "1000",
+            "autovacuum_analyze_scale_factor": "0.02",
+            "autovacuum_vacuum_insert_scale_factor": "0.05",
+        })
+        rec.reasons.append(f"{table.live:,} live rows: vacuum after 1% dead rows, not 20%")
+    elif share >= 0.2:
+        wanted.update({
+            "autovacuum_vacuum_scale_factor": "0.05",
+            "autovacuum_vacuum_threshold": "200",
+            "autovacuum_analyze_scale_factor": "0.05",
+        })
+        rec.reasons.append("update-heavy: vacuum after 5% dead rows so freed space is reused")
+
+    rec.settings = {k: v for k, v in wanted.items() if table.options.get(k) != v}
+
+    for index in indexes:
+        if index.table == table.table and index.churned:
+            rec.reasons.append(f"{index.index} covers {', '.join(index.churned)}: updates of "
+                               f"those columns can never be HOT, whatever the fillfactor")
+    return rec
+
+
+def recommend_all(conn, tables: Dict[str, Sequence[str]] = CHURN_COLUMNS) -> List[Recommendation]:
+    with conn.cursor() as cur:
+        table_health = measure_tables(cur, list(tables))
+        index_health = measure_indexes(cur, tables)
+    conn.rollback()
+    return [recommend(t, index_health) for t in table_health]
+
+
+def run_online(conn, statement, attempts: int = MAX_ATTEMPTS, backoff: float = RETRY_BACKOFF):
+    """Run one maintenance statement in autocommit with lock_timeout, retrying.
+
+    A statement queued for a lock blocks every query behind it, so it
+    gives up quickly and tries again later instead.
+    """
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT set_config('lock_timeout', %s, false);", (LOCK_TIMEOUT,))
+        for attempt in range(1, attempts + 1):
+            try:
+                cur.execute(statement)
+                return
+            except psycopg2.errors.LockNotAvailable:
+                if attempt == attempts:
+                    raise
+                time.sleep(backoff * 2 ** (attempt - 1))
+
+
+def apply(conn, recommendations: Sequence[Recommendation]) -> int:
+    """Apply every recommendation with settings. Returns the number applied."""
+    applied = 0
+    for rec in recommendations:
+        if rec.settings:
+            run_online(conn, rec.statement())
+            applied += 1
+    return applied
+
+
+def print_recommendations(conn, recommendations: Sequence[Recommendation]):
+    for rec in recommendations:
+        print(f"\n🔧 {rec.table}")
+        for reason in rec.reasons:
+            print(f"   - {reason}")
+        if rec.settings:
+            print(f"   {rec.statement().as_string(conn)}")
+        else:
+            print("   settings already match")
+
+
+# ==============================================
+# Online repack
+# ==============================================
+
+def _drop_invalid_copies(conn, index: str):
+    """Drop the invalid _ccnew copy a failed REINDEX CONCURRENTLY leaves behind."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid AND c.relname LIKE %s;
+        """, (index + "_ccnew%",))
+        leftovers = [row[0] for row in cur.fetchall()]
+    for name in leftovers:
+        run_online(conn, sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {};")
+                   .format(sql.Identifier(name)))
+
+
+def repack(conn, tables: Dict[str, Sequence[str]] = CHURN_COLUMNS,
+           index_limit: float = INDEX_BLOAT_LIMIT,
+           dead_limit: float = DEAD_TUPLE_LIMIT) -> List[str]:
+    """Rebuild bloated indexes and vacuum dead-heavy tables without blocking writes.
+
+    Returns a line per action taken. Shrinking a bloated heap needs a
+    table rewrite (VACUUM FULL or pg_repack), which this never does;
+    the fillfactor and autovacuum settings keep the heap from growing.
+    """
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        table_health = measure_tables(cur, list(tables))
+        index_health = measure_indexes(cur, tables)
+
+    actions = []
+    for index in index_health:
+        if index.bloat is None or index.bloat < index_limit:
+            continue
+        started = time.monotonic()
+        try:
+            run_online(conn, sql.SQL("REINDEX INDEX CONCURRENTLY {};")
+                       .format(sql.Identifier(index.index)))
+        except psycopg2.Error:
+            _drop_invalid_copies(conn, index.index)
+            raise
+        actions.append(f"REINDEX CONCURRENTLY {index.index} ({_pct(index.bloat)} bloat, "
+                       f"{_size(index.size)}) in {time.monotonic() - started:.1f}s")
+
+    for table in table_health:
+        if table.dead_pct / 100 < dead_limit:
+            continue
+        started = time.monotonic()
+        run_online(conn, sql.SQL("VACUUM (ANALYZE) {};").format(sql.Identifier(table.table)))
+        actions.append(f"VACUUM {table.table} ({table.dead_pct:.0f}% dead) "
+                       f"in {time.monotonic() - started:.1f}s")
+    return actions
+
+
+def schedule(every: float, tables: Dict[str, Sequence[str]] = CHURN_COLUMNS):
+    """Repack every `every` seconds until interrupted."""
+    conn = psycopg2.connect(application_name="maintenance", **DB_CONFIG)
+    try:
+        while True:
+            stamp = datetime.now().strftime("%H:%M:%S")
+            actions = repack(conn, tables)
+            for action in actions or ["nothing to do"]:
+                print(f"   [{stamp}] {action}")
+            time.sleep(every)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        conn.close()
+
+
+# ==============================================
+# Churn benchmark
+# ==============================================
+# churn_books and churn_orders are copies of books and orders (same
+# columns, constraints and indexes) so the benchmark never touches real
+# data. Each simulated hour runs a fixed number of operations, scaled by
+# a daily traffic curve. At the end of every hour, orders older than the
+# open window are archived (deleted), so the number of live rows stays
+# constant and any growth is bloat.
+#
+# A simulated hour takes seconds, but the autovacuum launcher wakes up
+# once a minute of real time, so it would hardly run during the whole
+# day. The churn tables therefore have autovacuum turned off, and the
+# benchmark runs its threshold check itself AUTOVACUUM_CHECKS times per
+# simulated hour, with each table's own (or the global) settings.
+
+CHURN_TABLES = {
+    "churn_books": CHURN_COLUMNS["books"],
+    "churn_orders": CHURN_COLUMNS["orders"],
+}
+
+# Share of each operation in an hour
+CHURN_MIX = {"price": 10, "stock": 30, "new_order": 20, "advance": 40}
+
+AUTOVACUUM_CHECKS = 12          # every 5 simulated minutes
+
+NEXT_STATUS = """
+    CASE status WHEN 'pending' THEN 'processing'
+                WHEN 'processing' THEN 'shipped'
+                ELSE 'delivered' END
+"""
+
+
+@dataclass
+class ChurnConfig:
+    hours: int = 24
+    hour_ops: int = 20000            # operations in an average hour
+    workers: int = 8
+    books: int = 10000
+    open_orders: int = 100000        # live orders kept in the table
+    repack_every: int = 6            # hours between repacks (tuned run only)
+    seed: Optional[int] = None
+
+
+@dataclass
+class HourStats:
+    hour: int
+    ops: int
+    p50: float
+    p99: float
+    books_bytes: int
+    orders_bytes: int
+    books_hot: Optional[float]
+    orders_hot: Optional[float]
+    vacuums: int = 0                 # emulated autovacuum runs
+    maintenance: List[str] = field(default_factory=list)
+
+
+def traffic(hour: int) -> float:
+    """Daily curve: quiet at night, busiest mid-day (average ~0.7).
+
+    Taken at the middle of the hour, so hour h and hour 23 - h get the
+    same load and the first and last quarter of a day compare fairly.
+    """
+    return 0.4 + 0.6 * math.sin(math.pi * (hour + 0.5) / 24) ** 2
+
+
+def setup_churn(conn, config: ChurnConfig, settings: Dict[str, Dict[str, str]]):
+    """(Re)create the churn tables with `settings` and fill them."""
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS churn_books, churn_orders;")
+        cur.execute("""
+            CREATE TABLE churn_books
+                (LIKE books INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES);
+            ALTER TABLE churn_books ALTER COLUMN id DROP DEFAULT;
+
+            CREATE TABLE churn_orders
+                (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES);
+            ALTER TABLE churn_orders
+                ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE
+                DEFAULT CURRENT_TIMESTAMP;
+            CREATE SEQUENCE churn_orders_id_seq OWNED BY churn_orders.id;
+            ALTER TABLE churn_orders ALTER COLUMN id SET DEFAULT nextval('churn_orders_id_seq');
+        """)
+        # Settings go on before the data so fillfactor applies to every page.
+        # Autovacuum is emulated in simulated time (see _autovacuum).
+        for table in CHURN_TABLES:
+            options = {**settings.get(table, {}), "autovacuum_enabled": "false"}
+            cur.execute(Recommendation(table, options).statement())
+
+        cur.execute("""
+            INSERT INTO churn_books (id, title, isbn, price, stock_quantity, description)
+            SELECT g, 'Churn book ' || g, 'CHURN-' || g, 10 + g %% 40, 1000000,
+                   repeat('A book about churn. ', 5)
+            FROM generate_series(1, %s) g;
+        """, (config.books,))
+        cur.execute("""
+            INSERT INTO churn_orders (id, customer_id, status, total_amount)
+            SELECT g, 1 + g %% 1000,
+                   (ARRAY['pending', 'processing', 'shipped', 'delivered'])[1 + g %% 4], 25
+            FROM generate_series(1, %s) g;
+        """, (config.open_orders,))
+        cur.execute("SELECT setval('churn_orders_id_seq', %s);", (config.open_orders,))
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM (ANALYZE) churn_books, churn_orders;")
+    conn.autocommit = False
+
+
+def _churn_worker(conn, ops: int, config: ChurnConfig, newest_order: int,
+                  rng: random.Random, latencies: List[float]):
+    names = list(CHURN_MIX)
+    weights = [CHURN_MIX[name] for name in names]
+    with conn.cursor() as cur:
+        for name in rng.choices(names, weights=weights, k=ops):
+            # Popular books get most of the traffic
+            book_id = 1 + int(config.books * rng.random() ** 3)
+            started = time.perf_counter()
+            if name == "price":
+                cur.execute("""
+                    UPDATE churn_books
+                    SET price = GREATEST(price + %s, 1), updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %s;
+                """, (rng.choice((-0.01, 0.01)), book_id))
+            elif name == "stock":
+                cur.execute("""
+                    UPDATE churn_books
+                    SET stock_quantity = stock_quantity - 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %s;
+                """, (book_id,))
+            elif name == "new_order":
+                cur.execute("""
+                    INSERT INTO churn_orders (customer_id, status, total_amount)
+                    VALUES (%s, 'pending', %s);
+                """, (rng.randint(1, 1000), rng.randint(5, 100)))
+                continue
+            else:
+                order_id = rng.randint(newest_order - config.open_orders, newest_order)
+                cur.execute(f"""
+                    UPDATE churn_orders
+                    SET status = {NEXT_STATUS}, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND status IN ('pending', 'processing', 'shipped');
+                """, (order_id,))
+            latencies.append(time.perf_counter() - started)
+        # Publish this backend's statistics now instead of up to 10s later
+        cur.execute("SELECT pg_stat_force_next_flush();")
+
+
+def _hot_counts(cur) -> Dict[str, Tuple[int, int]]:
+    cur.execute("""
+        SELECT relname, n_tup_upd, n_tup_hot_upd
+        FROM pg_stat_user_tables
+        WHERE relname IN ('churn_books', 'churn_orders');
+    """)
+    return {name: (updates, hot) for name, updates, hot in cur.fetchall()}
+
+
+def _hot_delta(before: Tuple[int, int], after: Tuple[int, int]) -> Optional[float]:
+    updates = after[0] - before[0]
+    return (after[1] - before[1]) / updates if updates else None
+
+
+def _autovacuum(cur, defaults: Dict[str, float]) -> int:
+    """VACUUM the churn tables autovacuum would pick now. Returns how many."""
+    cur.execute("""
+        SELECT s.relname, s.n_dead_tup, s.n_live_tup, c.reloptions
+        FROM pg_stat_user_tables s
+        JOIN pg_class c ON c.oid = s.relid
+        WHERE s.relname IN ('churn_books', 'churn_orders');
+    """)
+    due = []
+    for name, dead, live, reloptions in cur.fetchall():
+        options = _options(reloptions)
+        threshold = float(options.get("autovacuum_vacuum_threshold",
+                                      defaults["autovacuum_vacuum_threshold"]))
+        scale = float(options.get("autovacuum_vacuum_scale_factor",
+                                  defaults["autovacuum_vacuum_scale_factor"]))
+        if dead > threshold + scale * live:
+            due.append(name)
+    for name in due:
+        cur.execute(sql.SQL("VACUUM (ANALYZE) {};").format(sql.Identifier(name)))
+    return len(due)
+
+
+def _repack_into(conn, actions: List[str]):
+    try:
+        actions.extend(repack(conn, CHURN_TABLES))
+    except psycopg2.Error as e:
+        actions.append(f"repack failed: {e}")
+
+
+def run_churn(label: str, config: ChurnConfig, settings: Dict[str, Dict[str, str]],
+              repack_every: Optional[int]) -> List[HourStats]:
+    """Simulate `config.hours` hours of churn and measure every hour."""
+    conn = psycopg2.connect(application_name=f"churn-{label}", **DB_CONFIG)
+    workers = [psycopg2.connect(application_name=f"churn-{label}-{i}", **DB_CONFIG)
+               for i in range(config.workers)]
+    maintenance = psycopg2.connect(application_name=f"churn-{label}-repack", **DB_CONFIG)
+    rng = random.Random(config.seed)
+    try:
+        setup_churn(conn, config, settings)
+        for worker in workers:
+            worker.autocommit = True
+        conn.autocommit = True
+
+        hours = []
+        print(f"\n   {'hour':>4} {'ops':>7} {'p50 ms':>8} {'p99 ms':>8} {'books':>10}"
+              f" {'orders':>10} {'HOT books':>10} {'HOT orders':>11} {'vac':>4}")
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT current_setting('autovacuum_vacuum_threshold')::float8,
+                       current_setting('autovacuum_vacuum_scale_factor')::float8;
+            """)
+            threshold, scale = cur.fetchone()
+            defaults = {"autovacuum_vacuum_threshold": threshold,
+                        "autovacuum_vacuum_scale_factor": scale}
+
+            for hour in range(config.hours):
+                ops = int(config.hour_ops * traffic(hour))
+                cur.execute("SELECT last_value FROM churn_orders_id_seq;")
+                newest_order = cur.fetchone()[0]
+                before = _hot_counts(cur)
+
+                # The repack runs alongside the traffic, as it would in production
+                actions: List[str] = []
+                repacker = None
+                if repack_every and hour % repack_every == repack_every - 1:
+                    repacker = threading.Thread(target=_repack_into,
+                                                args=(maintenance, actions))
+                    repacker.start()
+
+                latencies: List[float] = []
+                vacuums = 0
+                slice_ops = ops // (config.workers * AUTOVACUUM_CHECKS)
+                for _ in range(AUTOVACUUM_CHECKS):
+                    threads = [
+                        threading.Thread(target=_churn_worker, args=(
+                            worker, slice_ops, config, newest_order,
+                            random.Random(rng.random()), latencies))
+                        for worker in workers
+                    ]
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                    vacuums += _autovacuum(cur, defaults)
+                if repacker is not None:
+                    repacker.join()
+
+                # Archive orders that left the open window, counting this
+                # hour's new orders, so exactly open_orders stay live
+                cur.execute("SELECT last_value FROM churn_orders_id_seq;")
+                newest_order = cur.fetchone()[0]
+                cur.execute("DELETE FROM churn_orders WHERE id <= %s;",
+                            (newest_order - config.open_orders,))
+                cur.execute("SELECT pg_stat_force_next_flush();")
+
+                after = _hot_counts(cur)
+                cur.execute("""
+                    SELECT pg_total_relation_size('churn_books'),
+                           pg_total_relation_size('churn_orders');
+                """)
+                books_bytes, orders_bytes = cur.fetchone()
+                latencies.sort()
+                stats = HourStats(
+                    hour=hour + 1, ops=slice_ops * config.workers * AUTOVACUUM_CHECKS,
+                    p50=percentile(latencies, 50), p99=percentile(latencies, 99),
+                    books_bytes=books_bytes, orders_bytes=orders_bytes,
+                    books_hot=_hot_delta(before["churn_books"], after["churn_books"]),
+                    orders_hot=_hot_delta(before["churn_orders"], after["churn_orders"]),
+                    vacuums=vacuums, maintenance=actions,
+                )
+                hours.append(stats)
+                print(f"   {stats.hour:>4} {stats.ops:>7} {stats.p50 * 1000:>8.2f}"
+                      f" {stats.p99 * 1000:>8.2f} {_size(stats.books_bytes):>10}"
+                      f" {_size(stats.orders_bytes):>10} {_pct(stats.books_hot):>10}"
+                      f" {_pct(stats.orders_hot):>11} {stats.vacuums:>4}")
+                for action in actions:
+                    print(f"        🧹 {action}")
+        return hours
+    finally:
+        for c in [conn, maintenance, *workers]:
+            c.close()
+
+
+def drift(hours: List[HourStats], attr: str) -> float:
+    """Change of `attr` from the first quarter of the run to the last.
+
+    Compares the medians of the first and the last quarter of the hours,
+    so a single noisy hour does not decide the result.
+    """
+    quarter = max(1, len(hours) // 4)
+    first = sorted(getattr(h, attr) for h in hours[:quarter])
+    last = sorted(getattr(h, attr) for h in hours[-quarter:])
+    reference = first[len(first) // 2]
+    return (last[len(last) // 2] - reference) / reference if reference else 0.0
+
+
+def benchmark(config: ChurnConfig):
+    """Simulate a day of churn at default settings, then tuned, and compare."""
+    print("=" * 80)
+    print(f"🔁 Churn benchmark: {config.hours} simulated hours, ~{config.hour_ops} ops/hour, "
+          f"{config.workers} workers")
+    print("=" * 80)
+
+    print("\n🅰️  Default settings (fillfactor 100, global autovacuum settings)")
+    default = run_churn("default", config, {}, repack_every=None)
+
+    # Recommendations come from what the default run measured
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        recommendations = recommend_all(conn, CHURN_TABLES)
+        print_recommendations(conn, recommendations)
+    finally:
+        conn.close()
+    settings = {rec.table: rec.settings for rec in recommendations}
+
+    print(f"\n🅱️  Tuned settings, repack every {config.repack_every} hours")
+    tuned = run_churn("tuned", config, settings, repack_every=config.repack_every)
+
+    print("\n" + "=" * 80)
+    print("📊 First quarter → last quarter of the day")
+    print("=" * 80)
+    print(f"   {'':<22} {'default':>10} {'tuned':>10}")
+    for label, attr in (("books size", "books_bytes"), ("orders size", "orders_bytes"),
+                        ("update p50", "p50"), ("update p99", "p99")):
+        print(f"   {label:<22} {drift(default, attr):>+10.0%} {drift(tuned, attr):>+10.0%}")
+    print(f"   {'books size at end':<22} {_size(default[-1].books_bytes):>10}"
+          f" {_size(tuned[-1].books_bytes):>10}")
+    print(f"   {'orders size at end':<22} {_size(default[-1].orders_bytes):>10}"
+          f" {_size(tuned[-1].orders_bytes):>10}")
+
+    stable = all(drift(tuned, attr) < 0.10 for attr in ("books_bytes", "orders_bytes")) \
+        and drift(tuned, "p99") < 0.25
+    if stable:
+        print("\n✅ Tuned: table size and update latency stay flat over the day")
+    else:
+        print("\n⚠️ Tuned: size or latency still drifts; check the HOT columns above")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS churn_books, churn_orders;")
+        conn.commit()
+    finally:
+        conn.close()
+    return default, tuned
+
+
+# ==============================================
+# Main
+# ==============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="HOT updates and bloat maintenance")
+    parser.add_argument("--report", action="store_true", help="HOT ratio and bloat per table/index")
+    parser.add_argument("--install", action="store_true", help="create the pgstattuple extension")
+    parser.add_argument("--recommend", action="store_true", help="print recommended settings")
+    parser.add_argument("--apply", action="store_true", help="apply recommended settings")
+    parser.add_argument("--repack", action="store_true", help="reindex/vacuum what needs it now")
+    parser.add_argument("--schedule", type=float, metavar="SECONDS",
+                        help="repack every SECONDS until Ctrl+C")
+    parser.add_argument("--benchmark", action="store_true", help="simulated day of churn")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--hour-ops", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--open-orders", type=int, default=100000)
+    parser.add_argument("--repack-every", type=int, default=6, help="simulated hours")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    print("🧹 HOT Updates and Bloat Maintenance")
+    print("=" * 72)
+
+    try:
+        if args.benchmark:
+            benchmark(ChurnConfig(hours=args.hours, hour_ops=args.hour_ops,
+                                  workers=args.workers, books=args.books,
+                                  open_orders=args.open_orders,
+                                  repack_every=args.repack_every, seed=args.seed))
+            return
+        if args.schedule:
+            print(f"   Repacking {', '.join(CHURN_COLUMNS)} every {args.schedule:g}s")
+            schedule(args.schedule)
+            return
+
+        # Not `with conn`: that holds a transaction open, and apply/repack
+        # need autocommit (REINDEX CONCURRENTLY, VACUUM)
+        conn = psycopg2.connect(application_name="maintenance", **DB_CONFIG)
+        conn.autocommit = True
+        try:
+            if args.install:
+                if install(conn):
+                    print("✅ pgstattuple installed")
+                else:
+                    print("❌ Creating pgstattuple needs a superuser")
+            if args.recommend or args.apply:
+                recommendations = recommend_all(conn)
+                print_recommendations(conn, recommendations)
+                if args.apply:
+                    print(f"\n✅ Applied settings to {apply(conn, recommendations)} table(s)")
+            if args.repack:
+                for action in repack(conn) or ["nothing to do"]:
+                    print(f"   🧹 {action}")
+            if args.report or not (args.install or args.recommend or args.apply or args.repack):
+                print_report(conn)
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+
+
+if __name__ == "__main__":
+    main()
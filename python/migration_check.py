@@ -0,0 +1,171 @@
+"""
+Online Migration Check
+======================
+Show that the Alembic migrations do not block the application.
+
+The check fills `orders` with a large number of rows, starts clients
+that keep reading and writing `books` and `orders`, and runs
+`alembic upgrade head` underneath them. It fails (exit code 1) if any
+client request took longer than the limit or failed.
+
+⚠️ The check downgrades the database to the baseline revision first
+and deletes the rows it added at the end.
+
+How to run:
+  Windows:  python migration_check.py --rows 2000000
+  macOS:    python3 migration_check.py --rows 2000000
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import psycopg2
+from alembic import command
+from alembic.config import Config
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+
+def seed_orders(conn, rows: int) -> int:
+    """Insert `rows` orders; returns the last order id from before the seed."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM orders;")
+        marker = cur.fetchone()[0]
+        cur.execute("""
+            WITH ids AS (SELECT array_agg(id) AS a FROM customers)
+            INSERT INTO orders (customer_id, status, total_amount, order_date)
+            SELECT ids.a[1 + g %% cardinality(ids.a)],
+                   (ARRAY['pending', 'processing', 'shipped', 'delivered', 'cancelled'])[1 + g %% 5],
+                   round((random() * 100)::numeric, 2),
+                   CURRENT_TIMESTAMP - random() * INTERVAL '365 days'
+            FROM ids, generate_series(1, %s) AS g;
+        """, (rows,))
+    conn.commit()
+    return marker
+
+
+def probe(name: str, stop: threading.Event, latencies: dict, errors: dict,
+          book_ids: list, order_ids: tuple):
+    """Keep issuing one kind of request until `stop` is set."""
+    statements = {
+        "read books": ("SELECT * FROM books WHERE id = %s;", lambda: (random.choice(book_ids),)),
+        "write books": ("UPDATE books SET updated_at = CURRENT_TIMESTAMP WHERE id = %s;",
+                        lambda: (random.choice(book_ids),)),
+        "read orders": ("SELECT * FROM orders WHERE id = %s;",
+                        lambda: (random.randint(*order_ids),)),
+        "write orders": ("UPDATE orders SET total_amount = total_amount WHERE id = %s;",
+                         lambda: (random.randint(*order_ids),)),
+        "insert orders": ("INSERT INTO orders (customer_id, status, total_amount) "
+                          "SELECT MIN(id), 'pending', 0 FROM customers;", lambda: ()),
+    }
+    sql, params = statements[name]
+
+    conn = psycopg2.connect(application_name=f"migration-check {name}", **DB_CONFIG)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = '30s';")
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    cur.execute(sql, params())
+                except psycopg2.Error as e:
+                    errors[name].append(str(e).strip())
+                latencies[name].append(time.perf_counter() - started)
+                time.sleep(0.005)
+    finally:
+        conn.close()
+
+
+def run_check(rows: int, max_latency: float, keep: bool) -> bool:
+    cfg = Config(str(ALEMBIC_INI))
+
+    print("=" * 60)
+    print("Online Migration Check")
+    print("=" * 60)
+
+    print("\n⏪ Downgrading to the baseline revision...")
+    command.downgrade(cfg, "0001_baseline")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    print(f"🌱 Seeding {rows:,} orders...")
+    marker = seed_orders(conn, rows)
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM books ORDER BY id;")
+        book_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT MIN(id), MAX(id) FROM orders;")
+        order_ids = cur.fetchone()
+    conn.commit()
+
+    stop = threading.Event()
+    latencies, errors = defaultdict(list), defaultdict(list)
+    names = ("read books", "write books", "read orders", "write orders", "insert orders")
+    clients = [threading.Thread(target=probe, daemon=True,
+                                args=(name, stop, latencies, errors, book_ids, order_ids))
+               for name in names]
+    for client in clients:
+        client.start()
+
+    print("🚚 Running `alembic upgrade head` under load...")
+    time.sleep(1.0)
+    started = time.perf_counter()
+    command.upgrade(cfg, "head")
+    elapsed = time.perf_counter() - started
+    time.sleep(1.0)
+
+    stop.set()
+    for client in clients:
+        client.join()
+
+    if not keep:
+        print("🧹 Removing seeded orders...")
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM orders WHERE id > %s;", (marker,))
+        conn.commit()
+    conn.close()
+
+    print(f"\n⏱️  Migration took {elapsed:.1f}s. Client latency during the run:")
+    print(f"   {'client':<14} {'requests':>9} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    passed = True
+    for name in names:
+        values = sorted(latencies[name])
+        p99 = values[max(0, int(len(values) * 0.99) - 1)] if values else 0.0
+        worst = values[-1] if values else 0.0
+        ok = worst <= max_latency and not errors[name]
+        passed = passed and ok
+        print(f"   {name:<14} {len(values):>9} {p99 * 1000:>8.1f} {worst * 1000:>8.1f}"
+              f" {len(errors[name]):>7} {'✅' if ok else '❌'}")
+        for message in errors[name][:3]:
+            print(f"      ⚠️ {message}")
+
+    print("\n" + ("✅ Reads and writes stayed unblocked" if passed
+                  else f"❌ Some requests took longer than {max_latency * 1000:.0f} ms or failed"))
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check migrations run without blocking clients")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="orders to add before migrating")
+    parser.add_argument("--max-latency", type=float, default=1500,
+                        help="slowest allowed client request (ms); should exceed lock_timeout")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded orders")
+    args = parser.parse_args()
+
+    try:
+        sys.exit(0 if run_check(args.rows, args.max_latency / 1000, args.keep) else 1)
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
@@ -0,0 +1,101 @@
+"""
+Alembic environment for the bookstore database.
+
+Every migration runs in its own transaction under lock_timeout and
+statement_timeout guards. A migration that fails because it could not
+get its locks in time is rolled back and retried with backoff; already
+applied migrations are not repeated.
+
+Override the guards with -x:
+    alembic -x lock_timeout=3s -x statement_timeout=5min upgrade head
+"""
+
+import logging
+import time
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+from sqlalchemy.exc import DBAPIError
+
+from migrations.online import (
+    LOCK_TIMEOUT,
+    MAX_ATTEMPTS,
+    RETRY_BACKOFF,
+    STATEMENT_TIMEOUT,
+    apply_guards,
+    is_retryable,
+)
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+log = logging.getLogger("alembic.env")
+
+# The schema is written by hand in the migrations (no autogenerate)
+target_metadata = None
+
+
+def guard_settings():
+    """lock_timeout and statement_timeout for this run."""
+    x_args = context.get_x_argument(as_dictionary=True)
+    return (x_args.get("lock_timeout", LOCK_TIMEOUT),
+            x_args.get("statement_timeout", STATEMENT_TIMEOUT))
+
+
+def run_migrations_offline():
+    """Write the migration SQL to stdout instead of running it."""
+    lock_timeout, statement_timeout = guard_settings()
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
+    )
+    context.execute(f"SET lock_timeout = '{lock_timeout}'")
+    context.execute(f"SET statement_timeout = '{statement_timeout}'")
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations against the database, retrying on lock timeouts."""
+    lock_timeout, statement_timeout = guard_settings()
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            with connectable.connect() as connection:
+                # Session-level settings survive the commit below, which
+                # leaves no transaction open for Alembic to piggyback on
+                apply_guards(connection, lock_timeout, statement_timeout)
+                connection.commit()
+
+                context.configure(
+                    connection=connection,
+                    target_metadata=target_metadata,
+                    transaction_per_migration=True,
+                )
+                with context.begin_transaction():
+                    context.run_migrations()
+            return
+        except DBAPIError as e:
+            if not is_retryable(e) or attempt == MAX_ATTEMPTS:
+                raise
+            delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+            log.warning("Migration attempt %d/%d hit %s, retrying in %.1fs",
+                        attempt, MAX_ATTEMPTS, e.orig.pgcode, delay)
+            time.sleep(delay)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
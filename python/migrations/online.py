@@ -0,0 +1,245 @@
+"""
+Online Schema-Change Helpers
+============================
+Helpers for Alembic migrations that change busy tables without blocking
+the application's reads and writes.
+
+The rule behind all of them: never hold a strong lock for long, and never
+wait long for one. A statement waiting for a lock blocks every query that
+queues up behind it, so each step runs in its own short transaction with
+lock_timeout set, and is retried with backoff when it times out.
+
+- create_index_concurrently(): CREATE INDEX CONCURRENTLY, cleaning up
+  an invalid index left behind by a failed attempt
+- add_not_null(): NOT NULL via a NOT VALID check constraint + VALIDATE,
+  so the table is scanned without blocking writes
+- backfill(): UPDATE a large table in key-range batches with throttling
+
+Usage inside a migration:
+
+    from migrations.online import create_index_concurrently
+
+    def upgrade():
+        create_index_concurrently("idx_orders_status", "orders", ["status"])
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from alembic import context, op
+from sqlalchemy.exc import DBAPIError
+
+log = logging.getLogger("alembic.online")
+
+# Default guards for every migration (override with alembic -x ...)
+LOCK_TIMEOUT = "1s"
+STATEMENT_TIMEOUT = "60s"
+
+# Retries for a step that hit a lock timeout, deadlock or serialization failure
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 0.5  # seconds, doubled after every attempt
+
+# lock_not_available, serialization_failure, deadlock_detected
+RETRYABLE_CODES = {"55P03", "40001", "40P01"}
+
+
+# ==============================================
+# Guards and retries
+# ==============================================
+
+def apply_guards(connection, lock_timeout: str = LOCK_TIMEOUT,
+                 statement_timeout: str = STATEMENT_TIMEOUT):
+    """Set the session-level timeouts every migration runs under."""
+    connection.exec_driver_sql("SELECT set_config('lock_timeout', %s, false);",
+                               (lock_timeout,))
+    connection.exec_driver_sql("SELECT set_config('statement_timeout', %s, false);",
+                               (statement_timeout,))
+
+
+def is_retryable(error: DBAPIError) -> bool:
+    """True when the error means "try again later", not "this is wrong"."""
+    return getattr(error.orig, "pgcode", None) in RETRYABLE_CODES
+
+
+def retry(step: Callable, attempts: int = MAX_ATTEMPTS, backoff: float = RETRY_BACKOFF):
+    """Run `step` until it succeeds, sleeping between retryable failures.
+
+    Only use this in autocommit mode: inside a transaction the first
+    failure aborts the transaction and the retry could not succeed.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return step()
+        except DBAPIError as e:
+            if not is_retryable(e) or attempt == attempts:
+                raise
+            delay = backoff * 2 ** (attempt - 1)
+            log.warning("Attempt %d/%d failed (%s), retrying in %.1fs",
+                        attempt, attempts, e.orig.pgcode, delay)
+            time.sleep(delay)
+
+
+@contextmanager
+def statement_timeout(value: str):
+    """Temporarily change statement_timeout (e.g. '0' for a long index build)."""
+    if context.is_offline_mode():
+        yield
+        return
+    bind = op.get_bind()
+    previous = bind.exec_driver_sql("SHOW statement_timeout;").scalar()
+    bind.exec_driver_sql("SELECT set_config('statement_timeout', %s, false);", (value,))
+    try:
+        yield
+    finally:
+        bind.exec_driver_sql("SELECT set_config('statement_timeout', %s, false);",
+                             (previous,))
+
+
+def _run(sql: str, params: Optional[tuple] = None):
+    """Execute one statement; returns the result (None in offline mode).
+
+    Without `params` the SQL is sent as written, like op.execute() does in
+    offline mode, so a literal % needs no escaping. With `params` it is
+    formatted by the driver: write a literal % as %%.
+    """
+    if context.is_offline_mode():
+        op.execute(sql)
+        return None
+    bind = op.get_bind()
+    if params:
+        return bind.exec_driver_sql(sql, params)
+    # Otherwise SQLAlchemy passes empty parameters and psycopg2 formats anyway
+    return bind.exec_driver_sql(sql, execution_options={"no_parameters": True})
+
+
+# ==============================================
+# Indexes
+# ==============================================
+
+def create_index_concurrently(name: str, table: str, columns: List[str],
+                              unique: bool = False, where: Optional[str] = None):
+    """CREATE INDEX CONCURRENTLY without blocking writes to `table`."""
+    sql = (f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+           f"ON {table} ({', '.join(columns)})")
+    if where:
+        sql += f" WHERE {where}"
+
+    with op.get_context().autocommit_block():
+        if context.is_offline_mode():
+            _run(sql)
+            return
+
+        def step():
+            # A failed CONCURRENTLY build leaves an INVALID index behind,
+            # which IF NOT EXISTS would silently keep
+            invalid = _run("""
+                SELECT 1 FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = %s AND NOT i.indisvalid;
+            """, (name,)).first()
+            if invalid:
+                _run(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            _run(sql)
+
+        with statement_timeout("0"):
+            retry(step)
+
+
+def drop_index_concurrently(name: str):
+    """DROP INDEX CONCURRENTLY (for downgrades)."""
+    with op.get_context().autocommit_block():
+        sql = f"DROP INDEX CONCURRENTLY IF EXISTS {name}"
+        if context.is_offline_mode():
+            _run(sql)
+        else:
+            retry(lambda: _run(sql))
+
+
+# ==============================================
+# Constraints
+# ==============================================
+
+def add_not_null(table: str, column: str):
+    """Make `column` NOT NULL without a long exclusive lock.
+
+    1. ADD CHECK (column IS NOT NULL) NOT VALID   - brief lock, no scan
+    2. VALIDATE CONSTRAINT                         - scans, writes continue
+    3. SET NOT NULL                                - brief lock, uses the check
+    4. DROP the now redundant check
+    """
+    constraint = f"{table}_{column}_not_null"
+    steps = [
+        f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+        f"CHECK ({column} IS NOT NULL) NOT VALID",
+        f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}",
+        f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL",
+        f"ALTER TABLE {table} DROP CONSTRAINT {constraint}",
+    ]
+
+    with op.get_context().autocommit_block():
+        if context.is_offline_mode():
+            for sql in steps:
+                _run(sql)
+            return
+
+        exists = _run("SELECT 1 FROM pg_constraint WHERE conname = %s;", (constraint,)).first()
+        if not exists:
+            retry(lambda: _run(steps[0]))
+        with statement_timeout("0"):
+            retry(lambda: _run(steps[1]))
+        retry(lambda: _run(steps[2]))
+        retry(lambda: _run(steps[3]))
+
+
+# ==============================================
+# Backfills
+# ==============================================
+
+def backfill(table: str, set_sql: str, where: str = "TRUE", key: str = "id",
+             batch_size: int = 5000, pause: float = 0.05,
+             max_rows_per_sec: Optional[float] = None) -> int:
+    """UPDATE a large table in batches of `batch_size` keys.
+
+    Each batch is its own short transaction, so row locks are released
+    quickly and vacuum can keep up. Between batches the backfill sleeps
+    `pause` seconds, and longer if needed to stay under `max_rows_per_sec`.
+    `set_sql` and `where` are plain SQL fragments (a literal % is just %).
+    Returns the number of rows updated.
+    """
+    if context.is_offline_mode():
+        _run(f"UPDATE {table} SET {set_sql} WHERE {where}")
+        return 0
+
+    updated = 0
+    with op.get_context().autocommit_block():
+        with statement_timeout("0"):
+            low, high = _run(f"SELECT MIN({key}), MAX({key}) FROM {table} WHERE {where};").one()
+        if low is None:
+            return 0
+
+        # The batches are the only statement with parameters, so only they
+        # need the fragments escaped for the driver
+        sql = (f"UPDATE {table} SET {set_sql.replace('%', '%%')} "
+               f"WHERE {key} >= %s AND {key} < %s AND ({where.replace('%', '%%')})")
+        started = time.monotonic()
+        start = low
+        batches = 0
+        while start <= high:
+            end = start + batch_size
+            updated += retry(lambda: _run(sql, (start, end)).rowcount)
+            start = end
+            batches += 1
+
+            if batches % 100 == 0:
+                log.info("Backfill %s: %d rows, up to %s=%s of %s", table, updated, key, start, high)
+
+            wait = pause
+            if max_rows_per_sec:
+                wait = max(wait, updated / max_rows_per_sec - (time.monotonic() - started))
+            if wait > 0:
+                time.sleep(wait)
+
+    log.info("Backfill %s: %d rows updated", table, updated)
+    return updated
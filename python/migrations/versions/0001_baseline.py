@@ -0,0 +1,23 @@
+"""Baseline: the bookstore schema from sql/init.sql and sql/inventory.sql
+
+The container's init scripts create this schema, so a new database is
+already at this revision. Later migrations build on it.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+"""
+
+# revision identifiers, used by Alembic.
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
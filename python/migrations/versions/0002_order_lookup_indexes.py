@@ -0,0 +1,27 @@
+"""Indexes for order lookups by book and by date
+
+order_items.book_id has no index (sales per book scan every order
+item) and orders are often filtered by order_date. Both indexes are
+built CONCURRENTLY so orders keep flowing during the build.
+
+Revision ID: 0002_order_lookup_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19
+"""
+from migrations.online import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = "0002_order_lookup_indexes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_concurrently("idx_order_items_book", "order_items", ["book_id"])
+    create_index_concurrently("idx_orders_order_date", "orders", ["order_date"])
+
+
+def downgrade():
+    drop_index_concurrently("idx_orders_order_date")
+    drop_index_concurrently("idx_order_items_book")
@@ -0,0 +1,33 @@
+"""Add orders.updated_at (NOT NULL), backfilled from order_date
+
+Done in online steps so a large orders table stays writable:
+1. add the column without a default (metadata only, no rewrite)
+2. default new rows to CURRENT_TIMESTAMP
+3. backfill existing rows in throttled batches
+4. NOT NULL via a NOT VALID check constraint + VALIDATE
+
+Revision ID: 0003_orders_updated_at
+Revises: 0002_order_lookup_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from migrations.online import add_not_null, backfill
+
+# revision identifiers, used by Alembic.
+revision = "0003_orders_updated_at"
+down_revision = "0002_order_lookup_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE orders ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE")
+    op.execute("ALTER TABLE orders ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP")
+    backfill("orders", "updated_at = COALESCE(order_date, CURRENT_TIMESTAMP)",
+             where="updated_at IS NULL")
+    add_not_null("orders", "updated_at")
+
+
+def downgrade():
+    op.execute("ALTER TABLE orders DROP COLUMN IF EXISTS updated_at")
@@ -0,0 +1,345 @@
+"""Pre-aggregated sales rollups, maintained incrementally
+
+Reporting queries (author revenue, customer loyalty, monthly sales)
+join orders, order_items, books and authors from scratch. These tables
+keep the answers pre-aggregated instead:
+
+- sales_daily / sales_monthly: units and revenue by period x category
+  x author x customer segment, plus monthly by-author and by-category
+  rollups
+- orders_daily / orders_monthly: order count and order totals by
+  period x segment
+- customer_totals / customer_category_units: per-customer orders,
+  spend and units per category
+
+Changes reach them through sales_rollup_queue: triggers on orders and
+order_items append the order id (no hot rows, so writers never wait on
+each other), and refresh_sales_rollups() applies the changes in batches.
+An order counts as a sale unless it is cancelled; a status change to or
+from 'cancelled' adds or removes its contribution. The customer segment
+(new / returning / loyal) is fixed when an order is first counted.
+Days are UTC. Both columns are nullable: an order without a status is
+not counted, like in the challenge queries, and one without an
+order_date is filed under the day it was refreshed.
+
+Revision ID: 0004_sales_rollups
+Revises: 0003_orders_updated_at
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from migrations.online import retry, statement_timeout
+
+# revision identifiers, used by Alembic.
+revision = "0004_sales_rollups"
+down_revision = "0003_orders_updated_at"
+branch_labels = None
+depends_on = None
+
+
+TABLES = """
+-- Orders waiting to be folded into the rollups
+CREATE TABLE sales_rollup_queue (
+    id BIGSERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL
+);
+
+-- What each order currently contributes (so it can be taken back out)
+CREATE TABLE sales_fact_orders (
+    order_id INTEGER PRIMARY KEY,
+    day DATE NOT NULL,
+    customer_id INTEGER,
+    segment VARCHAR(10) NOT NULL,
+    order_total DECIMAL(12, 2) NOT NULL,
+    counted BOOLEAN NOT NULL
+);
+
+CREATE TABLE sales_fact_lines (
+    order_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    category_id INTEGER NOT NULL,          -- 0 = no category
+    author_id INTEGER NOT NULL,            -- 0 = no author
+    segment VARCHAR(10) NOT NULL,
+    customer_id INTEGER,
+    units INTEGER NOT NULL,
+    revenue DECIMAL(12, 2) NOT NULL
+);
+CREATE INDEX idx_sales_fact_lines_order ON sales_fact_lines(order_id);
+
+-- Line-level rollups: units and revenue
+CREATE TABLE sales_daily (
+    day DATE NOT NULL,
+    category_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    segment VARCHAR(10) NOT NULL,
+    units BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, category_id, author_id, segment)
+);
+
+CREATE TABLE sales_monthly (
+    month DATE NOT NULL,
+    category_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    segment VARCHAR(10) NOT NULL,
+    units BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, category_id, author_id, segment)
+);
+
+CREATE TABLE sales_monthly_by_author (
+    month DATE NOT NULL,
+    author_id INTEGER NOT NULL,
+    units BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, author_id)
+);
+
+CREATE TABLE sales_monthly_by_category (
+    month DATE NOT NULL,
+    category_id INTEGER NOT NULL,
+    units BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, category_id)
+);
+
+-- Order-level rollups: order count and order totals
+CREATE TABLE orders_daily (
+    day DATE NOT NULL,
+    segment VARCHAR(10) NOT NULL,
+    order_count BIGINT NOT NULL DEFAULT 0,
+    order_total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, segment)
+);
+
+CREATE TABLE orders_monthly (
+    month DATE NOT NULL,
+    segment VARCHAR(10) NOT NULL,
+    order_count BIGINT NOT NULL DEFAULT 0,
+    order_total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, segment)
+);
+
+-- Per-customer rollups
+CREATE TABLE customer_totals (
+    customer_id INTEGER PRIMARY KEY,
+    order_count BIGINT NOT NULL DEFAULT 0,
+    total_spent DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE customer_category_units (
+    customer_id INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    units BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (customer_id, category_id)
+);
+"""
+
+TRIGGERS = """
+CREATE FUNCTION sales_rollup_enqueue() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'orders' THEN
+        INSERT INTO sales_rollup_queue (order_id)
+        VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+    ELSE
+        -- An item moved to another order changes both orders
+        INSERT INTO sales_rollup_queue (order_id)
+        SELECT DISTINCT order_id
+        FROM (VALUES (CASE WHEN TG_OP <> 'INSERT' THEN OLD.order_id END),
+                     (CASE WHEN TG_OP <> 'DELETE' THEN NEW.order_id END)) AS changed (order_id)
+        WHERE order_id IS NOT NULL;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_sales_rollup
+AFTER INSERT OR DELETE OR UPDATE OF status, total_amount, order_date, customer_id ON orders
+FOR EACH ROW EXECUTE FUNCTION sales_rollup_enqueue();
+
+CREATE TRIGGER order_items_sales_rollup
+AFTER INSERT OR DELETE OR UPDATE ON order_items
+FOR EACH ROW EXECUTE FUNCTION sales_rollup_enqueue();
+"""
+
+REFRESH = """
+CREATE FUNCTION refresh_sales_rollups(p_batch INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    v_orders INTEGER;
+BEGIN
+    -- One refresher at a time: two batches may hold the same order
+    PERFORM pg_advisory_xact_lock(hashtext('refresh_sales_rollups'));
+
+    CREATE TEMP TABLE IF NOT EXISTS _rollup_batch (order_id INTEGER PRIMARY KEY)
+        ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS _rollup_line_delta (
+        day DATE, category_id INTEGER, author_id INTEGER, segment VARCHAR(10),
+        customer_id INTEGER, units BIGINT, revenue DECIMAL(14, 2)
+    ) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS _rollup_order_delta (
+        day DATE, segment VARCHAR(10), customer_id INTEGER,
+        order_count BIGINT, order_total DECIMAL(14, 2)
+    ) ON COMMIT DELETE ROWS;
+
+    -- 1. Claim a batch of changed orders
+    WITH claimed AS (
+        DELETE FROM sales_rollup_queue
+        WHERE id IN (SELECT id FROM sales_rollup_queue ORDER BY id LIMIT p_batch
+                     FOR UPDATE SKIP LOCKED)
+        RETURNING order_id
+    )
+    INSERT INTO _rollup_batch SELECT DISTINCT order_id FROM claimed;
+    GET DIAGNOSTICS v_orders = ROW_COUNT;
+    IF v_orders = 0 THEN
+        RETURN 0;
+    END IF;
+
+    -- 2. Take out what these orders contributed so far
+    INSERT INTO _rollup_line_delta
+    SELECT f.day, f.category_id, f.author_id, f.segment, f.customer_id, -f.units, -f.revenue
+    FROM sales_fact_lines f JOIN _rollup_batch b USING (order_id);
+
+    INSERT INTO _rollup_order_delta
+    SELECT f.day, f.segment, f.customer_id, -1, -f.order_total
+    FROM sales_fact_orders f JOIN _rollup_batch b USING (order_id)
+    WHERE f.counted;
+
+    DELETE FROM sales_fact_lines f USING _rollup_batch b WHERE f.order_id = b.order_id;
+    DELETE FROM sales_fact_orders f USING _rollup_batch b
+    WHERE f.order_id = b.order_id AND NOT EXISTS (SELECT 1 FROM orders o WHERE o.id = f.order_id);
+
+    -- 3. Record their current state; new orders get their segment from
+    --    the customer's number of earlier counted orders
+    INSERT INTO sales_fact_orders (order_id, day, customer_id, segment, order_total, counted)
+    SELECT n.order_id, n.day, n.customer_id,
+           COALESCE(n.old_segment,
+                    CASE WHEN n.prior_orders = 0 THEN 'new'
+                         WHEN n.prior_orders < 5 THEN 'returning'
+                         ELSE 'loyal' END),
+           n.total_amount, n.counted
+    FROM (
+        SELECT o.id AS order_id,
+               (COALESCE(o.order_date, CURRENT_TIMESTAMP) AT TIME ZONE 'UTC')::date AS day,
+               o.customer_id,
+               o.total_amount,
+               COALESCE(o.status <> 'cancelled', FALSE) AS counted,
+               f.segment AS old_segment,
+               COALESCE(t.order_count, 0)
+                 + ROW_NUMBER() OVER (PARTITION BY o.customer_id, f.order_id IS NULL
+                                      ORDER BY o.id) - 1 AS prior_orders
+        FROM orders o
+        JOIN _rollup_batch b ON b.order_id = o.id
+        LEFT JOIN sales_fact_orders f ON f.order_id = o.id
+        LEFT JOIN customer_totals t ON t.customer_id = o.customer_id
+    ) n
+    ON CONFLICT (order_id) DO UPDATE
+    SET day = EXCLUDED.day,
+        customer_id = EXCLUDED.customer_id,
+        order_total = EXCLUDED.order_total,
+        counted = EXCLUDED.counted;
+
+    INSERT INTO sales_fact_lines
+        (order_id, day, category_id, author_id, segment, customer_id, units, revenue)
+    SELECT f.order_id, f.day, COALESCE(bk.category_id, 0), COALESCE(bk.author_id, 0),
+           f.segment, f.customer_id, oi.quantity, oi.quantity * oi.price_at_purchase
+    FROM sales_fact_orders f
+    JOIN _rollup_batch b USING (order_id)
+    JOIN order_items oi ON oi.order_id = f.order_id
+    LEFT JOIN books bk ON bk.id = oi.book_id
+    WHERE f.counted;
+
+    -- 4. Put back what they contribute now
+    INSERT INTO _rollup_line_delta
+    SELECT f.day, f.category_id, f.author_id, f.segment, f.customer_id, f.units, f.revenue
+    FROM sales_fact_lines f JOIN _rollup_batch b USING (order_id);
+
+    INSERT INTO _rollup_order_delta
+    SELECT f.day, f.segment, f.customer_id, 1, f.order_total
+    FROM sales_fact_orders f JOIN _rollup_batch b USING (order_id)
+    WHERE f.counted;
+
+    -- 5. Apply the net change to every rollup
+    INSERT INTO sales_daily AS r (day, category_id, author_id, segment, units, revenue)
+    SELECT day, category_id, author_id, segment, SUM(units), SUM(revenue)
+    FROM _rollup_line_delta GROUP BY 1, 2, 3, 4
+    ON CONFLICT (day, category_id, author_id, segment) DO UPDATE
+    SET units = r.units + EXCLUDED.units, revenue = r.revenue + EXCLUDED.revenue;
+
+    INSERT INTO sales_monthly AS r (month, category_id, author_id, segment, units, revenue)
+    SELECT date_trunc('month', day)::date, category_id, author_id, segment, SUM(units), SUM(revenue)
+    FROM _rollup_line_delta GROUP BY 1, 2, 3, 4
+    ON CONFLICT (month, category_id, author_id, segment) DO UPDATE
+    SET units = r.units + EXCLUDED.units, revenue = r.revenue + EXCLUDED.revenue;
+
+    INSERT INTO sales_monthly_by_author AS r (month, author_id, units, revenue)
+    SELECT date_trunc('month', day)::date, author_id, SUM(units), SUM(revenue)
+    FROM _rollup_line_delta GROUP BY 1, 2
+    ON CONFLICT (month, author_id) DO UPDATE
+    SET units = r.units + EXCLUDED.units, revenue = r.revenue + EXCLUDED.revenue;
+
+    INSERT INTO sales_monthly_by_category AS r (month, category_id, units, revenue)
+    SELECT date_trunc('month', day)::date, category_id, SUM(units), SUM(revenue)
+    FROM _rollup_line_delta GROUP BY 1, 2
+    ON CONFLICT (month, category_id) DO UPDATE
+    SET units = r.units + EXCLUDED.units, revenue = r.revenue + EXCLUDED.revenue;
+
+    INSERT INTO orders_daily AS r (day, segment, order_count, order_total)
+    SELECT day, segment, SUM(order_count), SUM(order_total)
+    FROM _rollup_order_delta GROUP BY 1, 2
+    ON CONFLICT (day, segment) DO UPDATE
+    SET order_count = r.order_count + EXCLUDED.order_count,
+        order_total = r.order_total + EXCLUDED.order_total;
+
+    INSERT INTO orders_monthly AS r (month, segment, order_count, order_total)
+    SELECT date_trunc('month', day)::date, segment, SUM(order_count), SUM(order_total)
+    FROM _rollup_order_delta GROUP BY 1, 2
+    ON CONFLICT (month, segment) DO UPDATE
+    SET order_count = r.order_count + EXCLUDED.order_count,
+        order_total = r.order_total + EXCLUDED.order_total;
+
+    INSERT INTO customer_totals AS r (customer_id, order_count, total_spent)
+    SELECT customer_id, SUM(order_count), SUM(order_total)
+    FROM _rollup_order_delta WHERE customer_id IS NOT NULL GROUP BY 1
+    ON CONFLICT (customer_id) DO UPDATE
+    SET order_count = r.order_count + EXCLUDED.order_count,
+        total_spent = r.total_spent + EXCLUDED.total_spent;
+
+    INSERT INTO customer_category_units AS r (customer_id, category_id, units)
+    SELECT customer_id, category_id, SUM(units)
+    FROM _rollup_line_delta WHERE customer_id IS NOT NULL GROUP BY 1, 2
+    ON CONFLICT (customer_id, category_id) DO UPDATE
+    SET units = r.units + EXCLUDED.units;
+
+    RETURN v_orders;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade():
+    op.execute(TABLES)
+    op.execute(REFRESH)
+
+    # Commit the tables first so the trigger lock on orders is only held
+    # for the CREATE TRIGGER itself, not for the queue fill below
+    with op.get_context().autocommit_block():
+        retry(lambda: op.execute(TRIGGERS))
+
+        # Existing orders are folded in by the first refresh_sales_rollups()
+        # calls. An order placed meanwhile may be queued twice; the refresh
+        # recomputes each order from its current state, so that is harmless.
+        with statement_timeout("0"):
+            op.execute("INSERT INTO sales_rollup_queue (order_id) SELECT id FROM orders ORDER BY id")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS order_items_sales_rollup ON order_items")
+    op.execute("DROP TRIGGER IF EXISTS orders_sales_rollup ON orders")
+    op.execute("DROP FUNCTION IF EXISTS sales_rollup_enqueue()")
+    op.execute("DROP FUNCTION IF EXISTS refresh_sales_rollups(INTEGER)")
+    op.execute("""
+        DROP TABLE IF EXISTS sales_rollup_queue, sales_fact_orders, sales_fact_lines,
+            sales_daily, sales_monthly, sales_monthly_by_author, sales_monthly_by_category,
+            orders_daily, orders_monthly, customer_totals, customer_category_units
+    """)
@@ -0,0 +1,81 @@
+"""Order fulfillment queue: lease columns, actionable index, NOTIFY trigger
+
+Orders are their own jobs. Workers (fulfillment.py) claim actionable
+orders - pending, processing or shipped - with FOR UPDATE SKIP LOCKED
+and move each one step along pending -> processing -> shipped ->
+delivered. The new columns:
+
+- visible_at: when the order may next be claimed. A claim pushes it out
+  by the lease (visibility timeout), so an order whose worker died is
+  picked up again once the lease expires. A failed step pushes it out
+  by the retry backoff. NULL parks an order that ran out of attempts.
+- attempts: claims of the current step, reset when the step completes
+- claimed_by: worker holding the lease
+- last_error: why the last attempt failed
+
+idx_orders_actionable only covers the three actionable statuses, so it
+stays small while delivered orders pile up. It covers status and
+visible_at, so status updates on orders are no longer HOT
+(see maintenance.py).
+
+An insert into orders sends a NOTIFY on the order_jobs channel, once
+per statement, so idle workers wake up instead of polling.
+
+The defaults are constant within the ALTER (CURRENT_TIMESTAMP is
+stable), so the new columns are metadata only - no table rewrite.
+
+Revision ID: 0005_fulfillment_queue
+Revises: 0004_sales_rollups
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from migrations.online import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision = "0005_fulfillment_queue"
+down_revision = "0004_sales_rollups"
+branch_labels = None
+depends_on = None
+
+
+TRIGGERS = """
+CREATE FUNCTION notify_order_jobs() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('order_jobs', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_notify_jobs
+AFTER INSERT ON orders
+FOR EACH STATEMENT EXECUTE FUNCTION notify_order_jobs();
+"""
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE orders
+            ADD COLUMN IF NOT EXISTS visible_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+            ADD COLUMN IF NOT EXISTS last_error TEXT
+    """)
+    op.execute(TRIGGERS)
+
+    create_index_concurrently(
+        "idx_orders_actionable", "orders", ["visible_at"],
+        where="status IN ('pending', 'processing', 'shipped')")
+
+
+def downgrade():
+    drop_index_concurrently("idx_orders_actionable")
+    op.execute("DROP TRIGGER IF EXISTS orders_notify_jobs ON orders")
+    op.execute("DROP FUNCTION IF EXISTS notify_order_jobs()")
+    op.execute("""
+        ALTER TABLE orders
+            DROP COLUMN IF EXISTS visible_at,
+            DROP COLUMN IF EXISTS attempts,
+            DROP COLUMN IF EXISTS claimed_by,
+            DROP COLUMN IF EXISTS last_error
+    """)
@@ -0,0 +1,424 @@
+"""
+PostgreSQL Configuration Tuner
+==============================
+The container starts with PostgreSQL's defaults: 128 MB shared_buffers,
+4 MB work_mem, random_page_cost = 4 (spinning disks) and so on. This
+tool derives settings from the host's memory, cores and storage type,
+writes them to config/tuned.conf (included by config/postgresql.conf,
+which docker-compose.yml mounts into the container), and measures the
+difference with pgbench.
+
+The pgbench scripts in sql/pgbench encode the bookstore's transactions:
+- catalog_read.sql:    book page, latest reviews, same-category books
+- review_insert.sql:   post or revise a review
+- order_placement.sql: reserve stock, create order and order item
+
+How to run (from the python folder, Docker running):
+  Windows:  python pgtune.py --show
+  macOS:    python3 pgtune.py --show
+
+  Write config/tuned.conf and restart the database with it:
+  python3 pgtune.py --apply
+
+  Benchmark default vs. tuned settings (restarts the database twice):
+  python3 pgtune.py --compare --duration 60
+
+  Override what was detected (e.g. Docker Desktop's memory limit):
+  python3 pgtune.py --apply --memory 4GB --cores 4 --storage ssd
+"""
+
+import argparse
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2
+
+from workload import DB_CONFIG, top_up_stock
+
+ROOT = Path(__file__).resolve().parent.parent
+CONFIG_DIR = ROOT / "config"
+TUNED_CONF = CONFIG_DIR / "tuned.conf"
+SERVICE = "postgres"
+
+# Script weights for the mixed run: mostly browsing, some writes
+SCRIPTS = {
+    "catalog_read": 70,
+    "review_insert": 10,
+    "order_placement": 20,
+}
+
+# Storage type -> (random_page_cost, effective_io_concurrency)
+STORAGE = {
+    "ssd": (1.1, 200),
+    "hdd": (4.0, 2),
+    "san": (1.1, 300),
+}
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+def compose(*args: str, capture: bool = False) -> str:
+    """Run `docker compose <args>` in the project folder."""
+    result = subprocess.run(["docker", "compose", *args], cwd=ROOT, check=True,
+                            capture_output=capture, text=True)
+    return result.stdout if capture else ""
+
+
+# ==============================================
+# Host detection
+# ==============================================
+
+def parse_size(text: str) -> int:
+    """'512MB', '4GB' or a plain number of bytes -> bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*", text.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size {text!r}")
+    number, unit = float(match.group(1)), match.group(2).rstrip("B")
+    return int(number * 1024 ** " KMGT".index(unit or " "))
+
+
+# cgroup v2 memory limit ("max" when there is none)
+CGROUP_MEMORY_MAX = "/sys/fs/cgroup/memory.max"
+
+
+def _limited(memory: int, limit: str) -> int:
+    """`memory`, or the cgroup limit when that is lower."""
+    limit = limit.strip()
+    return min(memory, int(limit)) if limit.isdigit() else memory
+
+
+def detect_host() -> Tuple[int, int]:
+    """(memory bytes, cores) as seen from inside the database container.
+
+    /proc/meminfo shows the whole host (on Docker Desktop, the VM), so a
+    memory limit on the container (docker run --memory, compose
+    mem_limit) is read from its cgroup first. Falls back to this
+    machine's memory and cores if the container is not reachable.
+    """
+    try:
+        output = compose("exec", "-T", SERVICE, "sh", "-c",
+                         f"cat {CGROUP_MEMORY_MAX} 2>/dev/null || echo max; "
+                         "grep MemTotal /proc/meminfo; nproc", capture=True)
+        limit, kb, cores = re.search(r"(\S+)\s+MemTotal:\s+(\d+) kB\s+(\d+)", output).groups()
+        return _limited(int(kb) * 1024, limit), int(cores)
+    except (OSError, subprocess.CalledProcessError, AttributeError):
+        pass
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError):
+        sys.exit("❌ Could not detect memory; pass --memory (e.g. --memory 4GB)")
+    try:
+        memory = _limited(memory, Path(CGROUP_MEMORY_MAX).read_text())
+    except OSError:
+        pass
+    return memory, os.cpu_count() or 1
+
+
+def detect_storage() -> str:
+    """'hdd' if any local block device is rotational (Linux only), otherwise 'ssd'."""
+    for flag in Path("/sys/block").glob("*/queue/rotational"):
+        if flag.parent.parent.name.startswith(("loop", "ram", "zram")):
+            continue
+        if flag.read_text().strip() == "1":
+            return "hdd"
+    return "ssd"
+
+
+# ==============================================
+# Deriving the settings
+# ==============================================
+
+def _size(value: int) -> str:
+    """Bytes -> a postgresql.conf size ('256MB', '4GB', '640kB')."""
+    if value >= GB and value % GB == 0:
+        return f"{value // GB}GB"
+    if value >= MB:
+        return f"{value // MB}MB"
+    return f"{max(64, value // 1024)}kB"
+
+
+def tune(memory: int, cores: int, storage: str = "ssd",
+         connections: int = 100) -> Dict[str, str]:
+    """Settings for an OLTP web workload on a dedicated database host.
+
+    Memory: a quarter for shared_buffers, and the planner is told the OS
+    cache holds most of the rest. work_mem is sized so that every
+    connection can run a few sorts at once without swapping.
+    """
+    shared_buffers = memory // 4
+    parallel_per_gather = min(4, max(1, math.ceil(cores / 2)))
+    work_mem = (memory - shared_buffers) // (connections * 3) // parallel_per_gather
+    random_page_cost, io_concurrency = STORAGE[storage]
+
+    settings = {
+        "max_connections": str(connections),
+        "shared_buffers": _size(shared_buffers),
+        "effective_cache_size": _size(memory * 3 // 4),
+        "maintenance_work_mem": _size(min(memory // 16, 2 * GB)),
+        "work_mem": _size(max(work_mem, 4 * MB)),
+        "wal_buffers": _size(min(max(shared_buffers * 3 // 100, 64 * 1024), 16 * MB)),
+        "min_wal_size": "1GB",
+        "max_wal_size": "4GB",
+        "checkpoint_completion_target": "0.9",
+        "default_statistics_target": "100",
+        "random_page_cost": str(random_page_cost),
+        "effective_io_concurrency": str(io_concurrency),
+    }
+    if cores >= 2:
+        settings.update({
+            "max_worker_processes": str(max(8, cores)),  # never below the default
+            "max_parallel_workers_per_gather": str(parallel_per_gather),
+            "max_parallel_workers": str(cores),
+            "max_parallel_maintenance_workers": str(parallel_per_gather),
+        })
+    return settings
+
+
+def render(settings: Dict[str, str], memory: int, cores: int, storage: str) -> str:
+    lines = [
+        "# Generated by python/pgtune.py - do not edit, re-run the tool instead.",
+        f"# Host: {_size(memory)} memory, {cores} cores, {storage} storage",
+        "",
+    ]
+    width = max(len(name) for name in settings)
+    lines += [f"{name:<{width}} = {value}" for name, value in settings.items()]
+    return "\n".join(lines) + "\n"
+
+
+# ==============================================
+# Applying a profile
+# ==============================================
+
+def wait_until_ready(timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            psycopg2.connect(connect_timeout=2, **DB_CONFIG).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1.0)
+
+
+def use_profile(profile: str, conf: Optional[str] = None):
+    """Switch to 'default' or 'tuned' (`conf`) settings and restart the database."""
+    if profile == "tuned":
+        TUNED_CONF.write_text(conf)
+    elif TUNED_CONF.exists():
+        TUNED_CONF.unlink()
+
+    print(f"🔄 Restarting PostgreSQL with {profile} settings...")
+    compose("restart", SERVICE)
+    wait_until_ready()
+
+
+def current_settings(names: List[str]) -> Dict[str, str]:
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT name, current_setting(name) FROM pg_settings "
+                        "WHERE name = ANY(%s);", (names,))
+            values = dict(cur.fetchall())
+    conn.close()
+    return values
+
+
+# ==============================================
+# pgbench
+# ==============================================
+
+def id_ranges() -> Dict[str, int]:
+    """Lowest and highest book and customer ids, for picking random rows."""
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT (SELECT MIN(id) FROM books), (SELECT MAX(id) FROM books),
+                       (SELECT MIN(id) FROM customers), (SELECT MAX(id) FROM customers);
+            """)
+            book_min, book_max, customer_min, customer_max = cur.fetchone()
+    conn.close()
+    return {"book_min": book_min, "book_max": book_max,
+            "customer_min": customer_min, "customer_max": customer_max}
+
+
+def save_data() -> Tuple[int, int]:
+    """Remember the last order and review, and copy the reviews a run may revise.
+
+    Returns the (order id, review id) markers for restore_data().
+    """
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM orders;")
+            last_order = cur.fetchone()[0]
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM reviews;")
+            last_review = cur.fetchone()[0]
+            cur.execute("""
+                DROP TABLE IF EXISTS pgtune_saved_reviews;
+                CREATE UNLOGGED TABLE pgtune_saved_reviews AS
+                SELECT id, rating, comment, created_at FROM reviews;
+            """)
+    conn.close()
+    return last_order, last_review
+
+
+def restore_data(markers: Tuple[int, int]):
+    """Undo a pgbench run, so every profile starts from the same data.
+
+    Removes the orders and reviews it added, puts revised reviews back
+    and vacuums, so the next run does not inherit dead rows either.
+    """
+    last_order, last_review = markers
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM orders WHERE id > %s;", (last_order,))
+            cur.execute("DELETE FROM reviews WHERE id > %s;", (last_review,))
+            cur.execute("""
+                UPDATE reviews r
+                SET rating = s.rating, comment = s.comment, created_at = s.created_at
+                FROM pgtune_saved_reviews s
+                WHERE r.id = s.id
+                  AND (r.rating, r.comment, r.created_at)
+                      IS DISTINCT FROM (s.rating, s.comment, s.created_at);
+            """)
+            cur.execute("DROP TABLE pgtune_saved_reviews;")
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE orders, order_items, reviews, books;")
+    finally:
+        conn.close()
+
+
+def run_pgbench(clients: int, jobs: int, duration: int) -> str:
+    """Run the weighted bookstore mix inside the container; returns pgbench's output."""
+    args = ["exec", "-T", SERVICE, "pgbench",
+            "-U", DB_CONFIG["user"], "-d", DB_CONFIG["database"],
+            "-n", "-c", str(clients), "-j", str(jobs), "-T", str(duration)]
+    for name, value in id_ranges().items():
+        args += ["-D", f"{name}={value}"]
+    for script, weight in SCRIPTS.items():
+        args += ["-f", f"/pgbench/{script}.sql@{weight}"]
+    return compose(*args, capture=True)
+
+
+def parse_pgbench(output: str) -> Dict[str, Dict[str, float]]:
+    """Overall and per-script TPS and average latency from pgbench output."""
+    results = {}
+    tps = re.search(r"^tps = ([\d.]+) \(without initial connection time\)", output, re.M)
+    latency = re.search(r"^latency average = ([\d.]+) ms", output, re.M)
+    failed = re.search(r"^number of failed transactions: (\d+)", output, re.M)
+    results["all"] = {
+        "tps": float(tps.group(1)) if tps else 0.0,
+        "latency_ms": float(latency.group(1)) if latency else 0.0,
+        "failed": int(failed.group(1)) if failed else 0,
+    }
+
+    # "SQL script 1: /pgbench/catalog_read.sql" ... " - 1234 transactions (70.1% of total, tps = 41.2)"
+    # ... " - latency average = 3.21 ms"
+    for block in re.split(r"^SQL script \d+: ", output, flags=re.M)[1:]:
+        name = Path(block.splitlines()[0].strip()).stem
+        tps = re.search(r"tps = ([\d.]+)\)", block)
+        latency = re.search(r"latency average = ([\d.]+) ms", block)
+        results[name] = {
+            "tps": float(tps.group(1)) if tps else 0.0,
+            "latency_ms": float(latency.group(1)) if latency else 0.0,
+        }
+    return results
+
+
+def benchmark(profile: str, clients: int, jobs: int, duration: int) -> Dict[str, Dict[str, float]]:
+    """One pgbench run; the orders and reviews it wrote are undone afterwards."""
+    top_up_stock(DB_CONFIG, 1_000_000)
+    markers = save_data()
+    print(f"🏋️  pgbench ({profile}): {clients} clients, {duration}s...")
+    try:
+        return parse_pgbench(run_pgbench(clients, jobs, duration))
+    finally:
+        restore_data(markers)
+
+
+def print_comparison(results: Dict[str, Dict[str, Dict[str, float]]]):
+    default, tuned = results["default"], results["tuned"]
+    print("\n" + "=" * 72)
+    print("📊 Default vs. tuned")
+    print("=" * 72)
+    print(f"   {'transaction':<17} {'TPS default':>12} {'TPS tuned':>10} {'change':>8}"
+          f" {'lat ms def':>11} {'lat ms tuned':>13}")
+    for name in ["all", *SCRIPTS]:
+        if name not in default or name not in tuned:
+            continue
+        d, t = default[name], tuned[name]
+        change = (t["tps"] / d["tps"] - 1) * 100 if d["tps"] else 0.0
+        print(f"   {name:<17} {d['tps']:>12.1f} {t['tps']:>10.1f} {change:>+7.1f}%"
+              f" {d['latency_ms']:>11.2f} {t['latency_ms']:>13.2f}")
+    for profile, runs in results.items():
+        if runs["all"].get("failed"):
+            print(f"   ⚠️ {runs['all']['failed']} failed transactions with {profile} settings")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune PostgreSQL for this host and benchmark it")
+    parser.add_argument("--memory", type=parse_size, help="memory for PostgreSQL (default: detected)")
+    parser.add_argument("--cores", type=int, help="CPU cores (default: detected)")
+    parser.add_argument("--storage", choices=sorted(STORAGE), help="default: detected")
+    parser.add_argument("--connections", type=int, default=100, help="max_connections")
+    parser.add_argument("--show", action="store_true", help="print the settings only")
+    parser.add_argument("--apply", action="store_true", help="write tuned.conf and restart")
+    parser.add_argument("--reset", action="store_true", help="remove tuned.conf and restart")
+    parser.add_argument("--compare", action="store_true", help="pgbench default vs. tuned")
+    parser.add_argument("--clients", type=int, default=16, help="pgbench clients")
+    parser.add_argument("--jobs", type=int, default=4, help="pgbench threads")
+    parser.add_argument("--duration", type=int, default=60, help="seconds per pgbench run")
+    args = parser.parse_args()
+
+    if args.memory and args.cores:
+        memory, cores = args.memory, args.cores
+    else:
+        detected_memory, detected_cores = detect_host()
+        memory, cores = args.memory or detected_memory, args.cores or detected_cores
+    storage = args.storage or detect_storage()
+    settings = tune(memory, cores, storage, args.connections)
+    conf = render(settings, memory, cores, storage)
+
+    print("=" * 72)
+    print(f"🔧 {_size(memory)} memory, {cores} cores, {storage} storage")
+    print("=" * 72)
+    print(conf)
+
+    if args.clients >= args.connections:
+        parser.error("--clients must be lower than --connections")
+
+    try:
+        if args.compare:
+            results = {}
+            for profile in ("default", "tuned"):
+                use_profile(profile, conf)
+                results[profile] = benchmark(profile, args.clients, args.jobs, args.duration)
+            print_comparison(results)
+            print(f"\n✅ Left running with tuned settings ({TUNED_CONF.relative_to(ROOT)})")
+        elif args.apply:
+            use_profile("tuned", conf)
+            live = current_settings(list(settings))
+            print("Running with:")
+            for name in settings:
+                print(f"   {name} = {live.get(name, '?')}")
+        elif args.reset:
+            use_profile("default")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ `{' '.join(e.cmd)}` failed: {e.stderr or e}")
+        sys.exit(1)
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Sales Rollups for Reporting
+===========================
+Query the pre-aggregated sales tables created by migration
+0004_sales_rollups instead of joining orders, order_items, books and
+authors from scratch.
+
+- refresh() folds new orders and status changes into the rollups
+- query() answers "units / revenue / orders by period and dimension"
+  from the coarsest rollup table that can answer it
+- author_revenue(), customer_loyalty() and monthly_sales() replace
+  Challenges 1, 2 and 4 in sql/exercises.sql
+
+Periods can be day, week, month, quarter, year or all. Weekly numbers
+come from the daily tables; months and longer from the monthly ones
+when the date range lines up with whole months.
+
+How to run (after `alembic upgrade head`):
+  Windows:  python rollups.py --refresh
+  macOS:    python3 rollups.py --refresh
+
+  Keep the rollups fresh every 5 seconds:
+  python3 rollups.py --watch 5
+
+  Compare the challenge queries with the rollups:
+  python3 rollups.py --benchmark
+
+  Check that orders with a NULL status or order_date do not stall the
+  refresh (exit code 1 if they do):
+  python3 rollups.py --check
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+GRAINS = ("day", "week", "month", "quarter", "year", "all")
+
+# Which requested periods each rollup grain can be summed up into
+ROLLS_UP_TO = {
+    "day": set(GRAINS),
+    "month": {"month", "quarter", "year", "all"},
+}
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """One pre-aggregated table: its time grain, dimensions and measures."""
+    table: str
+    grain: str
+    period_column: str
+    dimensions: Tuple[str, ...]
+    measures: Tuple[str, ...]
+
+
+# Coarsest first: query() uses the first table that can answer a question
+ROLLUPS = (
+    Rollup("sales_monthly_by_author", "month", "month", ("author_id",), ("units", "revenue")),
+    Rollup("sales_monthly_by_category", "month", "month", ("category_id",), ("units", "revenue")),
+    Rollup("orders_monthly", "month", "month", ("segment",), ("order_count", "order_total")),
+    Rollup("sales_monthly", "month", "month", ("category_id", "author_id", "segment"),
+           ("units", "revenue")),
+    Rollup("orders_daily", "day", "day", ("segment",), ("order_count", "order_total")),
+    Rollup("sales_daily", "day", "day", ("category_id", "author_id", "segment"),
+           ("units", "revenue")),
+)
+
+
+# ==============================================
+# Refreshing
+# ==============================================
+
+def refresh(conn, batch: int = 10000) -> int:
+    """Apply all queued order changes to the rollups; returns orders processed.
+
+    Each batch commits on its own, so a long backlog never holds locks
+    for long.
+    """
+    processed = 0
+    with conn.cursor() as cur:
+        while True:
+            cur.execute("SELECT refresh_sales_rollups(%s);", (batch,))
+            count = cur.fetchone()[0]
+            conn.commit()
+            if count == 0:
+                return processed
+            processed += count
+
+
+def pending(conn) -> int:
+    """Number of queued changes not yet in the rollups."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM sales_rollup_queue;")
+        count = cur.fetchone()[0]
+    conn.rollback()
+    return count
+
+
+def check(conn) -> bool:
+    """Refresh across orders with a NULL status or order_date.
+
+    Both columns are nullable, and one such order must not stop every
+    later refresh. The check orders are deleted again afterwards.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO orders (customer_id, status, order_date, total_amount)
+            SELECT (SELECT MIN(id) FROM customers), s.status, s.order_date, 10.00
+            FROM (VALUES (NULL, CURRENT_TIMESTAMP), ('pending', NULL)) AS s (status, order_date)
+            RETURNING id;
+        """)
+        ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+
+    try:
+        refresh(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT order_id, day, counted FROM sales_fact_orders "
+                        "WHERE order_id = ANY(%s) ORDER BY order_id;", (ids,))
+            facts = cur.fetchall()
+        conn.rollback()
+        ok = pending(conn) == 0 and len(facts) == len(ids)
+        for order_id, day, counted in facts:
+            print(f"   order {order_id}: day {day}, counted {counted}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"   ❌ refresh failed: {e}")
+        ok = False
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM orders WHERE id = ANY(%s);", (ids,))
+        conn.commit()
+        refresh(conn)
+
+    print("   ✅ refresh handles NULL status and order_date" if ok else
+          "   ❌ orders with NULL status or order_date block the refresh")
+    return ok
+
+
+# ==============================================
+# Querying
+# ==============================================
+
+def _aligned(day: Optional[date], grain: str) -> bool:
+    """True when `day` falls on a period boundary of `grain`."""
+    return day is None or grain == "day" or day.day == 1
+
+
+def choose_rollup(measures: Sequence[str], grain: str, by: Sequence[str] = (),
+                  filters: Optional[Dict] = None, start: Optional[date] = None,
+                  end: Optional[date] = None) -> Rollup:
+    """Pick the coarsest rollup that has every measure and dimension needed.
+
+    A monthly table is only usable when the requested period is a month
+    or longer and the date range starts and ends on month boundaries.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain {grain!r}; use one of {', '.join(GRAINS)}")
+
+    needed = set(by) | set(filters or {})
+    for rollup in ROLLUPS:
+        if (set(measures) <= set(rollup.measures)
+                and needed <= set(rollup.dimensions)
+                and grain in ROLLS_UP_TO[rollup.grain]
+                and _aligned(start, rollup.grain) and _aligned(end, rollup.grain)):
+            return rollup
+    raise ValueError(f"No rollup has {sorted(measures)} by {sorted(needed)} per {grain}")
+
+
+def query(conn, measures: Sequence[str], grain: str = "month", by: Sequence[str] = (),
+          filters: Optional[Dict] = None, start: Optional[date] = None,
+          end: Optional[date] = None, rollup: Optional[Rollup] = None) -> List[tuple]:
+    """Sum `measures` per period (and per `by` dimension) from a rollup.
+
+    Returns rows of (period, *by, *measures) ordered by period and `by`;
+    the period is left out when grain is 'all'. `start` is inclusive and
+    `end` exclusive.
+    """
+    rollup = rollup or choose_rollup(measures, grain, by, filters, start, end)
+    period = rollup.period_column
+
+    select, group = [], []
+    if grain != "all":
+        select.append(f"date_trunc('{grain}', {period})::date AS period")
+        group.append("period")
+    select += list(by)
+    group += list(by)
+    select += [f"SUM({m}) AS {m}" for m in measures]
+
+    where, params = [], []
+    for column, value in (filters or {}).items():
+        where.append(f"{column} = %s")
+        params.append(value)
+    if start is not None:
+        where.append(f"{period} >= %s")
+        params.append(start)
+    if end is not None:
+        where.append(f"{period} < %s")
+        params.append(end)
+
+    sql = f"SELECT {', '.join(select)} FROM {rollup.table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group:
+        sql += f" GROUP BY {', '.join(group)} ORDER BY {', '.join(group)}"
+
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    conn.rollback()
+    return rows
+
+
+# ==============================================
+# Challenge reports from the rollups
+# ==============================================
+
+def author_revenue(conn) -> List[tuple]:
+    """Challenge 1: (author name, books sold, revenue), best sellers first."""
+    totals = query(conn, ("units", "revenue"), grain="all", by=("author_id",))
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, name FROM authors;")
+        names = dict(cur.fetchall())
+    conn.rollback()
+    rows = [(names.get(author_id, "Unknown"), units, revenue)
+            for author_id, units, revenue in totals]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def customer_loyalty(conn, limit: int = 50) -> List[tuple]:
+    """Challenge 2: (customer, orders, spent, avg order, favorite category)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.first_name || ' ' || c.last_name AS customer,
+                   t.order_count,
+                   t.total_spent,
+                   ROUND(t.total_spent / NULLIF(t.order_count, 0), 2) AS avg_order_value,
+                   fav.name AS favorite_category
+            FROM customer_totals t
+            JOIN customers c ON c.id = t.customer_id
+            LEFT JOIN LATERAL (
+                SELECT cat.name
+                FROM customer_category_units u
+                JOIN categories cat ON cat.id = u.category_id
+                WHERE u.customer_id = t.customer_id AND u.units > 0
+                ORDER BY u.units DESC, cat.name
+                LIMIT 1
+            ) fav ON TRUE
+            WHERE t.order_count > 0
+            ORDER BY t.total_spent DESC
+            LIMIT %s;
+        """, (limit,))
+        rows = cur.fetchall()
+    conn.rollback()
+    return rows
+
+
+def monthly_sales(conn) -> List[tuple]:
+    """Challenge 4: (month, orders, revenue, avg order value)."""
+    rows = query(conn, ("order_count", "order_total"), grain="month")
+    return [(period.strftime("%Y-%m"), count, total, round(total / count, 2) if count else None)
+            for period, count, total in rows if count]
+
+
+# The original challenge answers, for comparison
+CHALLENGE_SQL = {
+    "Challenge 1: author revenue": """
+        SELECT a.name, SUM(oi.quantity), SUM(oi.quantity * oi.price_at_purchase) AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        JOIN books b ON b.id = oi.book_id
+        JOIN authors a ON a.id = b.author_id
+        WHERE o.status <> 'cancelled'
+        GROUP BY a.id
+        ORDER BY revenue DESC;
+    """,
+    "Challenge 2: customer loyalty": """
+        SELECT c.first_name || ' ' || c.last_name AS customer,
+               COUNT(DISTINCT o.id) AS total_orders,
+               SUM(o.total_amount) AS total_spent,
+               ROUND(AVG(o.total_amount)::numeric, 2) AS avg_order_value
+        FROM customers c
+        JOIN orders o ON c.id = o.customer_id
+        WHERE o.status <> 'cancelled'
+        GROUP BY c.id
+        ORDER BY total_spent DESC
+        LIMIT 50;
+    """,
+    "Challenge 4: monthly sales": """
+        SELECT TO_CHAR(order_date, 'YYYY-MM') AS month,
+               COUNT(*) AS order_count,
+               SUM(total_amount) AS total_revenue,
+               ROUND(AVG(total_amount)::numeric, 2) AS avg_order_value
+        FROM orders
+        WHERE status <> 'cancelled'
+        GROUP BY TO_CHAR(order_date, 'YYYY-MM')
+        ORDER BY month;
+    """,
+}
+
+ROLLUP_REPORTS = {
+    "Challenge 1: author revenue": author_revenue,
+    "Challenge 2: customer loyalty": customer_loyalty,
+    "Challenge 4: monthly sales": monthly_sales,
+}
+
+
+def benchmark(conn, repeats: int = 3):
+    """Time each challenge from the base tables and from the rollups."""
+    print("\n" + "=" * 64)
+    print("⏱️  Base tables vs. rollups (best of %d)" % repeats)
+    print("=" * 64)
+    print(f"   {'report':<32} {'base ms':>10} {'rollup ms':>10} {'speedup':>8}")
+
+    for name, sql in CHALLENGE_SQL.items():
+        base = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.fetchall()
+            conn.rollback()
+            base.append(time.perf_counter() - started)
+
+        fast = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            ROLLUP_REPORTS[name](conn)
+            fast.append(time.perf_counter() - started)
+
+        print(f"   {name:<32} {min(base) * 1000:>10.1f} {min(fast) * 1000:>10.1f}"
+              f" {min(base) / max(min(fast), 1e-9):>7.0f}x")
+
+
+def print_reports(conn):
+    print("\n💰 Author revenue:")
+    for name, units, revenue in author_revenue(conn)[:10]:
+        print(f"   {name}: {units} sold, ${revenue}")
+
+    print("\n👥 Customer loyalty:")
+    for customer, orders, spent, avg, favorite in customer_loyalty(conn, 10):
+        print(f"   {customer}: {orders} orders, ${spent} (avg ${avg}), likes {favorite or '-'}")
+
+    print("\n📅 Monthly sales:")
+    for month, orders, revenue, avg in monthly_sales(conn)[-12:]:
+        print(f"   {month}: {orders} orders, ${revenue} (avg ${avg})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sales rollups for reporting")
+    parser.add_argument("--refresh", action="store_true", help="apply queued changes once")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep refreshing every SECONDS")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare the challenge queries with the rollups")
+    parser.add_argument("--check", action="store_true",
+                        help="check that orders with NULL columns do not stall the refresh")
+    args = parser.parse_args()
+
+    try:
+        with psycopg2.connect(application_name="sales-rollups", **DB_CONFIG) as conn:
+            print("=" * 64)
+            print("📊 Sales Rollups")
+            print("=" * 64)
+
+            if args.check:
+                print("\n🔍 Refreshing orders with NULL status and order_date...")
+                if not check(conn):
+                    sys.exit(1)
+            elif args.watch:
+                print(f"\n🔄 Refreshing every {args.watch:g}s (Ctrl+C to stop)...")
+                try:
+                    while True:
+                        processed = refresh(conn)
+                        if processed:
+                            print(f"   Folded in {processed} orders")
+                        time.sleep(args.watch)
+                except KeyboardInterrupt:
+                    pass
+            else:
+                if args.refresh or pending(conn):
+                    print(f"\n🔄 Folded in {refresh(conn)} orders")
+                print_reports(conn)
+                if args.benchmark:
+                    benchmark(conn)
+        conn.close()
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
@@ -0,0 +1,560 @@
+"""
+Hash-Sharded Customers and Orders
+=================================
+Spread customers, orders, order_items and reviews over several
+PostgreSQL nodes by customer_id, while every node keeps a full copy of
+the catalog (books, authors, categories).
+
+- ShardMap: customer_id -> hash bucket -> shard. The 64 buckets make it
+  possible to move part of the data to a new shard later without
+  rehashing every customer.
+- Router: connection pools for all shards. Single-customer operations
+  (profile, orders, reviews, placing an order) touch only the owning
+  shard; cross-shard reports run on every shard in parallel and merge
+  the partial results.
+- Catalog: shard0 is the catalog primary. Its books, authors and
+  categories are copied to the other shards with logical replication.
+  Stock is reserved on shard0, then the order is written on the
+  customer's shard (with a compensating restock if that fails).
+- IDs: each shard's sequences step by the number of shards from a
+  different offset, so ids are unique across all shards.
+
+Start the shard nodes (each loads sql/init.sql like the main database):
+  docker compose --profile sharding up -d
+
+How to run:
+  Windows:  python sharding.py --setup
+  macOS:    python3 sharding.py --setup
+
+  Compare cross-shard reports with the unsharded main database:
+  python3 sharding.py --check
+
+  Show where customers live and the replication state:
+  python3 sharding.py --status
+"""
+
+import argparse
+import json
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from inventory import reserve, restock
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+SHARD_MAP_FILE = Path(__file__).resolve().parent.parent / "config" / "shards.json"
+
+NUM_BUCKETS = 64
+CATALOG_TABLES = ("authors", "categories", "books")
+SHARDED_TABLES = ("customers", "orders", "order_items", "reviews")
+
+
+@dataclass(frozen=True)
+class Shard:
+    name: str
+    port: int
+    host: str = "localhost"
+    internal_host: Optional[str] = None  # how other shards reach it (docker network)
+
+    def config(self) -> Dict:
+        return {**DB_CONFIG, "host": self.host, "port": self.port}
+
+
+# The nodes from `docker compose --profile sharding up -d`
+DEFAULT_SHARDS = (
+    Shard("shard0", 5433, internal_host="shard0"),
+    Shard("shard1", 5434, internal_host="shard1"),
+    Shard("shard2", 5435, internal_host="shard2"),
+)
+
+
+# ==============================================
+# Shard map
+# ==============================================
+
+class ShardMap:
+    """customer_id -> bucket -> shard index."""
+
+    def __init__(self, shards: Sequence[Shard] = DEFAULT_SHARDS,
+                 buckets: Optional[List[int]] = None):
+        self.shards = list(shards)
+        self.buckets = buckets or [b % len(self.shards) for b in range(NUM_BUCKETS)]
+        if len(self.buckets) != NUM_BUCKETS or max(self.buckets) >= len(self.shards):
+            raise ValueError("Shard map does not match the shard list")
+
+    @staticmethod
+    def bucket_of(customer_id: int) -> int:
+        """Stable hash, the same in every process (unlike hash())."""
+        return zlib.crc32(int(customer_id).to_bytes(8, "big", signed=True)) % NUM_BUCKETS
+
+    def shard_of(self, customer_id: int) -> int:
+        return self.buckets[self.bucket_of(customer_id)]
+
+    @classmethod
+    def load(cls, path: Path = SHARD_MAP_FILE) -> "ShardMap":
+        """The shard map from config/shards.json, or the default one."""
+        if not path.exists():
+            return cls()
+        data = json.loads(path.read_text())
+        shards = [Shard(**shard) for shard in data["shards"]]
+        return cls(shards, data["buckets"])
+
+    def save(self, path: Path = SHARD_MAP_FILE):
+        path.write_text(json.dumps({
+            "shards": [shard.__dict__ for shard in self.shards],
+            "buckets": self.buckets,
+        }, indent=2) + "\n")
+
+
+# ==============================================
+# Router
+# ==============================================
+
+class Router:
+    """Connections to every shard, routed by customer_id."""
+
+    CATALOG = 0  # index of the catalog primary
+
+    def __init__(self, shard_map: Optional[ShardMap] = None, max_connections: int = 8):
+        self.map = shard_map or ShardMap.load()
+        self.pools = [ThreadedConnectionPool(1, max_connections, **shard.config())
+                      for shard in self.map.shards]
+        self.executor = ThreadPoolExecutor(max_workers=len(self.pools))
+
+    def close(self):
+        self.executor.shutdown()
+        for pool in self.pools:
+            pool.closeall()
+
+    @contextmanager
+    def connection(self, shard: int):
+        """A connection to one shard; commits on success, rolls back on error."""
+        pool = self.pools[shard]
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+
+    def for_customer(self, customer_id: int):
+        return self.connection(self.map.shard_of(customer_id))
+
+    def catalog(self):
+        return self.connection(self.CATALOG)
+
+    def fan_out(self, sql: str, params: Optional[tuple] = None) -> List[List[tuple]]:
+        """Run a read on every shard in parallel; one row list per shard."""
+        def run(shard: int):
+            with self.connection(shard) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    return cur.fetchall()
+        return list(self.executor.map(run, range(len(self.pools))))
+
+    def next_id(self, sequence: str, shard: int = CATALOG) -> int:
+        """A globally unique id from one shard's interleaved sequence."""
+        with self.connection(shard) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT nextval(%s);", (sequence,))
+                return cur.fetchone()[0]
+
+
+def _round2(value) -> Decimal:
+    """Round like PostgreSQL's ROUND(x, 2) (half away from zero)."""
+    return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+# ==============================================
+# Single-customer operations (one shard)
+# ==============================================
+
+def create_customer(router: Router, first_name: str, last_name: str, email: str,
+                    phone: Optional[str] = None, address: Optional[str] = None) -> int:
+    """Create a customer on its shard and register the email on shard0.
+
+    The directory row is written first: its primary key keeps emails
+    unique across all shards.
+    """
+    customer_id = router.next_id("customers_id_seq")
+    with router.catalog() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO customer_directory (email, customer_id) VALUES (%s, %s);",
+                        (email, customer_id))
+    try:
+        with router.for_customer(customer_id) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO customers (id, first_name, last_name, email, phone, address)
+                    VALUES (%s, %s, %s, %s, %s, %s);
+                """, (customer_id, first_name, last_name, email, phone, address))
+    except psycopg2.Error:
+        with router.catalog() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM customer_directory WHERE email = %s;", (email,))
+        raise
+    return customer_id
+
+
+def customer_id_for(router: Router, email: str) -> Optional[int]:
+    with router.catalog() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT customer_id FROM customer_directory WHERE email = %s;", (email,))
+            row = cur.fetchone()
+    return row[0] if row else None
+
+
+def customer_orders(router: Router, customer_id: int) -> List[tuple]:
+    """(order id, date, status, total, items) for one customer, newest first."""
+    with router.for_customer(customer_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT o.id, o.order_date, o.status, o.total_amount, COUNT(oi.id)
+                FROM orders o
+                LEFT JOIN order_items oi ON oi.order_id = o.id
+                WHERE o.customer_id = %s
+                GROUP BY o.id
+                ORDER BY o.order_date DESC;
+            """, (customer_id,))
+            return cur.fetchall()
+
+
+def add_review(router: Router, customer_id: int, book_id: int, rating: int,
+               comment: Optional[str] = None):
+    """Post or update a review; books are replicated, so the FK checks locally."""
+    with router.for_customer(customer_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO reviews (book_id, customer_id, rating, comment)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (book_id, customer_id)
+                DO UPDATE SET rating = EXCLUDED.rating, comment = EXCLUDED.comment;
+            """, (book_id, customer_id, rating, comment))
+
+
+def create_order(router: Router, customer_id: int,
+                 items: List[Tuple[int, int]]) -> Optional[int]:
+    """Place an order for [(book_id, quantity), ...].
+
+    Stock is reserved on the catalog primary first (in book id order, so
+    orders cannot deadlock). If writing the order on the customer's shard
+    then fails, the copies are put back. Returns None when out of stock.
+    """
+    reserved = []
+    with router.catalog() as conn:
+        with conn.cursor() as cur:
+            for book_id, quantity in sorted(items):
+                cur.execute("SELECT price FROM books WHERE id = %s;", (book_id,))
+                row = cur.fetchone()
+                if row is None or not reserve(cur, book_id, quantity):
+                    conn.rollback()
+                    return None
+                reserved.append((book_id, quantity, row[0]))
+
+    try:
+        with router.for_customer(customer_id) as conn:
+            with conn.cursor() as cur:
+                total = sum(price * quantity for _, quantity, price in reserved)
+                cur.execute("""
+                    INSERT INTO orders (customer_id, status, total_amount)
+                    VALUES (%s, 'pending', %s)
+                    RETURNING id;
+                """, (customer_id, total))
+                order_id = cur.fetchone()[0]
+                for book_id, quantity, price in reserved:
+                    cur.execute("""
+                        INSERT INTO order_items (order_id, book_id, quantity, price_at_purchase)
+                        VALUES (%s, %s, %s, %s);
+                    """, (order_id, book_id, quantity, price))
+        return order_id
+    except psycopg2.Error:
+        with router.catalog() as conn:
+            with conn.cursor() as cur:
+                for book_id, quantity, _ in reserved:
+                    restock(cur, book_id, quantity)
+        raise
+
+
+# ==============================================
+# Cross-shard reads (fan-out + merge)
+# ==============================================
+
+def top_rated_books(router: Router, limit: int = 5, min_reviews: int = 1) -> List[tuple]:
+    """(title, author, average rating, reviews) across all shards.
+
+    Each shard returns the sum and count per book; averages are only
+    computed after merging, since an average of averages would be wrong.
+    """
+    totals: Dict[int, List[int]] = {}
+    for rows in router.fan_out("""
+        SELECT book_id, SUM(rating), COUNT(*)
+        FROM reviews
+        WHERE book_id IS NOT NULL
+        GROUP BY book_id;
+    """):
+        for book_id, rating_sum, count in rows:
+            total = totals.setdefault(book_id, [0, 0])
+            total[0] += rating_sum
+            total[1] += count
+
+    ranked = sorted(((Decimal(s) / c, c, book_id) for book_id, (s, c) in totals.items()
+                     if c >= min_reviews), reverse=True)[:limit]
+    if not ranked:
+        return []
+
+    with router.catalog() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT b.id, b.title, a.name
+                FROM books b LEFT JOIN authors a ON a.id = b.author_id
+                WHERE b.id = ANY(%s);
+            """, ([book_id for _, _, book_id in ranked],))
+            names = {book_id: (title, author) for book_id, title, author in cur.fetchall()}
+    return [(*names.get(book_id, ("Unknown", None)), _round2(average), count)
+            for average, count, book_id in ranked]
+
+
+def monthly_sales(router: Router) -> List[tuple]:
+    """Challenge 4 across shards: (month, orders, revenue, avg order value)."""
+    merged: Dict[str, List] = {}
+    for rows in router.fan_out("""
+        SELECT TO_CHAR(order_date, 'YYYY-MM'), COUNT(*), SUM(total_amount)
+        FROM orders
+        WHERE status <> 'cancelled'
+        GROUP BY 1;
+    """):
+        for month, count, revenue in rows:
+            total = merged.setdefault(month, [0, Decimal(0)])
+            total[0] += count
+            total[1] += revenue
+    return [(month, count, revenue, _round2(revenue / count))
+            for month, (count, revenue) in sorted(merged.items())]
+
+
+# The same reports on a single unsharded database, for --check
+SINGLE_NODE_REPORTS = {
+    "top_rated_books": """
+        SELECT b.title, a.name, ROUND(AVG(r.rating)::numeric, 2), COUNT(*)
+        FROM reviews r
+        JOIN books b ON b.id = r.book_id
+        LEFT JOIN authors a ON a.id = b.author_id
+        GROUP BY b.id, b.title, a.name
+        ORDER BY AVG(r.rating) DESC, COUNT(*) DESC, b.id DESC
+        LIMIT 5;
+    """,
+    "monthly_sales": """
+        SELECT TO_CHAR(order_date, 'YYYY-MM'), COUNT(*), SUM(total_amount),
+               ROUND(AVG(total_amount)::numeric, 2)
+        FROM orders
+        WHERE status <> 'cancelled'
+        GROUP BY 1
+        ORDER BY 1;
+    """,
+}
+
+SHARDED_REPORTS: Dict[str, Callable[[Router], List[tuple]]] = {
+    "top_rated_books": top_rated_books,
+    "monthly_sales": monthly_sales,
+}
+
+
+# ==============================================
+# Setup
+# ==============================================
+
+@contextmanager
+def _autocommit(shard: Shard):
+    # Not `with conn`: since psycopg2 2.9 that opens a transaction even in
+    # autocommit mode, and CREATE SUBSCRIPTION cannot run inside one
+    conn = psycopg2.connect(**shard.config())
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _subscription_name(shard: Shard) -> str:
+    """One subscription (and replication slot on shard0) per shard."""
+    return "catalog_" + re.sub(r"[^a-z0-9_]", "_", shard.name.lower())
+
+
+def setup(shard_map: ShardMap):
+    """Turn freshly initialized nodes (all with the same sample data) into shards.
+
+    1. shard0 publishes the catalog tables; the others subscribe
+    2. every shard deletes the customers it does not own (orders, items
+       and reviews follow by ON DELETE CASCADE)
+    3. sequences are interleaved so new ids never collide
+    4. shard0 gets the email -> customer_id directory
+    Safe to run again.
+    """
+    shards = shard_map.shards
+    count = len(shards)
+    primary = shards[Router.CATALOG]
+
+    print(f"📚 Replicating {', '.join(CATALOG_TABLES)} from {primary.name}...")
+    with _autocommit(primary) as conn, conn.cursor() as cur:
+        cur.execute("SHOW wal_level;")
+        if cur.fetchone()[0] != "logical":
+            raise RuntimeError(f"{primary.name} needs wal_level=logical (see docker-compose.yml)")
+        cur.execute("SELECT 1 FROM pg_publication WHERE pubname = 'catalog';")
+        if not cur.fetchone():
+            cur.execute(f"CREATE PUBLICATION catalog FOR TABLE {', '.join(CATALOG_TABLES)};")
+
+    for index, shard in enumerate(shards):
+        if index == Router.CATALOG:
+            continue
+        subscription = _subscription_name(shard)
+        with _autocommit(shard) as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_subscription WHERE subname = %s;", (subscription,))
+            if not cur.fetchone():
+                source = (f"host={primary.internal_host or primary.host} "
+                          f"port={5432 if primary.internal_host else primary.port} "
+                          f"dbname={DB_CONFIG['database']} user={DB_CONFIG['user']} "
+                          f"password={DB_CONFIG['password']}")
+                # Every node loaded the same catalog from init.sql, so only
+                # changes from now on need to be sent
+                cur.execute(f"CREATE SUBSCRIPTION {subscription} CONNECTION '{source}' "
+                            f"PUBLICATION catalog WITH (copy_data = false);")
+
+    print("✂️  Keeping each customer on its own shard...")
+    max_ids = {table: 0 for table in SHARDED_TABLES}
+    for index, shard in enumerate(shards):
+        with psycopg2.connect(**shard.config()) as conn, conn.cursor() as cur:
+            cur.execute("SELECT id FROM customers;")
+            foreign = [cid for (cid,) in cur.fetchall() if shard_map.shard_of(cid) != index]
+            cur.execute("DELETE FROM customers WHERE id = ANY(%s);", (foreign,))
+            if index != Router.CATALOG:
+                # Rows without a customer stay on the catalog primary only
+                cur.execute("DELETE FROM orders WHERE customer_id IS NULL;")
+                cur.execute("DELETE FROM reviews WHERE customer_id IS NULL;")
+            for table in SHARDED_TABLES:
+                cur.execute(f"SELECT COALESCE(MAX(id), 0), "
+                            f"(SELECT last_value FROM {table}_id_seq) FROM {table};")
+                max_ids[table] = max(max_ids[table], *cur.fetchone())
+            print(f"   {shard.name}: {len(foreign)} customers moved away")
+        conn.close()
+
+    print(f"🔢 Interleaving sequences (step {count})...")
+    for index, shard in enumerate(shards):
+        with psycopg2.connect(**shard.config()) as conn, conn.cursor() as cur:
+            for table in SHARDED_TABLES:
+                base = (max_ids[table] // count + 1) * count
+                cur.execute(f"ALTER SEQUENCE {table}_id_seq "
+                            f"INCREMENT BY {count} RESTART WITH {base + index + 1};")
+        conn.close()
+
+    print("📇 Building the customer directory on shard0...")
+    with psycopg2.connect(**primary.config()) as conn, conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS customer_directory (
+                email VARCHAR(150) PRIMARY KEY,
+                customer_id INTEGER NOT NULL UNIQUE
+            );
+        """)
+    conn.close()
+    for shard in shards:
+        with psycopg2.connect(**shard.config()) as conn, conn.cursor() as cur:
+            cur.execute("SELECT email, id FROM customers;")
+            rows = cur.fetchall()
+        conn.close()
+        with psycopg2.connect(**primary.config()) as conn, conn.cursor() as cur:
+            cur.executemany("""
+                INSERT INTO customer_directory (email, customer_id) VALUES (%s, %s)
+                ON CONFLICT (email) DO NOTHING;
+            """, rows)
+        conn.close()
+
+    shard_map.save()
+    print(f"✅ Shard map saved to {SHARD_MAP_FILE.relative_to(SHARD_MAP_FILE.parent.parent)}")
+
+
+def status(router: Router):
+    counts = router.fan_out("""
+        SELECT (SELECT COUNT(*) FROM customers), (SELECT COUNT(*) FROM orders),
+               (SELECT COUNT(*) FROM reviews), (SELECT COUNT(*) FROM books);
+    """)
+    print(f"   {'shard':<8} {'customers':>10} {'orders':>8} {'reviews':>8} {'books':>6}")
+    for shard, rows in zip(router.map.shards, counts):
+        customers, orders, reviews, books = rows[0]
+        print(f"   {shard.name:<8} {customers:>10} {orders:>8} {reviews:>8} {books:>6}")
+
+    lag = router.fan_out("""
+        SELECT subname, COALESCE(EXTRACT(EPOCH FROM now() - last_msg_receipt_time), 0)
+        FROM pg_stat_subscription;
+    """)
+    for shard, rows in zip(router.map.shards, lag):
+        for name, seconds in rows:
+            print(f"   {shard.name}: subscription '{name}', last message {seconds:.1f}s ago")
+
+
+def check(router: Router) -> bool:
+    """Compare cross-shard reports with the same reports on the main database."""
+    passed = True
+    with psycopg2.connect(**DB_CONFIG) as conn, conn.cursor() as cur:
+        for name, sql in SINGLE_NODE_REPORTS.items():
+            cur.execute(sql)
+            expected = [tuple(row) for row in cur.fetchall()]
+            actual = [tuple(row) for row in SHARDED_REPORTS[name](router)]
+            same = expected == actual
+            passed = passed and same
+            print(f"   {name}: {'✅ same as single node' if same else '❌ differs'}")
+            if not same:
+                print(f"      single node: {expected}")
+                print(f"      sharded:     {actual}")
+    conn.close()
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hash-sharded customers and orders")
+    parser.add_argument("--setup", action="store_true", help="turn the nodes into shards")
+    parser.add_argument("--status", action="store_true", help="rows per shard, replication")
+    parser.add_argument("--check", action="store_true",
+                        help="compare cross-shard reports with the main database "
+                             "(both must still hold the init.sql sample data)")
+    args = parser.parse_args()
+
+    try:
+        print("=" * 60)
+        print("🧩 Sharded bookstore")
+        print("=" * 60)
+        if args.setup:
+            setup(ShardMap())
+
+        router = Router()
+        try:
+            if args.status or not (args.setup or args.check):
+                status(router)
+            if args.check:
+                check(router)
+
+            print("\n⭐ Top-rated books (all shards):")
+            for title, author, average, reviews in top_rated_books(router):
+                print(f"   {title} by {author}: {average} ({reviews} reviews)")
+            print("\n📅 Monthly sales (all shards):")
+            for month, orders, revenue, avg in monthly_sales(router)[-6:]:
+                print(f"   {month}: {orders} orders, ${revenue} (avg ${avg})")
+        finally:
+            router.close()
+    except (psycopg2.Error, RuntimeError) as e:
+        print(f"❌ {e}")
@@ -0,0 +1,223 @@
+"""
+SQLAlchemy Startup and Per-Call Overhead Benchmark
+==================================================
+Measure what lesson 3's lazy engine and cached queries buy us.
+
+1. Import-to-first-query: a fresh Python process imports
+   03_sqlalchemy_intro and runs its first query.
+   - before: the lesson as it was before the lazy engine, taken from
+             git history (engine and session factory created at import,
+             session.query() for the first query)
+   - after:  the current lesson
+2. Per-call overhead: the same "books under $15" and "author by email"
+   queries run many times as
+   - legacy:   session.query(...).filter(...) (rebuilt every call)
+   - select:   select(...).where(...)         (rebuilt every call)
+   - prebuilt: one select() with bindparam()  (built once)
+   - lambda:   the lambda_stmt() functions from the lesson
+   Time spent inside cursor.execute() is subtracted, so what is left is
+   the Python overhead of building, compiling and hydrating.
+3. SQL compilation cache hits and misses for each variant.
+
+How to run:
+  Windows:  python sqlalchemy_bench.py --calls 2000
+  macOS:    python3 sqlalchemy_bench.py --calls 2000
+"""
+
+import argparse
+import importlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import bindparam, event, select
+
+lesson = importlib.import_module("03_sqlalchemy_intro")
+Author, Book = lesson.Author, lesson.Book
+
+HERE = Path(__file__).resolve().parent
+LESSON = "03_sqlalchemy_intro.py"
+
+STARTUP_SNIPPET = """
+import importlib, time
+t0 = time.perf_counter()
+lesson = importlib.import_module("03_sqlalchemy_intro")
+t1 = time.perf_counter()
+session = lesson.SessionLocal()
+if hasattr(lesson, "books_cheaper_than"):
+    lesson.books_cheaper_than(session, 15)
+else:
+    session.query(lesson.Book).filter(lesson.Book.price < 15).order_by(lesson.Book.price).all()
+t2 = time.perf_counter()
+session.close()
+print(t1 - t0, t2 - t0)
+"""
+
+
+# ==============================================
+# Import-to-first-query
+# ==============================================
+
+def original_lesson(directory: Path) -> Optional[Path]:
+    """Write the lesson from before the lazy engine into `directory`.
+
+    That is the parent of the commit that added get_engine(). Returns
+    None when git or the history is not available.
+    """
+    try:
+        commits = subprocess.run(
+            ["git", "log", "--format=%H", "-S", "def get_engine", "--", LESSON],
+            cwd=HERE, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        if not commits:
+            return None
+        source = subprocess.run(
+            ["git", "show", f"{commits[-1]}^:./{LESSON}"],
+            cwd=HERE, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    (directory / LESSON).write_text(source)
+    return directory
+
+
+def measure_startup(directory: Path, runs: int):
+    """Median (import time, import-to-first-query time) over fresh processes
+    importing the lesson found in `directory`."""
+    imports, first_queries = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SNIPPET],
+            cwd=directory, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        imports.append(float(output[0]))
+        first_queries.append(float(output[1]))
+    return statistics.median(imports), statistics.median(first_queries)
+
+
+# ==============================================
+# Per-call overhead
+# ==============================================
+
+_prebuilt_cheap_books = None
+_prebuilt_author = None
+
+
+def prebuilt_statements():
+    """Build the bindparam() statements once (after the mappers exist)."""
+    global _prebuilt_cheap_books, _prebuilt_author
+    if _prebuilt_cheap_books is None:
+        _prebuilt_cheap_books = (select(Book)
+                                 .where(Book.price < bindparam("max_price"))
+                                 .order_by(Book.price))
+        _prebuilt_author = select(Author).where(Author.email == bindparam("email")).limit(1)
+    return _prebuilt_cheap_books, _prebuilt_author
+
+
+VARIANTS = {
+    "legacy": (
+        lambda s: s.query(Book).filter(Book.price < 15).order_by(Book.price).all(),
+        lambda s: s.query(Author).filter(Author.email == "orwell@example.com").first(),
+    ),
+    "select": (
+        lambda s: s.scalars(select(Book).where(Book.price < 15).order_by(Book.price)).all(),
+        lambda s: s.scalars(select(Author).where(Author.email == "orwell@example.com")
+                            .limit(1)).first(),
+    ),
+    "prebuilt": (
+        lambda s: s.scalars(prebuilt_statements()[0], {"max_price": 15}).all(),
+        lambda s: s.scalars(prebuilt_statements()[1], {"email": "orwell@example.com"}).first(),
+    ),
+    "lambda": (
+        lambda s: lesson.books_cheaper_than(s, 15),
+        lambda s: lesson.author_by_email(s, "orwell@example.com"),
+    ),
+}
+
+
+class CursorTimer:
+    """Adds up the time spent inside cursor.execute()."""
+
+    def __init__(self, engine):
+        self.total = 0.0
+        event.listen(engine, "before_cursor_execute", self.before)
+        event.listen(engine, "after_cursor_execute", self.after)
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["bench_started"] = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += time.perf_counter() - conn.info["bench_started"]
+
+
+def measure_per_call(calls: int):
+    """Per-call total time, Python overhead and cache stats for each variant."""
+    timer = CursorTimer(lesson.get_engine())
+    results = {}
+
+    for name, queries in VARIANTS.items():
+        session = lesson.SessionLocal()
+        try:
+            for query in queries:
+                query(session)  # warm up: first call compiles and fills caches
+
+            lesson.CACHE_STATS.clear()
+            timer.total = 0.0
+            started = time.perf_counter()
+            for _ in range(calls):
+                for query in queries:
+                    query(session)
+            elapsed = time.perf_counter() - started
+        finally:
+            session.close()
+
+        executed = calls * len(queries)
+        results[name] = {
+            "total_us": elapsed / executed * 1e6,
+            "python_us": (elapsed - timer.total) / executed * 1e6,
+            "hits": lesson.CACHE_STATS["cache_hit"],
+            "misses": lesson.CACHE_STATS["cache_miss"],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLAlchemy startup and per-call overhead")
+    parser.add_argument("--calls", type=int, default=2000, help="iterations per variant")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh processes per mode")
+    args = parser.parse_args()
+
+    print("=" * 64)
+    print("⏱️  Import-to-first-query (median of fresh processes)")
+    print("=" * 64)
+    print(f"   {'mode':<8} {'import ms':>10} {'first query ms':>15}")
+    with tempfile.TemporaryDirectory() as before_dir:
+        before = original_lesson(Path(before_dir))
+        if before is None:
+            print("   before   (skipped: the original lesson is not in git history)")
+        for label, directory in (("before", before), ("after", HERE)):
+            if directory is None:
+                continue
+            import_time, first_query = measure_startup(directory, args.startup_runs)
+            print(f"   {label:<8} {import_time * 1000:>10.1f} {first_query * 1000:>15.1f}")
+
+    print("\n" + "=" * 64)
+    print(f"🔁 Per-call overhead ({args.calls} iterations × 2 queries)")
+    print("=" * 64)
+    print(f"   {'variant':<9} {'total µs':>9} {'python µs':>10} {'cache hits':>11} {'misses':>7}")
+    results = measure_per_call(args.calls)
+    for name, r in results.items():
+        print(f"   {name:<9} {r['total_us']:>9.1f} {r['python_us']:>10.1f}"
+              f" {r['hits']:>11} {r['misses']:>7}")
+
+    saved = results["legacy"]["python_us"] - results["lambda"]["python_us"]
+    print(f"\n💡 lambda_stmt saves {saved:.1f} µs of Python per call over session.query()")
+    lesson.cache_report()
+
+
+if __name__ == "__main__":
+    main()
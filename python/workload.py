@@ -0,0 +1,622 @@
+"""
+Storefront Workload Simulator
+=============================
+Drive realistic, concurrent bookstore traffic against PostgreSQL and
+find out how much load a given setup can take.
+
+The workload mixes four storefront operations:
+- browse:  the catalog queries from read_books() plus a book_details lookup
+- search:  books by author name (exercise 3)
+- review:  post a review for a book (exercise 5)
+- order:   place an order as one transaction (exercise 8)
+
+Load can be generated two ways:
+- open-loop:   requests arrive at a fixed average rate (Poisson arrivals)
+               no matter how fast the database answers. Latency includes
+               the time a request waited for a free worker.
+- closed-loop: every worker sends its next request after a think time.
+
+The report shows throughput, error and serialization-failure rates over
+time, plus latency percentiles per operation.
+
+How to run:
+  Windows:  python workload.py --rate 200 --duration 30
+  macOS:    python3 workload.py --rate 200 --duration 30
+
+  Step the arrival rate to find the saturation point:
+  python3 workload.py --sweep 50,100,200,400,800 --duration 20
+
+  Closed-loop with 16 worker processes and exponential think time:
+  python3 workload.py --workers 16 --mode process --think exponential:0.05
+"""
+
+import argparse
+import math
+import multiprocessing
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "learning_db",
+    "user": "learner",
+    "password": "learnpass123"
+}
+
+# Relative weights of each operation in the mix
+DEFAULT_MIX = {"browse": 60, "search": 20, "review": 10, "order": 10}
+
+# serialization_failure and deadlock_detected: the transaction can be retried
+SERIALIZATION_CODES = {"40001", "40P01"}
+
+# Outcome labels recorded for every request
+OK = "ok"
+REJECTED = "rejected"            # business rule said no (e.g. out of stock)
+SERIALIZATION = "serialization"
+ERROR = "error"
+
+
+class OutOfStock(Exception):
+    """Raised when an order asks for more copies than are in stock."""
+
+
+# ==============================================
+# Catalog sampling
+# ==============================================
+
+@dataclass
+class Catalog:
+    """Id ranges and names the operations pick their parameters from.
+
+    Only ranges are loaded (not every id) so a worker starts quickly
+    even when the tables hold millions of rows.
+    """
+    book_ids: Tuple[int, int]
+    customer_ids: Tuple[int, int]
+    category_names: List[str]
+    author_names: List[str]
+
+    def book_id(self, rng: random.Random) -> int:
+        return rng.randint(*self.book_ids)
+
+    def customer_id(self, rng: random.Random) -> int:
+        return rng.randint(*self.customer_ids)
+
+
+def load_catalog(conn) -> Catalog:
+    """Read the id ranges and a sample of names used to build requests."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MIN(id), 1), COALESCE(MAX(id), 1) FROM books;")
+        book_ids = cur.fetchone()
+        cur.execute("SELECT COALESCE(MIN(id), 1), COALESCE(MAX(id), 1) FROM customers;")
+        customer_ids = cur.fetchone()
+        cur.execute("SELECT name FROM categories ORDER BY id;")
+        category_names = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT name FROM authors ORDER BY id LIMIT 1000;")
+        author_names = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    return Catalog(book_ids, customer_ids, category_names, author_names)
+
+
+# ==============================================
+# Operations
+# ==============================================
+# Each operation runs inside the worker's open transaction and must not
+# commit; the worker commits or rolls back and records the outcome.
+
+def op_browse(cur, catalog: Catalog, rng: random.Random):
+    """A catalog page: the read_books() queries plus one book_details row."""
+    page_size = 20
+
+    cur.execute("SELECT id, title, price FROM books ORDER BY title LIMIT %s;",
+                (page_size,))
+    cur.fetchall()
+
+    cur.execute("""
+        SELECT title, price
+        FROM books
+        WHERE price < %s
+        ORDER BY price
+        LIMIT %s;
+    """, (rng.choice((10.00, 15.00, 20.00)), page_size))
+    cur.fetchall()
+
+    cur.execute("""
+        SELECT b.title, a.name as author
+        FROM books b
+        JOIN authors a ON b.author_id = a.id
+        JOIN categories c ON b.category_id = c.id
+        WHERE c.name = %s
+        LIMIT %s;
+    """, (rng.choice(catalog.category_names), page_size))
+    cur.fetchall()
+
+    cur.execute("""
+        SELECT c.name,
+               COUNT(b.id) as book_count,
+               ROUND(AVG(b.price)::numeric, 2) as avg_price
+        FROM categories c
+        LEFT JOIN books b ON c.id = b.category_id
+        GROUP BY c.name
+        ORDER BY book_count DESC;
+    """)
+    cur.fetchall()
+
+    cur.execute("SELECT * FROM book_details WHERE id = %s;", (catalog.book_id(rng),))
+    cur.fetchone()
+
+
+def op_search(cur, catalog: Catalog, rng: random.Random):
+    """Search books by part of an author's name (exercise 3)."""
+    name = rng.choice(catalog.author_names)
+    fragment = rng.choice(name.split())
+    cur.execute("""
+        SELECT b.title
+        FROM books b
+        JOIN authors a ON b.author_id = a.id
+        WHERE LOWER(a.name) LIKE LOWER(%s)
+        ORDER BY b.title
+    """, (f"%{fragment}%",))
+    cur.fetchall()
+
+
+def op_review(cur, catalog: Catalog, rng: random.Random):
+    """Post a review; an existing review for the pair is left alone (exercise 5)."""
+    cur.execute("""
+        INSERT INTO reviews (book_id, customer_id, rating, comment)
+        SELECT b.id, c.id, %s, %s
+        FROM books b, customers c
+        WHERE b.id = %s AND c.id = %s
+        ON CONFLICT (book_id, customer_id) DO NOTHING
+        RETURNING id;
+    """, (rng.randint(1, 5), "Posted by the workload simulator",
+          catalog.book_id(rng), catalog.customer_id(rng)))
+    cur.fetchone()
+
+
+def op_order(cur, catalog: Catalog, rng: random.Random):
+    """Place an order with 1-3 items in one transaction (exercise 8).
+
+    Stock is taken with reserve_book_stock() (sql/inventory.sql), which
+    never takes more copies than exist, striped or not. Books are
+    reserved in id order so two orders for the same titles cannot
+    deadlock each other.
+    """
+    items = {}
+    for _ in range(rng.randint(1, 3)):
+        items[catalog.book_id(rng)] = rng.randint(1, 2)
+
+    cur.execute("""
+        INSERT INTO orders (customer_id, status, total_amount)
+        VALUES (%s, 'pending', 0)
+        RETURNING id;
+    """, (catalog.customer_id(rng),))
+    order_id = cur.fetchone()[0]
+
+    total = 0
+    for book_id, quantity in sorted(items.items()):
+        cur.execute("SELECT reserve_book_stock(%s, %s);", (book_id, quantity))
+        if not cur.fetchone()[0]:
+            raise OutOfStock(book_id)
+        cur.execute("SELECT price FROM books WHERE id = %s;", (book_id,))
+        price = cur.fetchone()[0]
+
+        cur.execute("""
+            INSERT INTO order_items (order_id, book_id, quantity, price_at_purchase)
+            VALUES (%s, %s, %s, %s);
+        """, (order_id, book_id, quantity, price))
+        total += price * quantity
+
+    cur.execute("UPDATE orders SET total_amount = %s WHERE id = %s;", (total, order_id))
+
+
+OPERATIONS: Dict[str, Callable] = {
+    "browse": op_browse,
+    "search": op_search,
+    "review": op_review,
+    "order": op_order,
+}
+
+
+# ==============================================
+# Configuration
+# ==============================================
+
+@dataclass
+class WorkloadConfig:
+    """Everything that shapes one run of the simulator."""
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    rate: Optional[float] = None         # arrivals/second; None = closed-loop
+    duration: float = 30.0               # seconds
+    workers: int = 8
+    mode: str = "thread"                 # "thread" or "process"
+    think: str = "none"                  # "none", "fixed:S", "uniform:A:B", "exponential:MEAN"
+    isolation: str = "READ COMMITTED"
+    seed: Optional[int] = None
+    db_config: Dict = field(default_factory=lambda: dict(DB_CONFIG))
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse 'browse=60,search=20,review=10,order=10' into weights."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {name!r}")
+        mix[name] = float(weight)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("Mix needs at least one operation with a positive weight")
+    return mix
+
+
+def think_time(spec: str, rng: random.Random) -> float:
+    """Draw one think time (seconds) from a distribution spec."""
+    kind, *args = spec.split(":")
+    if kind == "none":
+        return 0.0
+    if kind == "fixed":
+        return float(args[0])
+    if kind == "uniform":
+        return rng.uniform(float(args[0]), float(args[1]))
+    if kind == "exponential":
+        return rng.expovariate(1.0 / float(args[0]))
+    raise ValueError(f"Unknown think-time distribution: {spec!r}")
+
+
+def pick_operation(mix: Dict[str, float], rng: random.Random) -> str:
+    names = list(mix)
+    return rng.choices(names, weights=[mix[name] for name in names])[0]
+
+
+# ==============================================
+# Workers
+# ==============================================
+# A sample is (operation, scheduled, started, finished, outcome) using
+# time.monotonic(), which is shared by all processes on one machine.
+
+def execute(conn, operation: Callable, catalog: Catalog, rng: random.Random) -> str:
+    """Run one operation as a transaction and classify the result."""
+    try:
+        with conn.cursor() as cur:
+            operation(cur, catalog, rng)
+        conn.commit()
+        return OK
+    except OutOfStock:
+        conn.rollback()
+        return REJECTED
+    except psycopg2.Error as e:
+        conn.rollback()
+        if e.pgcode in SERIALIZATION_CODES:
+            return SERIALIZATION
+        return ERROR
+
+
+def _worker_loop(worker_id: int, config: WorkloadConfig, operations: Dict[str, Callable],
+                 arrivals, results, end_at: float):
+    """Body of one thread or process worker."""
+    seed = None if config.seed is None else config.seed + worker_id
+    rng = random.Random(seed)
+    samples = []
+
+    conn = None
+    try:
+        conn = psycopg2.connect(application_name=f"workload-{worker_id}", **config.db_config)
+        conn.set_session(isolation_level=config.isolation)
+        catalog = load_catalog(conn)
+
+        while True:
+            if arrivals is not None:
+                # Open-loop: the dispatcher decides when requests happen
+                item = arrivals.get()
+                if item is None:
+                    break
+                scheduled, name = item
+            else:
+                # Closed-loop: think, then issue the next request
+                pause = think_time(config.think, rng)
+                if time.monotonic() + pause >= end_at:
+                    break
+                time.sleep(pause)
+                scheduled, name = time.monotonic(), pick_operation(config.mix, rng)
+
+            started = time.monotonic()
+            outcome = execute(conn, operations[name], catalog, rng)
+            samples.append((name, scheduled, started, time.monotonic(), outcome))
+
+            if len(samples) >= 500:
+                results.put(samples)
+                samples = []
+    finally:
+        # Always sign off, or run_workload() waits for this worker forever
+        if conn is not None:
+            conn.close()
+        results.put(samples)
+        results.put(None)
+
+
+def _dispatch(config: WorkloadConfig, arrivals, start: float, end_at: float):
+    """Feed Poisson arrivals to the workers until the run ends."""
+    rng = random.Random(config.seed)
+    next_at = start
+    while True:
+        next_at += rng.expovariate(config.rate)
+        if next_at >= end_at:
+            break
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        arrivals.put((next_at, pick_operation(config.mix, rng)))
+
+    for _ in range(config.workers):
+        arrivals.put(None)
+
+
+def run_workload(config: WorkloadConfig,
+                 operations: Dict[str, Callable] = OPERATIONS) -> "WorkloadReport":
+    """Run the workload once and return its report.
+
+    `operations` lets other modules swap in their own implementation of
+    an operation (for example a different order flow). In process mode
+    the functions must be defined at module level so they can be pickled.
+    """
+    if config.mode == "process":
+        ctx = multiprocessing.get_context()
+        arrivals = ctx.Queue() if config.rate else None
+        results = ctx.Queue()
+        start_worker = ctx.Process
+    elif config.mode == "thread":
+        arrivals = queue.Queue() if config.rate else None
+        results = queue.Queue()
+        start_worker = threading.Thread
+    else:
+        raise ValueError(f"Unknown worker mode: {config.mode!r}")
+
+    start = time.monotonic()
+    end_at = start + config.duration
+
+    workers = [
+        start_worker(target=_worker_loop, daemon=True,
+                     args=(i, config, operations, arrivals, results, end_at))
+        for i in range(config.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    dispatcher = None
+    if config.rate:
+        dispatcher = threading.Thread(target=_dispatch, daemon=True,
+                                      args=(config, arrivals, start, end_at))
+        dispatcher.start()
+
+    # Drain results before joining: a process cannot exit while its queue is full
+    samples = []
+    running = config.workers
+    while running:
+        batch = results.get()
+        if batch is None:
+            running -= 1
+        else:
+            samples.extend(batch)
+
+    if dispatcher is not None:
+        dispatcher.join()
+    for worker in workers:
+        worker.join()
+
+    return WorkloadReport(config, samples, start, time.monotonic() - start)
+
+
+# ==============================================
+# Reporting
+# ==============================================
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class WorkloadReport:
+    """Summaries computed from the samples of one run."""
+
+    def __init__(self, config: WorkloadConfig, samples: list, start: float, elapsed: float):
+        self.config = config
+        self.samples = samples
+        self.start = start
+        self.elapsed = elapsed
+
+    @property
+    def throughput(self) -> float:
+        """Completed requests per second (any outcome)."""
+        return len(self.samples) / self.elapsed if self.elapsed else 0.0
+
+    def latencies(self, op: Optional[str] = None) -> List[float]:
+        """Sorted response times (scheduled → finished) in seconds."""
+        return sorted(finished - scheduled
+                      for name, scheduled, _, finished, _ in self.samples
+                      if op is None or name == op)
+
+    def per_operation(self) -> Dict[str, Dict[str, float]]:
+        """Count, outcome rates and latency percentiles for each operation."""
+        grouped = defaultdict(list)
+        for sample in self.samples:
+            grouped[sample[0]].append(sample)
+
+        stats = {}
+        for name in sorted(grouped):
+            rows = grouped[name]
+            outcomes = defaultdict(int)
+            for row in rows:
+                outcomes[row[4]] += 1
+            latencies = self.latencies(name)
+            stats[name] = {
+                "count": len(rows),
+                "error_rate": outcomes[ERROR] / len(rows),
+                "serialization_rate": outcomes[SERIALIZATION] / len(rows),
+                "rejected_rate": outcomes[REJECTED] / len(rows),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1],
+            }
+        return stats
+
+    def timeline(self, interval: float = 1.0) -> List[Dict[str, float]]:
+        """Throughput, error rates and p99 per time bucket of `interval` seconds."""
+        buckets = defaultdict(list)
+        for sample in self.samples:
+            buckets[int((sample[3] - self.start) // interval)].append(sample)
+
+        rows = []
+        for index in range(int(self.elapsed // interval) + 1):
+            bucket = buckets.get(index, [])
+            count = len(bucket) or 1
+            latencies = sorted(s[3] - s[1] for s in bucket)
+            rows.append({
+                "t": index * interval,
+                "throughput": len(bucket) / interval,
+                "error_rate": sum(s[4] == ERROR for s in bucket) / count,
+                "serialization_rate": sum(s[4] == SERIALIZATION for s in bucket) / count,
+                "p99": percentile(latencies, 99),
+            })
+        return rows
+
+    def print_summary(self, interval: float = 1.0):
+        mode = f"open-loop {self.config.rate:g}/s" if self.config.rate else \
+            f"closed-loop, think={self.config.think}"
+        print("\n" + "=" * 72)
+        print(f"📊 Workload: {mode}, {self.config.workers} {self.config.mode} workers, "
+              f"{self.config.isolation}")
+        print("=" * 72)
+        print(f"   Requests: {len(self.samples)} in {self.elapsed:.1f}s "
+              f"→ {self.throughput:.1f} req/s")
+
+        print("\n⏱️  Latency per operation (ms):")
+        print(f"   {'op':<8} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+              f" {'err%':>6} {'ser%':>6} {'rej%':>6}")
+        for name, s in self.per_operation().items():
+            print(f"   {name:<8} {s['count']:>7} {s['p50'] * 1000:>8.1f} {s['p95'] * 1000:>8.1f}"
+                  f" {s['p99'] * 1000:>8.1f} {s['max'] * 1000:>8.1f}"
+                  f" {s['error_rate'] * 100:>6.2f} {s['serialization_rate'] * 100:>6.2f}"
+                  f" {s['rejected_rate'] * 100:>6.2f}")
+
+        print(f"\n📈 Timeline ({interval:g}s buckets):")
+        print(f"   {'t':>6} {'req/s':>8} {'p99 ms':>8} {'err%':>6} {'ser%':>6}")
+        for row in self.timeline(interval):
+            p99 = row["p99"] * 1000 if not math.isnan(row["p99"]) else 0.0
+            print(f"   {row['t']:>6.0f} {row['throughput']:>8.1f} {p99:>8.1f}"
+                  f" {row['error_rate'] * 100:>6.2f} {row['serialization_rate'] * 100:>6.2f}")
+
+
+def find_saturation(reports: List[WorkloadReport], min_efficiency: float = 0.95,
+                    p99_slo: Optional[float] = None) -> Optional[WorkloadReport]:
+    """Return the first stage that could not keep up with its offered rate.
+
+    A stage is saturated when it completes less than `min_efficiency` of
+    the offered load, or when its p99 latency exceeds `p99_slo` seconds.
+    """
+    for report in reports:
+        if report.throughput < report.config.rate * min_efficiency:
+            return report
+        if p99_slo is not None and percentile(report.latencies(), 99) > p99_slo:
+            return report
+    return None
+
+
+def run_sweep(config: WorkloadConfig, rates: List[float], p99_slo: Optional[float] = None,
+              operations: Dict[str, Callable] = OPERATIONS) -> List[WorkloadReport]:
+    """Run one open-loop stage per rate and print where the system saturates."""
+    reports = []
+    for rate in rates:
+        stage = WorkloadConfig(**{**config.__dict__, "rate": rate})
+        print(f"\n🚦 Stage: offering {rate:g} req/s for {stage.duration:g}s...")
+        reports.append(run_workload(stage, operations))
+
+    print("\n" + "=" * 72)
+    print("🔎 Sweep Summary")
+    print("=" * 72)
+    print(f"   {'offered':>8} {'achieved':>9} {'p99 ms':>8} {'err%':>6} {'ser%':>6}")
+    for report in reports:
+        total = len(report.samples) or 1
+        errors = sum(s[4] == ERROR for s in report.samples) / total
+        conflicts = sum(s[4] == SERIALIZATION for s in report.samples) / total
+        print(f"   {report.config.rate:>8g} {report.throughput:>9.1f}"
+              f" {percentile(report.latencies(), 99) * 1000:>8.1f}"
+              f" {errors * 100:>6.2f} {conflicts * 100:>6.2f}")
+
+    saturated = find_saturation(reports, p99_slo=p99_slo)
+    if saturated:
+        print(f"\n⚠️ Saturation reached at {saturated.config.rate:g} req/s "
+              f"(achieved {saturated.throughput:.1f} req/s)")
+    else:
+        print("\n✅ No saturation within the tested rates")
+    return reports
+
+
+def top_up_stock(db_config: Dict, quantity: int):
+    """Make sure every book has at least `quantity` copies before a run."""
+    with psycopg2.connect(**db_config) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE books SET stock_quantity = %s
+                WHERE stock_quantity < %s;
+            """, (quantity, quantity))
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bookstore workload simulator")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="operation weights, e.g. browse=60,search=20,review=10,order=10")
+    parser.add_argument("--rate", type=float,
+                        help="open-loop arrival rate (req/s); omit for closed-loop")
+    parser.add_argument("--sweep", help="comma-separated arrival rates to step through")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per run/stage")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--mode", choices=("thread", "process"), default="thread")
+    parser.add_argument("--think", default="none",
+                        help="closed-loop think time: none, fixed:S, uniform:A:B, exponential:MEAN")
+    parser.add_argument("--isolation", default="READ COMMITTED",
+                        choices=("READ COMMITTED", "REPEATABLE READ", "SERIALIZABLE"))
+    parser.add_argument("--interval", type=float, default=1.0, help="timeline bucket size (s)")
+    parser.add_argument("--p99-slo", type=float, help="p99 latency limit (ms) for the sweep")
+    parser.add_argument("--top-up", type=int, metavar="QTY",
+                        help="raise every book's stock to at least QTY before running")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = WorkloadConfig(mix=args.mix, rate=args.rate, duration=args.duration,
+                            workers=args.workers, mode=args.mode, think=args.think,
+                            isolation=args.isolation, seed=args.seed)
+
+    print("🛒 Bookstore Workload Simulator")
+    print("=" * 72)
+    print(f"   Mix: {', '.join(f'{k}={v:g}' for k, v in config.mix.items())}")
+
+    try:
+        if args.top_up:
+            top_up_stock(config.db_config, args.top_up)
+
+        if args.sweep:
+            rates = [float(r) for r in args.sweep.split(",")]
+            slo = args.p99_slo / 1000 if args.p99_slo else None
+            run_sweep(config, rates, p99_slo=slo)
+        else:
+            run_workload(config).print_summary(args.interval)
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+-- ============================================
+-- Inventory: Striped Stock for Hot Titles
+-- ============================================
+-- books.stock_quantity is a single row per title, so every order for a
+-- bestseller waits on the same row lock. A "striped" book keeps its
+-- stock in N sub-counter rows (slots) instead. An order takes copies
+-- from any slot nobody else has locked, so concurrent buyers of the
+-- same title rarely wait on each other.
+--
+-- Compatibility:
+-- - book_stock shows the live stock of every book (striped or not).
+--   Read stock from there: book_details, the SQLAlchemy Book model and
+--   the Prisma lessons do.
+-- - books.stock_quantity of a striped book is only refreshed by
+--   rebalance_book_stock(). Keeping it current on every order would
+--   bring back the hot row that striping removes.
+-- - writes to the column (e.g. the ORM adding 10 copies) are applied to
+--   the slots by a trigger, as a delta
+-- - order code takes stock with reserve_book_stock(). A guarded UPDATE
+--   (WHERE stock_quantity >= n) checks the stale column of a striped
+--   book: it fails with check_violation when the live stock is lower,
+--   and refuses orders the live stock could cover when it is higher.
+--
+-- Runs after init.sql when the container is first created.
+
+-- Stock slots (one row per book per slot)
+CREATE TABLE book_stock_slots (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    slot SMALLINT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0 CHECK (quantity >= 0),
+    PRIMARY KEY (book_id, slot)
+);
+
+-- View: live stock per book
+CREATE VIEW book_stock AS
+SELECT
+    b.id AS book_id,
+    COALESCE(
+        (SELECT SUM(s.quantity)::integer FROM book_stock_slots s WHERE s.book_id = b.id),
+        b.stock_quantity
+    ) AS stock_quantity
+FROM books b;
+
+-- View: Book details with author and category names (live stock)
+CREATE OR REPLACE VIEW book_details AS
+SELECT
+    b.id,
+    b.title,
+    b.isbn,
+    a.name AS author_name,
+    c.name AS category_name,
+    b.price,
+    st.stock_quantity,
+    b.published_date
+FROM books b
+JOIN book_stock st ON st.book_id = b.id
+LEFT JOIN authors a ON b.author_id = a.id
+LEFT JOIN categories c ON b.category_id = c.id;
+
+
+-- ============================================
+-- Reserving and Restocking
+-- ============================================
+
+-- Take p_quantity copies of a book. Returns FALSE (and changes nothing)
+-- when there is not enough stock, so a caller can never oversell.
+--
+-- Reserve each title once per transaction (sum the quantities). The
+-- slot a fast-path reservation took stays locked until commit, and a
+-- later slow path locks all slots in slot order: two transactions that
+-- each hold one slot and go down the slow path wait for each other.
+-- PostgreSQL breaks that deadlock by aborting one of them (40P01).
+CREATE FUNCTION reserve_book_stock(p_book_id INTEGER, p_quantity INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_slot SMALLINT;
+    v_total INTEGER;
+    v_take INTEGER;
+    v_remaining INTEGER := p_quantity;
+    v_row RECORD;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM book_stock_slots WHERE book_id = p_book_id) THEN
+        UPDATE books
+        SET stock_quantity = stock_quantity - p_quantity, updated_at = CURRENT_TIMESTAMP
+        WHERE id = p_book_id AND stock_quantity >= p_quantity;
+        RETURN FOUND;
+    END IF;
+
+    -- Fast path: one random slot that covers the whole order and is not
+    -- locked by another buyer. Never waits.
+    SELECT slot INTO v_slot
+    FROM book_stock_slots
+    WHERE book_id = p_book_id AND quantity >= p_quantity
+    ORDER BY random()
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+
+    IF FOUND THEN
+        UPDATE book_stock_slots
+        SET quantity = quantity - p_quantity
+        WHERE book_id = p_book_id AND slot = v_slot;
+        RETURN TRUE;
+    END IF;
+
+    -- Slow path: every slot is busy or too small. Lock all of them in
+    -- slot order, check the real total and take copies from several.
+    PERFORM 1 FROM book_stock_slots WHERE book_id = p_book_id ORDER BY slot FOR UPDATE;
+
+    IF NOT FOUND THEN
+        -- Unstriped meanwhile: the stock is back in books.stock_quantity
+        UPDATE books
+        SET stock_quantity = stock_quantity - p_quantity, updated_at = CURRENT_TIMESTAMP
+        WHERE id = p_book_id AND stock_quantity >= p_quantity;
+        RETURN FOUND;
+    END IF;
+
+    SELECT COALESCE(SUM(quantity), 0) INTO v_total FROM book_stock_slots WHERE book_id = p_book_id;
+    IF v_total < p_quantity THEN
+        RETURN FALSE;
+    END IF;
+
+    FOR v_row IN
+        SELECT slot, quantity FROM book_stock_slots
+        WHERE book_id = p_book_id AND quantity > 0
+        ORDER BY quantity DESC
+    LOOP
+        v_take := LEAST(v_remaining, v_row.quantity);
+        UPDATE book_stock_slots
+        SET quantity = quantity - v_take
+        WHERE book_id = p_book_id AND slot = v_row.slot;
+        v_remaining := v_remaining - v_take;
+        EXIT WHEN v_remaining = 0;
+    END LOOP;
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Add p_quantity copies of a book (to the emptiest unlocked slot). When
+-- every slot is locked it waits for the lowest one, the slot a slow-path
+-- reservation locks first, so it queues behind that reservation instead
+-- of locking slots out of order.
+CREATE FUNCTION restock_book_stock(p_book_id INTEGER, p_quantity INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_slot SMALLINT;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM book_stock_slots WHERE book_id = p_book_id) THEN
+        UPDATE books
+        SET stock_quantity = stock_quantity + p_quantity, updated_at = CURRENT_TIMESTAMP
+        WHERE id = p_book_id;
+        RETURN;
+    END IF;
+
+    SELECT slot INTO v_slot
+    FROM book_stock_slots
+    WHERE book_id = p_book_id
+    ORDER BY quantity
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+
+    IF NOT FOUND THEN
+        SELECT MIN(slot) INTO v_slot FROM book_stock_slots WHERE book_id = p_book_id;
+    END IF;
+
+    UPDATE book_stock_slots
+    SET quantity = quantity + p_quantity
+    WHERE book_id = p_book_id AND slot = v_slot;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ============================================
+-- Striping and Rebalancing
+-- ============================================
+
+-- Spread a book's live stock evenly over p_slots slots (0 = unstripe:
+-- move the stock back into books.stock_quantity). Also refreshes
+-- books.stock_quantity to the live total.
+CREATE FUNCTION stripe_book_stock(p_book_id INTEGER, p_slots INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_total INTEGER;
+BEGIN
+    -- NO KEY UPDATE does not block order_items inserts (their foreign
+    -- key only takes KEY SHARE on the book)
+    PERFORM 1 FROM books WHERE id = p_book_id FOR NO KEY UPDATE;
+    PERFORM 1 FROM book_stock_slots WHERE book_id = p_book_id ORDER BY slot FOR UPDATE;
+
+    SELECT stock_quantity INTO v_total FROM book_stock WHERE book_id = p_book_id;
+    IF v_total IS NULL THEN
+        RAISE EXCEPTION 'book % does not exist', p_book_id USING ERRCODE = 'no_data_found';
+    END IF;
+
+    DELETE FROM book_stock_slots WHERE book_id = p_book_id;
+
+    IF p_slots > 0 THEN
+        INSERT INTO book_stock_slots (book_id, slot, quantity)
+        SELECT p_book_id, s, v_total / p_slots + CASE WHEN s < v_total % p_slots THEN 1 ELSE 0 END
+        FROM generate_series(0, p_slots - 1) AS s;
+    END IF;
+
+    -- Skip the write-through trigger: this is the real total, not a delta
+    PERFORM set_config('inventory.syncing', 'on', true);
+    UPDATE books SET stock_quantity = v_total WHERE id = p_book_id;
+    PERFORM set_config('inventory.syncing', 'off', true);
+
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Even out a striped book's slots (random picks drain them unevenly,
+-- which pushes buyers onto the slow path) and refresh the books column.
+CREATE FUNCTION rebalance_book_stock(p_book_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_slots INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO v_slots FROM book_stock_slots WHERE book_id = p_book_id;
+    IF v_slots = 0 THEN
+        RETURN NULL;
+    END IF;
+    RETURN stripe_book_stock(p_book_id, v_slots);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Writes to books.stock_quantity of a striped book are applied to its
+-- slots as a delta, so restocks and stock edits through the column
+-- (e.g. the ORM) reach the slots. A write that would oversell fails with
+-- check_violation. The WHERE clause of the UPDATE still sees the stale
+-- column, so guarded decrements belong in reserve_book_stock().
+CREATE FUNCTION books_stock_write_through()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_delta INTEGER := NEW.stock_quantity - OLD.stock_quantity;
+BEGIN
+    IF current_setting('inventory.syncing', true) = 'on'
+       OR NOT EXISTS (SELECT 1 FROM book_stock_slots WHERE book_id = NEW.id) THEN
+        RETURN NEW;
+    END IF;
+
+    IF v_delta > 0 THEN
+        PERFORM restock_book_stock(NEW.id, v_delta);
+    ELSIF NOT reserve_book_stock(NEW.id, -v_delta) THEN
+        RAISE EXCEPTION 'not enough stock for book %', NEW.id USING ERRCODE = 'check_violation';
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER books_stock_write_through
+BEFORE UPDATE OF stock_quantity ON books
+FOR EACH ROW
+WHEN (NEW.stock_quantity IS DISTINCT FROM OLD.stock_quantity)
+EXECUTE FUNCTION books_stock_write_through();
@@ -0,0 +1,21 @@
+-- Catalog read: a book page, its latest reviews and more books from the
+-- same category.
+-- Variables: book_min, book_max (id range)
+-- Rows are picked by a random id and an index seek to the next existing
+-- one; OFFSET n would read and throw away n rows per transaction.
+\set book_pick random(:book_min, :book_max)
+
+SELECT id AS book_id, COALESCE(category_id, 0) AS category_id
+FROM books WHERE id >= :book_pick ORDER BY id LIMIT 1 \gset
+SELECT * FROM book_details WHERE id = :book_id;
+SELECT rating, comment, created_at
+FROM reviews
+WHERE book_id = :book_id
+ORDER BY created_at DESC
+LIMIT 10;
+SELECT b.title, a.name AS author_name, b.price
+FROM books b
+LEFT JOIN authors a ON a.id = b.author_id
+WHERE b.category_id = :category_id AND b.id <> :book_id
+ORDER BY b.price
+LIMIT 10;
@@ -0,0 +1,18 @@
+-- Order placement: reserve stock, create the order and its line item.
+-- Variables: book_min, book_max, customer_min, customer_max (id ranges)
+\set book_pick random(:book_min, :book_max)
+\set customer_pick random(:customer_min, :customer_max)
+\set qty random(1, 3)
+
+BEGIN;
+SELECT id AS book_id, price FROM books WHERE id >= :book_pick ORDER BY id LIMIT 1 \gset
+SELECT id AS customer_id FROM customers WHERE id >= :customer_pick ORDER BY id LIMIT 1 \gset
+SELECT reserve_book_stock(:book_id, :qty)::int AS reserved \gset
+\if :reserved
+INSERT INTO orders (customer_id, status, total_amount)
+VALUES (:customer_id, 'pending', :price::numeric * :qty)
+RETURNING id AS order_id \gset
+INSERT INTO order_items (order_id, book_id, quantity, price_at_purchase)
+VALUES (:order_id, :book_id, :qty, :price);
+\endif
+END;
@@ -0,0 +1,12 @@
+-- Review insert: a customer posts (or revises) a review of a book.
+-- Variables: book_min, book_max, customer_min, customer_max (id ranges)
+\set book_pick random(:book_min, :book_max)
+\set customer_pick random(:customer_min, :customer_max)
+\set rating random(1, 5)
+
+INSERT INTO reviews (book_id, customer_id, rating, comment)
+SELECT b.id, c.id, :rating, 'pgbench review'
+FROM (SELECT id FROM books WHERE id >= :book_pick ORDER BY id LIMIT 1) b,
+     (SELECT id FROM customers WHERE id >= :customer_pick ORDER BY id LIMIT 1) c
+ON CONFLICT (book_id, customer_id) DO UPDATE
+SET rating = EXCLUDED.rating, comment = EXCLUDED.comment, created_at = CURRENT_TIMESTAMP;